@@ -1,9 +1,18 @@
+import hashlib
+import json
 import os
 import random
+import re
+import threading
+import time
+from collections import OrderedDict
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from circuit_breaker import CircuitBreaker
+from prompt_budget import BioSummaries, UsageLedger, count_tokens
+from tracing import tracer
 
 load_dotenv()
 
@@ -40,6 +49,44 @@ class MatchResult(BaseModel):
     common_interests: List[str]
     suggested_activity: str
 
+class MatchAnalysisCache:
+    """
+    LRU cache of LLM pair analyses holding both languages at once, so switching
+    the UI language is a cache read. Keyed by the content of both profiles, so
+    editing either one naturally misses.
+    """
+
+    def __init__(self, max_entries: int = 5000, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(student: StudentProfile, candidate: StudentProfile) -> str:
+        fields = ("name", "interests", "languages", "french_level", "looking_for", "bio")
+        payload = json.dumps([[getattr(p, f) for f in fields] for p in (student, candidate)])
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, analysis: dict):
+        with self._lock:
+            self._entries[key] = (time.time(), analysis)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
 class BilingualAIMatcher:
     def __init__(self):
         # ALWAYS setup mock attributes first (crucial for fallback)
@@ -48,20 +95,82 @@ class BilingualAIMatcher:
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.use_real_ai = bool(self.openai_api_key and self.openai_api_key != "sk-proj-.....YbmUA")
         
+        # The OpenAI client (and langchain) is only imported on first use or by warm_up()
+        self._llm = None
+        self._backend_lock = threading.Lock()
+        self.backend_load_seconds = None
+        
+        # Bound how long OpenAI can hold up a request before we answer locally
+        self.llm_timeout_seconds = float(os.getenv("LLM_TIMEOUT_SECONDS", "5"))
+        self.request_budget_seconds = float(os.getenv("LLM_REQUEST_BUDGET_SECONDS", "8"))
+        self.breaker = CircuitBreaker(
+            "openai",
+            failure_rate_threshold=float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5")),
+            slow_call_seconds=float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", "4")),
+            open_seconds=float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30")),
+        )
+        self.local_fallbacks = {"breaker_open": 0, "budget_exceeded": 0, "llm_error": 0, "unparsed_reply": 0}
+        
+        # Prompt budgeting: only the first 500 characters of each explanation are
+        # kept, so the (EN + FR) completion is capped near that and bios are summarized.
+        # max_tokens follows observed completion sizes; LLM_MAX_TOKENS is only the ceiling
+        self.max_completion_tokens = int(os.getenv("LLM_MAX_TOKENS", "320"))
+        self.completion_percentile = float(os.getenv("LLM_COMPLETION_PERCENTILE", "0.99"))
+        self.completion_headroom = float(os.getenv("LLM_COMPLETION_HEADROOM", "1.25"))
+        self.completion_min_samples = int(os.getenv("LLM_COMPLETION_MIN_SAMPLES", "50"))
+        self.bio_token_budget = int(os.getenv("PROMPT_BIO_TOKENS", "60"))
+        self.prompt_token_budget = int(os.getenv("PROMPT_TOKEN_BUDGET", "400"))
+        self.bio_summaries = BioSummaries()
+        self.usage = UsageLedger()
+        self.analysis_cache = MatchAnalysisCache(
+            max_entries=int(os.getenv("MATCH_CACHE_MAX_ENTRIES", "5000")),
+            ttl_seconds=float(os.getenv("MATCH_CACHE_TTL_SECONDS", "3600")),
+        )
+        
         if self.use_real_ai:
+            print("🤖 REAL OpenAI configured, backend will load on first use")
+        else:
+            print("🤖 Using MOCK AI (no valid OpenAI API key found)")
+    
+    @property
+    def is_ready(self) -> bool:
+        """True once matching can run without paying for backend imports"""
+        return not self.use_real_ai or self._llm is not None
+    
+    @property
+    def llm(self):
+        self._load_backend()
+        return self._llm
+    
+    def warm_up(self):
+        """Load the AI backend ahead of the first request (run in the background)"""
+        self._load_backend()
+    
+    def _load_backend(self):
+        """Import langchain and build the OpenAI client exactly once"""
+        if self.is_ready:
+            return
+        with self._backend_lock:
+            if self.is_ready:
+                return
+            started = time.perf_counter()
             try:
                 from langchain_openai import ChatOpenAI
                 from langchain_core.messages import SystemMessage, HumanMessage
                 
-                self.llm = ChatOpenAI(
+                self.SystemMessage = SystemMessage
+                self.HumanMessage = HumanMessage
+                self._llm = ChatOpenAI(
                     model="gpt-3.5-turbo",
                     temperature=0.7,
-                    max_tokens=1000,
-                    openai_api_key=self.openai_api_key
+                    max_tokens=self.max_completion_tokens,
+                    openai_api_key=self.openai_api_key,
+                    request_timeout=self.llm_timeout_seconds,
+                    # The circuit breaker decides when to try again
+                    max_retries=0
                 )
-                self.SystemMessage = SystemMessage
-                self.HumanMessage = HumanMessage
-                print("🤖 Using REAL OpenAI for matching")
+                self.backend_load_seconds = round(time.perf_counter() - started, 3)
+                print(f"🤖 Using REAL OpenAI for matching (loaded in {self.backend_load_seconds}s)")
                 
             except ImportError as e:
                 print(f"❌ langchain-openai import failed: {e}")
@@ -71,8 +180,6 @@ class BilingualAIMatcher:
                 print(f"❌ OpenAI setup failed: {e}")
                 self.use_real_ai = False
                 print("🤖 Falling back to MOCK AI")
-        else:
-            print("🤖 Using MOCK AI (no valid OpenAI API key found)")
     
     def _setup_mock_attributes(self):
         """ALWAYS setup mock attributes - crucial for fallback"""
@@ -124,16 +231,22 @@ class BilingualAIMatcher:
         """Find the best matches for a student from candidate list"""
         
         if self.use_real_ai:
-            try:
-                return self._find_matches_real_ai(student, candidates, language)
-            except Exception as e:
-                print(f"❌ Real AI failed, falling back to mock: {e}")
-                # Ensure mock attributes exist before falling back
+            # May turn use_real_ai off if the backend can't be loaded
+            self._load_backend()
+        
+        with tracer.span("matcher.score", candidates=len(candidates), real_ai=self.use_real_ai) as span:
+            if self.use_real_ai:
+                try:
+                    return self._find_matches_real_ai(student, candidates, language)
+                except Exception as e:
+                    print(f"❌ Real AI failed, falling back to mock: {e}")
+                    span.set("fallback", "mock")
+                    # Ensure mock attributes exist before falling back
+                    self._ensure_mock_attributes()
+                    return self._find_matches_mock(student, candidates, language)
+            else:
                 self._ensure_mock_attributes()
                 return self._find_matches_mock(student, candidates, language)
-        else:
-            self._ensure_mock_attributes()
-            return self._find_matches_mock(student, candidates, language)
     
     def _ensure_mock_attributes(self):
         """Ensure mock attributes exist (safety check)"""
@@ -141,32 +254,135 @@ class BilingualAIMatcher:
             self._setup_mock_attributes()
     
     def _find_matches_real_ai(self, student: StudentProfile, candidates: List[StudentProfile], language: str) -> List[MatchResult]:
-        """Use real OpenAI for matching"""
-        matches = []
+        """Use real OpenAI for matching, within the breaker and the request's latency budget"""
+        if self.breaker.state == CircuitBreaker.OPEN:
+            # OpenAI is known to be failing: answer the whole request from cache/local scores right away
+            self.local_fallbacks["breaker_open"] += 1
+            matches = [
+                self.cached_match(student, candidate, language) or self.quick_match(student, candidate, language)
+                for candidate in candidates
+                if student.name != candidate.name
+            ]
+            return sorted(matches, key=lambda x: x.match_score, reverse=True)[:3]
         
-        for candidate in candidates:
-            if student.name == candidate.name:
-                continue
-                
-            prompt = self._create_match_prompt(student, candidate, language)
+        deadline = time.monotonic() + self.request_budget_seconds
+        matches = [
+            self.analyze_match(student, candidate, language, deadline)
+            for candidate in candidates
+            if student.name != candidate.name
+        ]
+        
+        return sorted(matches, key=lambda x: x.match_score, reverse=True)[:3]
+    
+    def quick_match(self, student: StudentProfile, candidate: StudentProfile, language: str = "en") -> MatchResult:
+        """Cheap local estimate of one pair, e.g. a provisional result while the LLM works"""
+        self._ensure_mock_attributes()
+        return self._create_mock_match(student, candidate, language)
+    
+    def cached_match(self, student: StudentProfile, candidate: StudentProfile, language: str = "en") -> Optional[MatchResult]:
+        """A previous LLM analysis of this pair in `language`, if one is cached"""
+        analysis = self.analysis_cache.get(MatchAnalysisCache.key(student, candidate))
+        return self._localize(analysis, language) if analysis is not None else None
+    
+    def analyze_match(self, student: StudentProfile, candidate: StudentProfile, language: str = "en",
+                      deadline: Optional[float] = None) -> MatchResult:
+        """Full analysis of one pair: cached, else OpenAI when the breaker and budget allow, else local"""
+        if self.use_real_ai:
+            self._load_backend()
+        if not self.use_real_ai:
+            return self.quick_match(student, candidate, language)
+        
+        cache_key = MatchAnalysisCache.key(student, candidate)
+        analysis = self.analysis_cache.get(cache_key)
+        if analysis is not None:
+            return self._localize(analysis, language)
+        
+        if deadline is not None and time.monotonic() >= deadline:
+            self.local_fallbacks["budget_exceeded"] += 1
+            return self.quick_match(student, candidate, language)
+        if not self.breaker.allow_request():
+            # Opened mid-request, or half-open with its probe already in flight
+            self.local_fallbacks["breaker_open"] += 1
+            return self.quick_match(student, candidate, language)
+        
+        prompt = self._create_match_prompt(student, candidate)
+        
+        try:
+            response = self._invoke_llm([
+                self.SystemMessage(content=self._get_system_prompt()),
+                self.HumanMessage(content=prompt)
+            ])
             
+            # One call answers both languages; keep them together
+            analysis, complete = self._parse_ai_response(response.content, student, candidate)
+            if complete:
+                self.analysis_cache.put(cache_key, analysis)
+            else:
+                # Malformed or cut off: serve it this once, but ask again next time
+                self.local_fallbacks["unparsed_reply"] += 1
+            return self._localize(analysis, language)
+            
+        except Exception as e:
+            print(f"❌ OpenAI API error for {candidate.name}: {e}")
+            self.local_fallbacks["llm_error"] += 1
+            # Fallback to mock matching for this candidate
+            return self.quick_match(student, candidate, language)
+    
+    @staticmethod
+    def _localize(analysis: dict, language: str) -> MatchResult:
+        """Pick one language out of a bilingual analysis"""
+        language = "fr" if language == "fr" else "en"
+        return MatchResult(
+            match_score=analysis["match_score"],
+            explanation=analysis["explanation"][language],
+            common_interests=analysis["common_interests"],
+            suggested_activity=analysis["suggested_activity"][language]
+        )
+    
+    def completion_budget(self) -> int:
+        """max_tokens for the next call"""
+        return self.usage.completion_budget(
+            self.max_completion_tokens,
+            percentile=self.completion_percentile,
+            headroom=self.completion_headroom,
+            min_samples=self.completion_min_samples,
+        )
+    
+    def _invoke_llm(self, messages):
+        """One LLM call whose outcome, latency and token usage are recorded (caller got permission)"""
+        prompt_tokens = sum(count_tokens(message.content) for message in messages)
+        max_tokens = self.completion_budget()
+        with tracer.span("llm.invoke", model=getattr(self._llm, "model_name", None), max_tokens=max_tokens) as span:
+            started = time.monotonic()
             try:
-                response = self.llm.invoke([
-                    self.SystemMessage(content=self._get_system_prompt(language)),
-                    self.HumanMessage(content=prompt)
-                ])
-                
-                # Parse the AI response
-                match_result = self._parse_ai_response(response.content, student, candidate, language)
-                matches.append(match_result)
-                
+                response = self.llm.invoke(messages, max_tokens=max_tokens)
             except Exception as e:
-                print(f"❌ OpenAI API error for {candidate.name}: {e}")
-                # Fallback to mock matching for this candidate
-                mock_match = self._create_mock_match(student, candidate, language)
-                matches.append(mock_match)
-        
-        return sorted(matches, key=lambda x: x.match_score, reverse=True)[:3]
+                latency = time.monotonic() - started
+                self.breaker.record_failure(latency, str(e)[:200])
+                self.usage.record(prompt_tokens, 0, latency, ok=False)
+                raise
+            latency = time.monotonic() - started
+            self.breaker.record_success(latency)
+            
+            # Prefer the provider's own counts when langchain exposes them
+            token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+            prompt_tokens = token_usage.get("prompt_tokens", prompt_tokens)
+            completion_tokens = token_usage.get("completion_tokens", count_tokens(response.content))
+            span.set("prompt_tokens", prompt_tokens)
+            span.set("completion_tokens", completion_tokens)
+            self.usage.record(prompt_tokens, completion_tokens, latency, model=getattr(self._llm, "model_name", None))
+            return response
+    
+    def metrics(self):
+        return {
+            "engine": "Real OpenAI" if self.use_real_ai else "Mock AI",
+            "ready": self.is_ready,
+            "breaker": self.breaker.metrics(),
+            "local_fallbacks": dict(self.local_fallbacks),
+            "llm_usage": {**self.usage.metrics(), "completion_budget": self.completion_budget()},
+            "bio_summary_cache": {"hits": self.bio_summaries.hits, "misses": self.bio_summaries.misses},
+            "analysis_cache": {"hits": self.analysis_cache.hits, "misses": self.analysis_cache.misses},
+        }
     
     def _find_matches_mock(self, student: StudentProfile, candidates: List[StudentProfile], language: str) -> List[MatchResult]:
         """Use mock AI for matching"""
@@ -181,72 +397,80 @@ class BilingualAIMatcher:
         
         return sorted(matches, key=lambda x: x.match_score, reverse=True)[:3]
     
-    def _create_match_prompt(self, student: StudentProfile, candidate: StudentProfile, language: str) -> str:
-        return f"""
-        Analyze this potential student match for MontrealCampus Connect and provide response in {language}:
-
-        STUDENT SEEKING CONNECTIONS:
-        - Name: {student.name}
-        - Interests: {', '.join(student.interests)}
-        - Languages: {', '.join(student.languages)}
-        - French Level: {student.french_level}
-        - Looking For: {', '.join(student.looking_for)}
-        - Bio: {student.bio}
-
-        POTENTIAL MATCH:
-        - Name: {candidate.name}
-        - Interests: {', '.join(candidate.interests)}
-        - Languages: {', '.join(candidate.languages)}
-        - French Level: {candidate.french_level}
-        - Looking For: {', '.join(candidate.looking_for)}
-        - Bio: {candidate.bio}
-
-        Please provide a comprehensive analysis with:
-        1. Match compatibility score (0-100)
-        2. Detailed explanation of why they would connect well
-        3. List of common interests they share
-        4. One specific, realistic activity suggestion for Montreal
-
-        Focus on language exchange potential, shared interests, and cultural compatibility.
-        """
+    def _create_match_prompt(self, student: StudentProfile, candidate: StudentProfile) -> str:
+        """Compact pair description, shrinking the bios until the prompt fits its token budget"""
+        bio_budget = self.bio_token_budget
+        while True:
+            prompt = (
+                "Rate how well A and B would connect (language exchange, shared interests, culture). "
+                "Reply with JSON only: {\"score\": 0-100, "
+                "\"en\": {\"explanation\": \"<=3 sentences\", \"activity\": \"one specific Montreal activity\"}, "
+                "\"fr\": {same in French}}\n"
+                f"A: {self._describe(student, bio_budget)}\n"
+                f"B: {self._describe(candidate, bio_budget)}"
+            )
+            if bio_budget <= 0 or count_tokens(prompt) <= self.prompt_token_budget:
+                return prompt
+            bio_budget //= 2
     
-    def _get_system_prompt(self, language: str) -> str:
-        if language == "fr":
-            return """
-            Vous êtes un assistant expert pour MontrealCampus Connect, une plateforme de connexion étudiante.
-            Votre rôle est d'analyser les compatibilités entre étudiants basées sur leurs intérêts, compétences linguistiques et objectifs.
-            Fournissez des analyses détaillées et des suggestions d'activités spécifiques à Montréal.
-            Soyez encourageant et mettez l'accent sur la construction de communauté.
-            """
-        else:
-            return """
-            You are an expert assistant for MontrealCampus Connect, a student connection platform.
-            Your role is to analyze student compatibilities based on interests, language skills, and goals.
-            Provide detailed analyses and specific activity suggestions for Montreal.
-            Be encouraging and focus on community building.
-            """
+    def _describe(self, profile: StudentProfile, bio_budget: int) -> str:
+        bio = self.bio_summaries.summarize(profile.email or profile.name, profile.bio, bio_budget) if bio_budget > 0 else ""
+        return (
+            f"{profile.name}; interests: {', '.join(profile.interests)}; "
+            f"languages: {', '.join(profile.languages)}; French {profile.french_level}; "
+            f"looking for: {', '.join(profile.looking_for)}; bio: {bio}"
+        )
+    
+    def _get_system_prompt(self) -> str:
+        return (
+            "MontrealCampus Connect assistant: rate student compatibility, concise and encouraging. "
+            "Always answer in both English and French."
+        )
     
-    def _parse_ai_response(self, response: str, student: StudentProfile, candidate: StudentProfile, language: str) -> MatchResult:
-        """Parse AI response into structured match result"""
+    def _parse_ai_response(self, response: str, student: StudentProfile, candidate: StudentProfile):
+        """
+        Parse the bilingual AI response into an analysis holding both languages.
+        Returns (analysis, complete); parts the reply doesn't provide come from
+        the local templates, and complete is False when any explanation was missing.
+        """
         common_interests = list(set(student.interests) & set(candidate.interests))
+        analysis = {
+            "match_score": 75,  # Default
+            "common_interests": common_interests,
+            "explanation": {},
+            "suggested_activity": {},
+        }
         
-        # Extract score from response (basic implementation)
-        score = 75  # Default
-        if "score" in response.lower():
-            try:
-                # Look for numbers in the response
-                import re
-                numbers = re.findall(r'\b(\d{1,3})\b', response)
-                if numbers:
-                    score = min(int(numbers[0]), 100)
-            except:
-                pass
+        try:
+            # Tolerate a ```json fence around the object
+            data = json.loads(response[response.index("{"):response.rindex("}") + 1])
+            analysis["match_score"] = min(max(int(data.get("score", 75)), 0), 100)
+            for language in ("en", "fr"):
+                section = data.get(language) or {}
+                if section.get("explanation"):
+                    analysis["explanation"][language] = str(section["explanation"])
+                if section.get("activity"):
+                    analysis["suggested_activity"][language] = str(section["activity"])
+        except (ValueError, TypeError, AttributeError):
+            # Not JSON (or cut off): fall back to the first number as the score
+            numbers = re.findall(r'\b(\d{1,3})\b', response)
+            if "score" in response.lower() and numbers:
+                analysis["match_score"] = min(int(numbers[0]), 100)
         
-        return MatchResult(
-            match_score=score,
-            explanation=response[:500] + "..." if len(response) > 500 else response,
-            common_interests=common_interests,
-            suggested_activity=self._get_activity_suggestion(common_interests, language)
+        complete = all(analysis["explanation"].get(language) for language in ("en", "fr"))
+        for language in ("en", "fr"):
+            explanation = analysis["explanation"].get(language) or self._template_explanation(common_interests, language)
+            analysis["explanation"][language] = explanation[:500] + "..." if len(explanation) > 500 else explanation
+            if not analysis["suggested_activity"].get(language):
+                analysis["suggested_activity"][language] = self._get_activity_suggestion(common_interests, language)
+        return analysis, complete
+    
+    def _template_explanation(self, common_interests: List[str], language: str) -> str:
+        """A mock-style explanation, for when the AI reply has none we can use"""
+        self._ensure_mock_attributes()
+        explanations = self.explanations_fr if language == "fr" else self.explanations_en
+        return random.choice(explanations).format(
+            interests=", ".join(common_interests) if common_interests else "various activities"
         )
     
     def _create_mock_match(self, student: StudentProfile, candidate: StudentProfile, language: str) -> MatchResult:
@@ -266,12 +490,8 @@ class BilingualAIMatcher:
         total_score = min(max(base_score + language_bonus + looking_for_bonus, 65), 95)
         
         # Choose explanation and activity based on language
-        explanations = self.explanations_fr if language == "fr" else self.explanations_en
         activities = self.activities_fr if language == "fr" else self.activities_en
-        
-        explanation = random.choice(explanations).format(
-            interests=", ".join(common_interests) if common_interests else "various activities"
-        )
+        explanation = self._template_explanation(common_interests, language)
         
         activity = random.choice(activities)
         
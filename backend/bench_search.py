@@ -0,0 +1,87 @@
+"""
+Latency benchmark of the in-process student search index.
+
+Indexes N synthetic students (accented French names, interests, bios),
+then times a mix of prefix, accent-folded, typo and multi-term queries,
+with some writes interleaved so posting lists get rebuilt like in production.
+
+    python bench_search.py [--students 100000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from matcher_index import StudentIndex
+from student_search import StudentSearchIndex
+
+FIRST_NAMES = ["Léa", "Chloé", "Émilie", "Zoé", "Maëlle", "Noémie", "François", "Jérôme", "Théo", "Hélène",
+               "Amélie", "Gaëlle", "Mathéo", "Benoît", "Raphaël", "Sarah", "Wei", "Amir", "Lucas", "Olivia"]
+LAST_NAMES = ["Tremblay", "Gagnon", "Roy", "Côté", "Bouchard", "Gauthier", "Morin", "Lavoie", "Fortin",
+              "Gagné", "Ouellet", "Pelletier", "Bélanger", "Lévesque", "Bergeron", "Leblanc", "Paquette"]
+INTERESTS = ["art", "coffee", "museums", "photography", "cinema", "technology", "startups",
+             "hiking", "music", "dance", "literature", "yoga", "sports", "cooking", "travel"]
+BIO_WORDS = ["student", "montreal", "udem", "love", "meeting", "people", "cultures", "french", "english",
+             "practice", "weekends", "exploring", "plateau", "festivals", "biology", "engineering", "law"]
+QUERIES = ["lea", "Léa", "chl", "tremb", "gagnon", "cote", "photo", "photgraphy", "musik", "hiking coffee",
+           "lea tremblay", "emilie", "belanger", "engineering", "fest", "noemie roy", "montrael", "s"]
+
+
+def make_student(i: int) -> dict:
+    return {
+        "_id": f"{i:024x}",
+        "name": f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}",
+        "username": f"user{i}",
+        "email": f"user{i}@umontreal.ca",
+        "interests": random.sample(INTERESTS, 4),
+        "languages": ["fr", "en"],
+        "french_level": random.choice(["A1", "A2", "B1", "B2", "C1", "C2"]),
+        "looking_for": ["coffee"],
+        "bio": " ".join(random.choices(BIO_WORDS, k=14)),
+    }
+
+
+def percentile(timings, fraction: float) -> float:
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Student search latency")
+    parser.add_argument("--students", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+    random.seed(42)
+
+    index = StudentIndex()
+    search = StudentSearchIndex(index)
+    index.add_listener(search.on_index_event)
+
+    started = time.perf_counter()
+    index.load(make_student(i) for i in range(args.students))
+    print(f"📇 Indexed {len(search)} students in {time.perf_counter() - started:.1f}s")
+
+    timings = []
+    for number in range(args.queries):
+        if number % 10 == 0:
+            # Writes invalidate the cached posting arrays of the tokens they touch
+            index.upsert(make_student(random.randrange(args.students)))
+        query = random.choice(QUERIES)
+        started = time.perf_counter()
+        search.search(query, limit=20)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    print(f"🔎 {args.queries} queries: p50 {percentile(timings, 0.5):.2f}ms, "
+          f"p95 {percentile(timings, 0.95):.2f}ms, p99 {percentile(timings, 0.99):.2f}ms, "
+          f"max {timings[-1]:.2f}ms")
+    for query in ("Lea", "photgraphy", "lea trem"):
+        total, page = search.search(query, limit=3)
+        names = [index.get(student_id)["name"] for _, student_id in page]
+        print(f"   {query!r}: {total} matches, top {names}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Micro-benchmark of per-request serialization cost on hot endpoints.
+
+Compares, for N student documents shaped like what pymongo returns:
+  - GET /api/students before (ObjectId loop + jsonable_encoder + JSONResponse)
+    and after (Mongo projection + FastJSONResponse / orjson)
+  - building matcher profiles with validation (StudentProfile(...)) and
+    without (StudentProfile.construct(...))
+
+    python bench_serialization.py [--docs 10000] [--repeat 5]
+"""
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from ai_matcher import StudentProfile
+from fast_json import FastJSONResponse, STUDENT_INTERNAL_FIELDS
+
+INTERESTS = ["art", "coffee", "museums", "photography", "cinema", "technology", "startups",
+             "hiking", "music", "dance", "literature", "yoga", "sports", "cooking", "travel"]
+LOOKING_FOR = ["coffee", "french_help", "french_practice", "cultural_exchange", "study_partners"]
+
+
+def make_documents(count: int):
+    """Student documents as pymongo returns them (ObjectId, datetime, internal fields)"""
+    random.seed(42)
+    return [{
+        "_id": ObjectId(),
+        "name": f"Student {i}",
+        "email": f"student{i}@umontreal.ca",
+        "username": f"student{i}",
+        "interests": random.sample(INTERESTS, 5),
+        "languages": random.sample(["fr", "en", "es", "zh", "ar"], 2),
+        "french_level": random.choice(["A1", "A2", "B1", "B2", "C1", "C2"]),
+        "looking_for": random.sample(LOOKING_FOR, 3),
+        "bio": "Student at UdeM who loves meeting people from different cultures. " * 2,
+        "avatar_url": None,
+        "role": "udem_student",
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+    } for i in range(count)]
+
+
+def before_students_response(docs):
+    students = copy.copy(docs)
+    for student in students:
+        student["_id"] = str(student["_id"])
+    content = jsonable_encoder({"total_students": len(students), "students": students})
+    return JSONResponse(content).body
+
+
+def after_students_response(docs):
+    return FastJSONResponse({"total_students": len(docs), "students": docs}).body
+
+
+def validated_profiles(docs):
+    return [StudentProfile(
+        name=d["name"], email=d["email"], interests=d["interests"], languages=d["languages"],
+        french_level=d["french_level"], looking_for=d["looking_for"], bio=d["bio"]
+    ) for d in docs]
+
+
+def constructed_profiles(docs):
+    return [StudentProfile.construct(
+        name=d["name"], email=d["email"], interests=d["interests"], languages=d["languages"],
+        french_level=d["french_level"], looking_for=d["looking_for"], bio=d["bio"]
+    ) for d in docs]
+
+
+def best_of(function, docs, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        # The "before" path mutates documents, so each run gets fresh copies
+        batch = [dict(doc) for doc in docs]
+        started = time.perf_counter()
+        function(batch)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialization cost before/after the fast path")
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    raw = make_documents(args.docs)
+    # What Mongo returns once the precomputed projection is applied
+    projected = [{k: v for k, v in doc.items() if k not in STUDENT_INTERNAL_FIELDS} for doc in raw]
+
+    print(f"📊 Serialization of {args.docs} student documents (best of {args.repeat})\n")
+    rows = [
+        ("GET /api/students", best_of(before_students_response, raw, args.repeat),
+         best_of(after_students_response, projected, args.repeat)),
+        ("StudentProfile for matching", best_of(validated_profiles, raw, args.repeat),
+         best_of(constructed_profiles, raw, args.repeat)),
+    ]
+    print(f"{'':32}{'before':>12}{'after':>12}{'speedup':>10}")
+    for label, before, after in rows:
+        print(f"{label:32}{before * 1000:>10.1f}ms{after * 1000:>10.1f}ms{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
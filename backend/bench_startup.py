@@ -0,0 +1,96 @@
+"""
+Import-time report for the API worker.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and
+fails (exit code 1) if importing the app takes longer than the budget or
+pulls in the AI backend eagerly. Usage:
+
+    python bench_startup.py [--budget-ms 1500] [--top 15] [--warm]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that must only be imported by BilingualAIMatcher.warm_up() / first use
+LAZY_MODULES = ("langchain_openai", "langchain_core", "openai", "tiktoken")
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_imports(module: str = "main"):
+    """Return (wall_seconds, [(module, self_us, cumulative_us, depth)]) for a cold import"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return wall, imports
+
+
+def measure_warm_up() -> float:
+    """Seconds spent loading the AI backend after the app is imported"""
+    sys.path.insert(0, BACKEND_DIR)
+    from ai_matcher import BilingualAIMatcher
+
+    matcher = BilingualAIMatcher()
+    started = time.perf_counter()
+    matcher.warm_up()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import time of the API and check the startup budget")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "1500")))
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--warm", action="store_true", help="also time the background AI warm-up")
+    args = parser.parse_args()
+
+    wall, imports = measure_imports(args.module)
+    total_us = next((cumulative for name, _, cumulative, _ in imports if name == args.module), 0)
+
+    print(f"⏱️  import {args.module}: {total_us / 1000:.1f} ms (process wall time {wall * 1000:.0f} ms)")
+    print(f"\n🐢 Top {args.top} top-level packages by cumulative import time:")
+    top_level = {}
+    for name, _, cumulative, _ in imports:
+        package = name.split(".")[0]
+        if package != args.module and "." not in name:
+            top_level[package] = max(top_level.get(package, 0), cumulative)
+    for package, cumulative in sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"   {cumulative / 1000:8.1f} ms  {package}")
+
+    eager = sorted({name for name, _, _, _ in imports if name.split(".")[0] in LAZY_MODULES})
+    if args.warm:
+        print(f"\n🔥 AI backend warm-up: {measure_warm_up() * 1000:.0f} ms")
+
+    failed = False
+    if eager:
+        print(f"\n❌ AI backend imported at startup: {', '.join(eager[:5])}")
+        failed = True
+    if total_us / 1000 > args.budget_ms:
+        print(f"\n❌ Startup budget exceeded: {total_us / 1000:.1f} ms > {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print(f"\n✅ Within startup budget ({args.budget_ms:.0f} ms)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import os
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Callable, List, Optional
+from uuid import uuid4
+
+from matcher_index import CEFR_LEVELS
+
+# Catalogue seeded into an empty challenges collection.
+# `language` is the language a challenge is done in ("fr" ones are gated by
+# `min_level`); challenges without interests are general fillers.
+SEED_CHALLENGES = [
+    {"id": "museum-visit", "interests": ["art", "museums", "history"], "language": None, "min_level": None,
+     "title": {"en": "Visit a Montreal museum and share your favourite piece",
+               "fr": "Visiter un musée de Montréal et partager votre œuvre préférée"}},
+    {"id": "cafe-order", "interests": ["coffee"], "language": "fr", "min_level": "A1",
+     "title": {"en": "Order coffee in French at a local café",
+               "fr": "Commander un café en français dans un café local"}},
+    {"id": "cafe-conversation", "interests": ["coffee"], "language": "fr", "min_level": "B1",
+     "title": {"en": "Hold a 10-minute conversation in French over coffee",
+               "fr": "Tenir une conversation de 10 minutes en français autour d'un café"}},
+    {"id": "photo-walk", "interests": ["photography", "art", "travel"], "language": None, "min_level": None,
+     "title": {"en": "Explore Old Montreal and take photos",
+               "fr": "Explorer le Vieux-Montréal et prendre des photos"}},
+    {"id": "cinema-fr", "interests": ["cinema", "theater"], "language": "fr", "min_level": "B1",
+     "title": {"en": "Watch a Québécois film without subtitles",
+               "fr": "Regarder un film québécois sans sous-titres"}},
+    {"id": "startup-meetup", "interests": ["startups", "technology", "coding"], "language": None, "min_level": None,
+     "title": {"en": "Attend a Montreal tech or startup meetup",
+               "fr": "Assister à un meetup techno ou startup à Montréal"}},
+    {"id": "mont-royal-hike", "interests": ["hiking", "sports", "environment"], "language": None, "min_level": None,
+     "title": {"en": "Hike up Mont Royal with a classmate",
+               "fr": "Monter le mont Royal avec un camarade de classe"}},
+    {"id": "live-music", "interests": ["music", "dance"], "language": None, "min_level": None,
+     "title": {"en": "Catch a live show at a campus or Plateau venue",
+               "fr": "Voir un spectacle au campus ou sur le Plateau"}},
+    {"id": "library-book", "interests": ["literature", "reading", "writing"], "language": "fr", "min_level": "A2",
+     "title": {"en": "Borrow a French book from the UdeM library",
+               "fr": "Emprunter un livre en français à la bibliothèque de l'UdeM"}},
+    {"id": "market-recipe", "interests": ["cooking", "travel"], "language": "fr", "min_level": "A2",
+     "title": {"en": "Shop for a recipe at Jean-Talon Market in French",
+               "fr": "Faire les courses d'une recette au marché Jean-Talon en français"}},
+    {"id": "campus-club", "interests": ["sports", "yoga", "badminton", "chess", "gaming", "board_games"],
+     "language": None, "min_level": None,
+     "title": {"en": "Join a club on campus that matches one of your interests",
+               "fr": "Rejoindre un club du campus lié à un de vos intérêts"}},
+    {"id": "volunteer-day", "interests": ["volunteering", "environment"], "language": "fr", "min_level": "B1",
+     "title": {"en": "Volunteer for a day with a local organisation",
+               "fr": "Faire une journée de bénévolat avec un organisme local"}},
+    {"id": "campus-workshop", "interests": [], "language": None, "min_level": None,
+     "title": {"en": "Attend a free campus workshop or event",
+               "fr": "Assister à un atelier ou événement universitaire gratuit"}},
+    {"id": "language-exchange", "interests": [], "language": "fr", "min_level": "A1",
+     "title": {"en": "Join a language exchange session at the student centre",
+               "fr": "Participer à un échange linguistique au centre étudiant"}},
+]
+
+
+class ChallengeCatalog:
+    """
+    Challenges stored in Mongo, served from memory.
+    The whole catalogue is small, so it is reloaded wholesale at startup,
+    after every write through the API and every `refresh_seconds`; each load
+    builds an interest -> challenge ids index. Suggestions count how many of
+    the student's interests each challenge shares, drop challenges the
+    student completed or isn't ready for (CEFR level), and fill up with
+    general challenges.
+    """
+
+    def __init__(self, get_collection: Callable):
+        self.get_collection = get_collection
+        self.refresh_seconds = float(os.getenv("CHALLENGES_REFRESH_SECONDS", "60"))
+        # (challenges by id, interest -> ids, general ids, catalogue position by id), replaced as a whole
+        self._state = ({}, {}, [], {})
+        self.loaded_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def setup(self):
+        """Create indexes and seed the catalogue into an empty collection"""
+        challenges_db = self.get_collection()
+        try:
+            challenges_db.create_index("id", unique=True)
+            challenges_db.create_index("interests")
+        except Exception as e:
+            print(f"⚠️ Could not create challenge indexes: {e}")
+        if challenges_db.count_documents({}, limit=1) == 0:
+            challenges_db.insert_many([dict(challenge) for challenge in SEED_CHALLENGES])
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="challenge-catalog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def reload(self):
+        """Replace the in-memory catalogue with the collection's current contents"""
+        try:
+            docs = list(self.get_collection().find({}, {"_id": 0}))
+        except Exception as e:
+            print(f"❌ Could not load challenges: {e}")
+            return
+        challenges = {doc["id"]: doc for doc in docs}
+        by_interest = {}
+        general = []
+        for challenge_id, challenge in challenges.items():
+            interests = challenge.get("interests") or []
+            for interest in interests:
+                by_interest.setdefault(interest, []).append(challenge_id)
+            if not interests:
+                general.append(challenge_id)
+        order = {challenge_id: position for position, challenge_id in enumerate(challenges)}
+        # One reference swap, so readers never mix two versions of the catalogue
+        self._state = (challenges, by_interest, general, order)
+        self.loaded_at = datetime.utcnow().isoformat()
+
+    def create(self, challenge: dict) -> dict:
+        challenge = dict(challenge)
+        challenge["id"] = challenge.get("id") or uuid4().hex
+        self.get_collection().insert_one(challenge)
+        challenge.pop("_id", None)
+        self.reload()
+        return challenge
+
+    def get(self, challenge_id: str) -> Optional[dict]:
+        """A challenge by id; asks the collection when it's newer than our copy of the catalogue"""
+        challenge = self._state[0].get(challenge_id)
+        if challenge is None:
+            challenge = self.get_collection().find_one({"id": challenge_id}, {"_id": 0})
+        return challenge
+
+    def suggest(self, student: dict, limit: int = 3) -> List[tuple]:
+        """[(challenge, shared interests)] for a student document, best first"""
+        challenges, by_interest, general, order = self._state
+        completed = set(student.get("completed_challenges") or [])
+        level = CEFR_LEVELS.get((student.get("french_level") or "").upper(), 0)
+
+        overlap = Counter()
+        for interest in set(student.get("interests") or []):
+            overlap.update(by_interest.get(interest, ()))
+
+        def eligible(challenge_id: str) -> bool:
+            if challenge_id in completed:
+                return False
+            challenge = challenges[challenge_id]
+            if challenge.get("language") == "fr":
+                return level >= CEFR_LEVELS.get((challenge.get("min_level") or "A1").upper(), 1)
+            return True
+
+        # Most shared interests first; catalogue order breaks ties
+        ranked = sorted((cid for cid in overlap if eligible(cid)), key=lambda cid: (-overlap[cid], order[cid]))
+        ranked += [cid for cid in general if eligible(cid)]
+        return [(challenges[cid], overlap.get(cid, 0)) for cid in ranked[:limit]]
+
+    def metrics(self):
+        challenges, by_interest, _, _ = self._state
+        return {"challenges": len(challenges), "interests": len(by_interest), "loaded_at": self.loaded_at}
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.reload()
+            self._stop.wait(self.refresh_seconds)
+
+
+def localized_title(challenge: dict, language: str) -> str:
+    title = challenge.get("title") or {}
+    if isinstance(title, str):
+        return title
+    return title.get("fr" if language == "fr" else "en") or title.get("en") or ""
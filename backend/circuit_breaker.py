@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import deque
+
+
+class CircuitBreaker:
+    """
+    Error-rate / latency circuit breaker.
+    CLOSED: calls go through and their outcomes fill a rolling window; slow
+    calls count as failures. OPEN: calls are refused until `open_seconds` have
+    passed. HALF_OPEN: a few probe calls are let through; one success closes
+    the breaker again, one failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_rate_threshold: float = 0.5, slow_call_seconds: float = 10.0,
+                 window_size: int = 20, min_calls: int = 5, open_seconds: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._lock = threading.Lock()
+        self._window = deque(maxlen=window_size)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self.times_opened = 0
+        self.rejected_calls = 0
+        self.last_failure = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def allow_request(self) -> bool:
+        """Ask for permission to make one call; every allowed call must be recorded"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+                self._half_open_in_flight += 1
+                return True
+            self.rejected_calls += 1
+            return False
+
+    def record_success(self, latency: float):
+        if latency > self.slow_call_seconds:
+            self.record_failure(latency, f"slow call ({latency:.1f}s)")
+            return
+        with self._lock:
+            if self._current_state() == self.HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+                self._close()
+            else:
+                self._window.append(True)
+
+    def record_failure(self, latency: float = None, error: str = None):
+        with self._lock:
+            self.last_failure = error
+            if self._current_state() == self.HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+                self._open()
+                return
+            self._window.append(False)
+            if len(self._window) >= self.min_calls and self._failure_rate() >= self.failure_rate_threshold:
+                self._open()
+
+    def metrics(self):
+        with self._lock:
+            state = self._current_state()
+            retry_in = None
+            if state == self.OPEN:
+                retry_in = round(self._opened_at + self.open_seconds - time.time(), 1)
+            return {
+                "name": self.name,
+                "state": state,
+                "failure_rate": round(self._failure_rate(), 3),
+                "window_calls": len(self._window),
+                "times_opened": self.times_opened,
+                "rejected_calls": self.rejected_calls,
+                "retry_in_seconds": retry_in,
+                "last_failure": self.last_failure,
+            }
+
+    def _current_state(self) -> str:
+        # Caller holds the lock
+        if self._state == self.OPEN and time.time() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._half_open_in_flight = 0
+        return self._state
+
+    def _failure_rate(self) -> float:
+        if not self._window:
+            return 0.0
+        return self._window.count(False) / len(self._window)
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.time()
+        self.times_opened += 1
+        print(f"⚡ Circuit '{self.name}' opened ({self.last_failure})")
+
+    def _close(self):
+        self._state = self.CLOSED
+        self._window.clear()
+        print(f"✅ Circuit '{self.name}' closed again")
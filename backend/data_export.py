@@ -0,0 +1,299 @@
+"""
+Columnar exports of students, connections and matches for analysis.
+
+Streams each collection from a Mongo cursor in fixed-size batches into
+Parquet or Arrow IPC (zstd), so memory stays flat however big the
+collection is. Every export records a watermark; passing it back as
+`since` exports what changed after it. Writers' clocks disagree a little,
+so a document stamped just before a watermark can be committed after the
+export that set it: incremental exports re-read SINCE_OVERLAP before
+`since`, and consumers keep one row per `_id` (the latest `updated_at`
+for students).
+
+    python data_export.py [--out exports] [--format parquet|arrow] [--incremental]
+
+pyarrow is optional: without it the command and the admin endpoint report
+that exports are unavailable.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, Optional
+
+import orjson
+from bson import ObjectId
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+# Re-read this much before `since`, like the student sync's POLL_OVERLAP
+SINCE_OVERLAP = timedelta(seconds=float(os.getenv("EXPORT_OVERLAP_SECONDS", "2")))
+
+FORMATS = {
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrow", "application/vnd.apache.arrow.file"),
+}
+
+
+class ExportUnavailableError(Exception):
+    """Raised when pyarrow isn't installed"""
+
+
+def _str(value) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+def _student_row(doc: dict) -> dict:
+    # No email: analysts study matching, not contact details
+    return {
+        "_id": str(doc["_id"]),
+        "name": doc.get("name"),
+        "username": doc.get("username"),
+        "interests": doc.get("interests") or [],
+        "languages": doc.get("languages") or [],
+        "french_level": doc.get("french_level"),
+        "looking_for": doc.get("looking_for") or [],
+        "bio": doc.get("bio"),
+        "role": doc.get("role"),
+        "created_at": doc.get("created_at"),
+        "updated_at": doc.get("updated_at"),
+    }
+
+
+def _connection_row(doc: dict) -> dict:
+    return {
+        "_id": str(doc["_id"]),
+        "student_id": _str(doc.get("student_id")),
+        "partner_id": _str(doc.get("partner_id")),
+        "status": doc.get("status"),
+        "connected_at": doc.get("connected_at"),
+    }
+
+
+def _match_row(doc: dict) -> dict:
+    # Match documents have no fixed shape yet; keep them whole as JSON
+    return {
+        "_id": str(doc["_id"]),
+        "created_at": doc["_id"].generation_time.replace(tzinfo=None) if isinstance(doc["_id"], ObjectId) else None,
+        "document": orjson.dumps(doc, default=str).decode(),
+    }
+
+
+def _schemas():
+    strings = pa.list_(pa.string())
+    timestamp = pa.timestamp("ms")
+    return {
+        "students": pa.schema([
+            ("_id", pa.string()), ("name", pa.string()), ("username", pa.string()),
+            ("interests", strings), ("languages", strings), ("french_level", pa.string()),
+            ("looking_for", strings), ("bio", pa.string()), ("role", pa.string()),
+            ("created_at", timestamp), ("updated_at", timestamp),
+        ]),
+        "connections": pa.schema([
+            ("_id", pa.string()), ("student_id", pa.string()), ("partner_id", pa.string()),
+            ("status", pa.string()), ("connected_at", timestamp),
+        ]),
+        "matches": pa.schema([("_id", pa.string()), ("created_at", timestamp), ("document", pa.string())]),
+    }
+
+
+# collection -> (row builder, watermark field). Students are updated in place, so
+# they're tracked by updated_at; the others are append-only and ObjectIds grow.
+EXPORTS = {
+    "students": (_student_row, "updated_at"),
+    "connections": (_connection_row, "_id"),
+    "matches": (_match_row, "_id"),
+}
+
+
+def encode_watermark(value) -> Optional[str]:
+    if value is None:
+        return None
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def decode_watermark(field: str, value: str):
+    """Parse a watermark received from a client; raises ValueError if malformed"""
+    if field == "_id":
+        if not ObjectId.is_valid(value):
+            raise ValueError(f"Invalid watermark '{value}', expected an ObjectId")
+        return ObjectId(value)
+    return datetime.fromisoformat(value)
+
+
+class _ChunkSink:
+    """Write-only file object collecting what pyarrow writes, drained after each batch"""
+
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class CollectionExport:
+    """
+    One export of one collection, bounded by the watermark at creation time.
+    `watermark` is known before any data is read (so an HTTP response can
+    carry it in a header); iterate `chunks()` to produce the file.
+    """
+
+    def __init__(self, name: str, collection, file_format: str = "parquet", since: Optional[str] = None):
+        if pa is None:
+            raise ExportUnavailableError("pyarrow is not installed")
+        if name not in EXPORTS:
+            raise ValueError(f"Unknown collection '{name}', expected one of {list(EXPORTS)}")
+        if file_format not in FORMATS:
+            raise ValueError(f"Unknown format '{file_format}', expected one of {list(FORMATS)}")
+        self.name = name
+        self.collection = collection
+        self.file_format = file_format
+        self.row, self.field = EXPORTS[name]
+        self.schema = _schemas()[name]
+        self.since = decode_watermark(self.field, since) if since else None
+
+        latest = collection.find_one({self.field: {"$ne": None}}, {self.field: 1}, sort=[(self.field, -1)])
+        self.upper = latest[self.field] if latest else None
+        self.watermark = encode_watermark(self.upper) or since
+        self.rows = 0
+
+    @property
+    def extension(self) -> str:
+        return FORMATS[self.file_format][0]
+
+    @property
+    def media_type(self) -> str:
+        return FORMATS[self.file_format][1]
+
+    def _query(self) -> dict:
+        if self.since is not None:
+            if self.upper is None:
+                return {"_id": {"$exists": False}}  # nothing can be newer than an empty collection
+            return {self.field: {"$gte": self._overlap_start(), "$lte": self.upper}}
+        if self.upper is None:
+            return {}
+        # Full export: everything up to the watermark, plus documents that predate the field
+        return {"$or": [{self.field: {"$lte": self.upper}}, {self.field: None}]}
+
+    def _overlap_start(self):
+        """`since` moved back by SINCE_OVERLAP (ObjectIds carry their creation second)"""
+        if isinstance(self.since, ObjectId):
+            return ObjectId.from_datetime(self.since.generation_time - SINCE_OVERLAP)
+        return self.since - SINCE_OVERLAP
+
+    def _batches(self) -> Iterator:
+        cursor = self.collection.find(self._query()).sort(self.field, 1).batch_size(BATCH_SIZE)
+        rows = []
+        for doc in cursor:
+            rows.append(self.row(doc))
+            if len(rows) >= BATCH_SIZE:
+                yield pa.RecordBatch.from_pylist(rows, schema=self.schema)
+                rows = []
+        if rows:
+            yield pa.RecordBatch.from_pylist(rows, schema=self.schema)
+
+    def chunks(self) -> Iterator[bytes]:
+        """The encoded file, one chunk per batch written"""
+        sink = _ChunkSink()
+        if self.file_format == "parquet":
+            writer = pq.ParquetWriter(sink, self.schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_file(sink, self.schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+        try:
+            for batch in self._batches():
+                if self.file_format == "parquet":
+                    writer.write_batch(batch)
+                else:
+                    writer.write(batch)
+                self.rows += batch.num_rows
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+        finally:
+            writer.close()
+        yield sink.drain()
+
+
+def export_to_directory(get_collection: Callable[[str], object], directory: str,
+                        file_format: str = "parquet", incremental: bool = False) -> dict:
+    """Export every collection into `directory`; watermarks are kept in watermarks.json"""
+    os.makedirs(directory, exist_ok=True)
+    state_path = os.path.join(directory, "watermarks.json")
+    watermarks = {}
+    if incremental and os.path.exists(state_path):
+        with open(state_path) as f:
+            watermarks = json.load(f)
+
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    summary = {}
+    for name in EXPORTS:
+        export = CollectionExport(name, get_collection(name), file_format, watermarks.get(name))
+        path = os.path.join(directory, f"{name}-{stamp}.{export.extension}")
+        with open(path + ".tmp", "wb") as f:
+            for chunk in export.chunks():
+                f.write(chunk)
+        os.replace(path + ".tmp", path)
+        if export.watermark is not None:
+            watermarks[name] = export.watermark
+        summary[name] = {"path": path, "rows": export.rows, "watermark": export.watermark}
+
+    with open(state_path + ".tmp", "w") as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(state_path + ".tmp", state_path)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export students, connections and matches to Parquet/Arrow")
+    parser.add_argument("--out", default=os.getenv("EXPORT_DIR", "exports"))
+    parser.add_argument("--format", choices=list(FORMATS), default="parquet")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only export what changed since the watermarks of the previous run")
+    args = parser.parse_args()
+
+    if pa is None:
+        print("❌ pyarrow is not installed (pip install pyarrow)")
+        sys.exit(1)
+
+    from database_sync import database
+    print("🔗 Connecting to MongoDB...")
+    if not database.connect():
+        print("❌ Failed to connect to MongoDB")
+        sys.exit(1)
+    try:
+        summary = export_to_directory(lambda name: database.db[name], args.out, args.format, args.incremental)
+    finally:
+        database.close()
+    for name, result in summary.items():
+        print(f"📦 {name}: {result['rows']} rows -> {result['path']} (watermark {result['watermark']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,327 @@
 import os
-from pymongo import MongoClient
+import threading
+import time
+from pymongo import MongoClient, monitoring
+from pymongo.errors import ConnectionFailure, OperationFailure
 from pymongo.server_api import ServerApi
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
+from matcher_index import student_index
+from matcher_snapshot import StudentSnapshot, load_latest_snapshot, save_snapshot
+from tracing import tracer
 
 # Load environment variables
 load_dotenv()
 
+class StudentChangeSync:
+    """
+    Keeps the in-memory student index in line with the `students` collection.
+    Tails a change stream when the server supports it (replica sets / Atlas)
+    and falls back to polling on the `updated_at` watermark otherwise.
+    """
+
+    # Re-read this much before the watermark to tolerate clock skew between writers
+    POLL_OVERLAP = timedelta(seconds=2)
+
+    def __init__(self, mongo, index):
+        self.mongo = mongo
+        self.index = index
+        self.poll_interval = float(os.getenv("STUDENT_SYNC_POLL_SECONDS", "2"))
+        # Deletes are invisible to the watermark query, so reconcile ids now and then
+        self.reconcile_every = int(os.getenv("STUDENT_SYNC_RECONCILE_POLLS", "30"))
+        # Optional memory-mapped snapshot shared by every worker on the host. Deltas since it
+        # was written are folded into a new version once the overlay would need compacting,
+        # or after this long, so cold starts replay little and the base stays shared
+        self.snapshot_dir = os.getenv("MATCHER_SNAPSHOT_DIR")
+        self.snapshot_refresh_seconds = float(os.getenv("MATCHER_SNAPSHOT_REFRESH_SECONDS", "3600"))
+        self._snapshot_mapped_at = None
+        self.mode = "stopped"
+        self.is_ready = False
+        self.events_applied = 0
+        self.last_synced_at = None
+        self.last_event_lag_seconds = None
+        self._watermark = None
+        self._recently_applied = {}
+        self._resume_token = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background sync thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="student-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.mode = "stopped"
+        self.is_ready = False
+
+    def metrics(self):
+        lag = None
+        if self.last_synced_at is not None:
+            lag = round(time.time() - self.last_synced_at, 3)
+        return {
+            "mode": self.mode,
+            "ready": self.is_ready,
+            "indexed_students": len(self.index),
+            "events_applied": self.events_applied,
+            "lag_seconds": lag,
+            "last_event_lag_seconds": self.last_event_lag_seconds,
+            "snapshot": self.index.snapshot.manifest["version"] if self.index.snapshot is not None else None,
+            "overlay_rows": len(self.index.features.overlay),
+        }
+
+    def _collection(self):
+        return self.mongo.db.students if self.mongo.is_connected else None
+
+    def _run(self):
+        while not self._stop.is_set():
+            students_db = self._collection()
+            if students_db is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            try:
+                stream = self._open_change_stream(students_db)
+                if stream is None:
+                    self._run_polling(students_db)
+                else:
+                    self._run_change_stream(students_db, stream)
+            except Exception as e:
+                print(f"❌ Student sync error: {e}")
+                self.is_ready = False
+                self._stop.wait(self.poll_interval)
+
+    def _open_change_stream(self, students_db):
+        """Open a change stream on students, or return None if the server can't provide one"""
+        try:
+            return students_db.watch(
+                full_document="updateLookup",
+                resume_after=self._resume_token,
+                max_await_time_ms=1000,
+            )
+        except ConnectionFailure:
+            raise
+        except OperationFailure as e:
+            if self._resume_token is None:
+                print(f"ℹ️ Change streams unavailable ({e}), polling students instead")
+                return None
+            # Resume point fell off the oplog: start over from a full load
+            print(f"⚠️ Change stream could not resume ({e}), reloading students")
+            self._resume_token = None
+            self.is_ready = False
+            return self._open_change_stream(students_db)
+        except Exception as e:
+            # Local stand-ins such as mongomock don't implement watch() at all
+            print(f"ℹ️ Change streams unavailable ({e}), polling students instead")
+            return None
+
+    def _initial_load(self, students_db):
+        """Start from the on-disk snapshot when there is one, else read everything"""
+        snapshot = load_latest_snapshot(self.snapshot_dir) if self.snapshot_dir else None
+        if snapshot is None:
+            self._full_load(students_db)
+            if self.snapshot_dir:
+                self._write_snapshot()
+            return
+
+        started = time.time()
+        self.index.attach_snapshot(snapshot)
+        self._snapshot_mapped_at = time.time()
+        self._watermark = snapshot.watermark
+        self._recently_applied = {}
+        # Replay whatever changed since the snapshot was taken
+        self._poll_once(students_db)
+        self._reconcile_deletes(students_db)
+        self.last_synced_at = started
+        self.is_ready = True
+        print(f"📦 Student index mapped from snapshot {snapshot.manifest['version']} "
+              f"({snapshot.count} students, {len(self.index.features.overlay)} deltas replayed)")
+        self._maintain_index()
+
+    def _maintain_index(self):
+        """Keep the overlay small: fold it into a new snapshot version if we have a directory, else compact"""
+        if not self.snapshot_dir or self.index.snapshot is None:
+            self.index.compact_if_needed()
+            return
+        overlay = len(self.index.features.overlay)
+        stale = self._snapshot_mapped_at is not None and \
+            time.time() - self._snapshot_mapped_at >= self.snapshot_refresh_seconds
+        if self.index.features.needs_compaction() or (overlay and stale):
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        """Write the index as a new snapshot version and map this worker onto it"""
+        try:
+            # Held throughout, so the snapshot is exactly the index being replaced
+            with self.index._lock:
+                path = save_snapshot(self.index, self.snapshot_dir, self._watermark)
+                self.index.remap_snapshot(StudentSnapshot(path))
+            self._snapshot_mapped_at = time.time()
+            print(f"📦 Matcher snapshot written to {path}")
+        except Exception as e:
+            print(f"⚠️ Could not write matcher snapshot: {e}")
+            self.index.compact_if_needed()
+
+    def _full_load(self, students_db):
+        started = time.time()
+        docs = list(students_db.find())
+        self.index.load(docs)
+        self._recently_applied = {}
+        for doc in docs:
+            self._advance_watermark(doc)
+            self._recently_applied[str(doc["_id"])] = doc.get("updated_at") or doc.get("created_at")
+        self.last_synced_at = started
+        self.is_ready = True
+        print(f"📇 Student index loaded with {len(docs)} students")
+
+    def _run_change_stream(self, students_db, stream):
+        # The stream is opened before the full load so nothing written in between is lost
+        with stream:
+            if self._resume_token is None or not self.is_ready:
+                self._initial_load(students_db)
+            self.mode = "change_stream"
+            while not self._stop.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is None:
+                    # Caught up with the server
+                    self.last_synced_at = time.time()
+                    self._maintain_index()
+                    continue
+                if not self._apply_change(change):
+                    # Collection dropped or renamed: reopen the stream and reload
+                    self._resume_token = None
+                    self.is_ready = False
+                    return
+                self._resume_token = stream.resume_token
+
+    def _apply_change(self, change):
+        """Apply one change event, returning False if the stream was invalidated"""
+        operation = change["operationType"]
+        if operation in ("insert", "update", "replace"):
+            doc = change.get("fullDocument")
+            if doc is None:
+                # Deleted again before the lookup ran
+                self.index.remove(str(change["documentKey"]["_id"]))
+            else:
+                self.index.upsert(doc)
+                # Kept current so a snapshot written now knows where to replay from
+                self._advance_watermark(doc)
+        elif operation == "delete":
+            self.index.remove(str(change["documentKey"]["_id"]))
+        elif operation in ("drop", "rename", "dropDatabase", "invalidate"):
+            return False
+        else:
+            return True
+
+        self.events_applied += 1
+        self.last_synced_at = time.time()
+        cluster_time = change.get("clusterTime")
+        if cluster_time is not None:
+            self.last_event_lag_seconds = round(self.last_synced_at - cluster_time.time, 3)
+        return True
+
+    def _run_polling(self, students_db):
+        self.mode = "polling"
+        if not self.is_ready:
+            self._initial_load(students_db)
+
+        polls = 0
+        while not self._stop.wait(self.poll_interval):
+            if self._collection() is None:
+                self.is_ready = False
+                return
+            polls += 1
+            self._poll_once(students_db)
+            if self.reconcile_every and polls % self.reconcile_every == 0:
+                self._reconcile_deletes(students_db)
+            self._maintain_index()
+
+    def _poll_once(self, students_db):
+        started = time.time()
+        if self._watermark is None:
+            query = {}
+        else:
+            since = self._watermark - self.POLL_OVERLAP
+            query = {"$or": [
+                {"updated_at": {"$gt": since}},
+                {"updated_at": {"$exists": False}, "created_at": {"$gt": since}},
+            ]}
+        for doc in students_db.find(query):
+            student_id = str(doc["_id"])
+            changed_at = doc.get("updated_at") or doc.get("created_at")
+            if self._recently_applied.get(student_id) == changed_at:
+                # Already applied: only re-read because of the overlap window
+                continue
+            self.index.upsert(doc)
+            self._advance_watermark(doc)
+            self._recently_applied[student_id] = changed_at
+            self.events_applied += 1
+            if isinstance(changed_at, datetime):
+                self.last_event_lag_seconds = round((datetime.utcnow() - changed_at).total_seconds(), 3)
+
+        if self._watermark is not None:
+            horizon = self._watermark - self.POLL_OVERLAP
+            self._recently_applied = {
+                student_id: changed_at
+                for student_id, changed_at in self._recently_applied.items()
+                if isinstance(changed_at, datetime) and changed_at > horizon
+            }
+        self.last_synced_at = started
+
+    def _reconcile_deletes(self, students_db):
+        live_ids = {str(doc["_id"]) for doc in students_db.find({}, {"_id": 1})}
+        for student_id in set(self.index.all_ids()) - live_ids:
+            self.index.remove(student_id)
+            self.events_applied += 1
+
+    def _advance_watermark(self, doc):
+        changed_at = doc.get("updated_at") or doc.get("created_at")
+        if isinstance(changed_at, datetime) and (self._watermark is None or changed_at > self._watermark):
+            self._watermark = changed_at
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """Records every Mongo command issued inside a traced request as a child span"""
+
+    def __init__(self):
+        self._open = {}
+
+    def started(self, event):
+        # Pymongo calls this on the issuing thread, so the request's trace context is current
+        span = tracer.start_span(f"mongo.{event.command_name}", database=event.database_name)
+        if span is None:
+            return
+        collection = event.command.get(event.command_name)
+        if isinstance(collection, str):
+            span.set("collection", collection)
+        self._open[event.request_id] = span
+
+    def succeeded(self, event):
+        span = self._open.pop(event.request_id, None)
+        if span is not None:
+            tracer.finish(span)
+
+    def failed(self, event):
+        span = self._open.pop(event.request_id, None)
+        if span is not None:
+            span.status = "error"
+            span.set("error", str(event.failure)[:200])
+            tracer.finish(span)
+
+
 class MongoDB:
     def __init__(self):
         self.client = None
         self.db = None
         self.is_connected = False
+        self.student_sync = StudentChangeSync(self, student_index)
         
     def connect(self):
         """Connect to MongoDB Atlas synchronously"""
@@ -29,7 +338,8 @@ class MongoDB:
                 connection_string,
                 server_api=ServerApi('1'),
                 serverSelectionTimeoutMS=30000,
-                connectTimeoutMS=30000
+                connectTimeoutMS=30000,
+                event_listeners=[MongoCommandTracer()] if tracer.enabled else []
             )
             self.db = self.client.udem_campus_connect
             
@@ -38,6 +348,7 @@ class MongoDB:
             self.is_connected = True
             print("✅ Successfully connected to MongoDB Atlas!")
             print("📊 Database: udem_campus_connects")
+            self.ensure_indexes()
             return True
             
         except Exception as e:
@@ -45,8 +356,17 @@ class MongoDB:
             self.is_connected = False
             return False
     
+    def ensure_indexes(self):
+        """Indexes shared by several components, whatever mode the student sync runs in"""
+        try:
+            # Polling sync watermark and incremental student exports
+            self.db.students.create_index("updated_at")
+        except Exception as e:
+            print(f"⚠️ Could not create updated_at index: {e}")
+    
     def close(self):
         """Close MongoDB connection"""
+        self.student_sync.stop()
         if self.client:
             self.client.close()
             self.is_connected = False
@@ -62,6 +382,15 @@ def get_students_collection():
 def get_matches_collection():
     return database.db.matches if database.is_connected else None
 
+def get_match_jobs_collection():
+    return database.db.match_jobs if database.is_connected else None
+
+def get_events_collection():
+    return database.db.events if database.is_connected else None
+
+def get_event_registrations_collection():
+    return database.db.event_registrations if database.is_connected else None
+
 def get_challenges_collection():
     return database.db.challenges if database.is_connected else None
 
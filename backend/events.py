@@ -0,0 +1,342 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from uuid import uuid4
+
+import numpy as np
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# Only matches an event with a seat left, so the $inc below can never oversell
+HAS_SEAT = {"$or": [
+    {"maxCapacity": None},
+    {"$expr": {"$lt": ["$participants", "$maxCapacity"]}},
+]}
+
+# Events shown before the events collection existed; seeded into an empty collection,
+# dated `days_ahead` from the seeding day so they show up as upcoming
+SEED_EVENTS = [
+    {
+        "id": "1",
+        "title": "International Food Fair",
+        "description": "Taste foods from around the world with fellow students",
+        "category": "cultural",
+        "days_ahead": 14,
+        "time": "18:00",
+        "location": "University Center",
+        "imageUrl": "/images/food-fair.jpg",
+        "participants": 156,
+        "maxCapacity": 200,
+        "interests": ["cooking", "travel"],
+    },
+    {
+        "id": "2",
+        "title": "French Conversation Cafe",
+        "description": "Practice French in a relaxed cafe setting",
+        "category": "language",
+        "days_ahead": 11,
+        "time": "16:00",
+        "location": "Campus Cafe",
+        "imageUrl": "/images/french-cafe.jpg",
+        "participants": 42,
+        "maxCapacity": 50,
+        "interests": ["coffee"],
+    },
+]
+
+
+def seed_events(now: datetime) -> List[dict]:
+    """SEED_EVENTS dated relative to `now`"""
+    events = []
+    for seed in SEED_EVENTS:
+        event = {key: value for key, value in seed.items() if key != "days_ahead"}
+        event["date"] = (now + timedelta(days=seed["days_ahead"])).strftime("%Y-%m-%d")
+        events.append(event)
+    return events
+
+
+class EventNotFoundError(Exception):
+    """Raised when an event id doesn't exist"""
+
+
+class EventFullError(Exception):
+    """Raised when an event has no seat left"""
+
+
+class AlreadyRegisteredError(Exception):
+    """Raised when a student RSVPs twice to the same event"""
+
+
+class EventExistsError(Exception):
+    """Raised when creating an event with an id that is already taken"""
+
+
+class EventStore:
+    """
+    Events and RSVPs persisted in Mongo.
+    `date` is an ISO YYYY-MM-DD string, so date ranges are plain indexed
+    string comparisons. RSVPs are one document per (event, student) under a
+    unique index; the seat itself is taken with a single conditional $inc.
+    """
+
+    def __init__(self, get_events: Callable, get_registrations: Callable):
+        self.get_events = get_events
+        self.get_registrations = get_registrations
+
+    def setup(self):
+        """Create indexes and seed the original events into an empty collection"""
+        events_db = self.get_events()
+        try:
+            events_db.create_index("id", unique=True)
+            events_db.create_index([("date", 1), ("time", 1)])
+            events_db.create_index([("category", 1), ("date", 1)])
+            self.get_registrations().create_index([("event_id", 1), ("student_id", 1)], unique=True)
+            self.get_registrations().create_index("student_id")
+        except Exception as e:
+            print(f"⚠️ Could not create event indexes: {e}")
+        if events_db.count_documents({}, limit=1) == 0:
+            events_db.insert_many(seed_events(datetime.utcnow()))
+
+    def find_range(self, start: Optional[str] = None, end: Optional[str] = None,
+                   category: Optional[str] = None, limit: int = 100) -> List[dict]:
+        """Events between `start` and `end` (inclusive dates), soonest first"""
+        query = {}
+        if start or end:
+            query["date"] = {}
+            if start:
+                query["date"]["$gte"] = start
+            if end:
+                query["date"]["$lte"] = end
+        if category:
+            query["category"] = category
+        cursor = self.get_events().find(query, {"_id": 0}).sort([("date", 1), ("time", 1)]).limit(limit)
+        return list(cursor)
+
+    def create(self, event: dict) -> dict:
+        event = dict(event)
+        event["id"] = event.get("id") or uuid4().hex
+        event["participants"] = 0
+        try:
+            self.get_events().insert_one(event)
+        except DuplicateKeyError:
+            raise EventExistsError(f"Event '{event['id']}' already exists")
+        event.pop("_id", None)
+        return event
+
+    def register(self, event_id: str, student_id: str) -> dict:
+        """RSVP `student_id` to `event_id`; returns the updated event"""
+        registrations_db = self.get_registrations()
+        registration = {"event_id": event_id, "student_id": student_id}
+        try:
+            registrations_db.insert_one({**registration, "registered_at": datetime.utcnow()})
+        except DuplicateKeyError:
+            raise AlreadyRegisteredError("Student is already registered for this event")
+
+        # BEFORE, not AFTER: the filter stops matching once the last seat is taken,
+        # and some drivers/mocks re-apply it to fetch the updated document
+        event = self.get_events().find_one_and_update(
+            {"id": event_id, **HAS_SEAT},
+            {"$inc": {"participants": 1}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if event is None:
+            registrations_db.delete_one(registration)
+            if self.get_events().count_documents({"id": event_id}, limit=1) == 0:
+                raise EventNotFoundError(f"Event '{event_id}' not found")
+            raise EventFullError("Event is full")
+        event["participants"] = event.get("participants", 0) + 1
+        return event
+
+    def registered_event_ids(self, student_ids: List[str]) -> set:
+        cursor = self.get_registrations().find({"student_id": {"$in": student_ids}}, {"_id": 0, "event_id": 1})
+        return {registration["event_id"] for registration in cursor}
+
+    def upcoming(self) -> List[dict]:
+        today = datetime.utcnow().strftime("%Y-%m-%d")
+        return self.find_range(start=today, limit=int(os.getenv("EVENTS_MAX_UPCOMING", "1000")))
+
+
+class EventRecommender:
+    """
+    Per-student event recommendations, precomputed.
+    Upcoming events are scored by how many of their interest tags a student
+    lists, using the matcher's interest vocabulary; ties go to the sooner
+    event, and events sharing no interest aren't recommended. Everyone is
+    recomputed in blocks of one matrix product when the events or the whole
+    student index change (or enough students did); students changed in
+    between are rescored on read (StudentIndex listener).
+    """
+
+    BLOCK_ROWS = 10000
+    # Recompute everyone once this share of students changed since the last bulk run
+    RECOMPUTE_RATIO = 0.1
+    RECOMPUTE_MIN_STUDENTS = 1000
+
+    def __init__(self, index, store: EventStore, per_student: int = 5):
+        self.index = index
+        self.store = store
+        self.per_student = per_student
+        self.refresh_seconds = float(os.getenv("EVENTS_REFRESH_SECONDS", "60"))
+        self.events: List[dict] = []
+        self.events_by_id: Dict[str, dict] = {}
+        # Bulk results: row per student of event positions (in self.events) and overlaps, best first
+        self._rows: Dict[str, int] = {}
+        self._top = np.zeros((0, 0), dtype=np.int32)
+        self._overlap = np.zeros((0, 0), dtype=np.int16)
+        # Students changed since the last bulk computation: (sequence, interests or None if deleted),
+        # scored on first read
+        self._changed: Dict[str, tuple] = {}
+        self._sequence = 0
+        self.computed_at = None
+        self._fingerprint = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-recommender", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def refresh(self, force: bool = False):
+        """Reload upcoming events and recompute everyone (only if they changed, unless `force`)"""
+        try:
+            events = self.store.upcoming()
+        except Exception as e:
+            print(f"❌ Could not load events: {e}")
+            return
+        fingerprint = [(event["id"], tuple(event.get("interests") or [])) for event in events]
+        if not force and fingerprint == self._fingerprint and not self._needs_recompute():
+            # Same events in the same order: only seat counts may have moved
+            with self._lock:
+                self.events = events
+                self.events_by_id = {event["id"]: event for event in events}
+            return
+        # Computed before taking our lock: listeners take the index lock first, then ours.
+        # Changes arriving meanwhile are newer than `sequence` and survive the swap.
+        sequence = self._sequence
+        computed = self._recommend_all(events)
+        with self._lock:
+            self.events = events
+            self.events_by_id = {event["id"]: event for event in events}
+            self._fingerprint = fingerprint
+            self._store(computed, sequence)
+
+    def on_event_changed(self, event: dict):
+        """Keep the cached copy current (e.g. participants after an RSVP)"""
+        with self._lock:
+            if event["id"] in self.events_by_id:
+                self.events_by_id[event["id"]].update(event)
+
+    def on_index_event(self, event: str, student_id: Optional[str], doc: Optional[dict]):
+        """StudentIndex listener"""
+        with self._lock:
+            self._sequence += 1
+            if event == "reset":
+                # Recompute with freshly loaded events, off the index lock. Before start(),
+                # its first refresh does it.
+                if self._thread is not None and not self._stop.is_set():
+                    threading.Thread(
+                        target=self.refresh, kwargs={"force": True}, name="event-refresh", daemon=True
+                    ).start()
+            elif event == "upsert":
+                self._changed[student_id] = (self._sequence, list(doc.get("interests") or []))
+            elif event == "delete":
+                self._changed[student_id] = (self._sequence, None)
+
+    def for_student(self, student_id: str) -> List[tuple]:
+        """[(event, overlap)] for a student, skipping events that are now full or share no interest"""
+        with self._lock:
+            if student_id in self._changed:
+                _, interests = self._changed[student_id]
+                recommended = self._recommend(interests) if interests is not None else []
+            else:
+                row = self._rows.get(student_id)
+                if row is None:
+                    return []
+                recommended = [
+                    (self.events[position]["id"], overlap)
+                    for position, overlap in zip(self._top[row].tolist(), self._overlap[row].tolist())
+                    # Rows have a fixed width, padded with whatever came next
+                    if overlap > 0
+                ]
+            found = []
+            for event_id, overlap in recommended:
+                event = self.events_by_id.get(event_id)
+                if event is None:
+                    continue
+                capacity = event.get("maxCapacity")
+                if capacity is not None and event.get("participants", 0) >= capacity:
+                    continue
+                found.append((dict(event), overlap))
+            return found
+
+    def metrics(self):
+        return {
+            "upcoming_events": len(self.events),
+            "precomputed_students": len(self._rows),
+            "changed_students": len(self._changed),
+            "computed_at": self.computed_at,
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.refresh_seconds)
+
+    def _needs_recompute(self) -> bool:
+        threshold = max(self.RECOMPUTE_MIN_STUDENTS, int(len(self._rows) * self.RECOMPUTE_RATIO))
+        return len(self._changed) > threshold
+
+    def _recommend(self, interests: List[str]) -> List[tuple]:
+        interests = set(interests)
+        scored = []
+        # self.events is sorted soonest first, so the position breaks ties
+        for position, event in enumerate(self.events):
+            overlap = len(interests.intersection(event.get("interests") or []))
+            if overlap:
+                scored.append((-overlap, position, event["id"], overlap))
+        scored.sort()
+        return [(event_id, overlap) for _, _, event_id, overlap in scored[:self.per_student]]
+
+    def _store(self, computed, sequence: int):
+        self._rows, self._top, self._overlap = computed
+        self._changed = {sid: change for sid, change in self._changed.items() if change[0] > sequence}
+        self.computed_at = datetime.utcnow().isoformat()
+
+    def _recommend_all(self, events: List[dict]):
+        """(row by student id, top event positions, overlaps) for every indexed student"""
+        ids, students, vocab = self.index.interest_rows()
+        k = min(self.per_student, len(events))
+        top_positions = np.zeros((len(ids), k), dtype=np.int32)
+        top_overlaps = np.zeros((len(ids), k), dtype=np.int16)
+        if k:
+            # Event tags as columns of the matcher vocabulary (a tag no student lists can't overlap)
+            tags = np.zeros((len(vocab), len(events)), dtype=np.float32)
+            for position, event in enumerate(events):
+                for interest in event.get("interests") or []:
+                    column = vocab.get(interest)
+                    if column is not None:
+                        tags[column, position] = 1
+            count = len(events)
+            # Sooner events get the larger tie-breaker
+            tie_breaker = np.arange(count - 1, -1, -1, dtype=np.float32)
+            for block_start in range(0, len(ids), self.BLOCK_ROWS):
+                block_end = block_start + self.BLOCK_ROWS
+                # float32 so the product goes through BLAS; overlaps are small exact integers
+                overlap = students[block_start:block_end].astype(np.float32) @ tags
+                ranking = overlap * count + tie_breaker
+                if k < count:
+                    top = np.argpartition(-ranking, k - 1, axis=1)[:, :k]
+                else:
+                    top = np.tile(np.arange(count), (len(ranking), 1))
+                order = np.argsort(-np.take_along_axis(ranking, top, axis=1), axis=1)
+                top = np.take_along_axis(top, order, axis=1)
+                top_positions[block_start:block_end] = top
+                top_overlaps[block_start:block_end] = np.take_along_axis(overlap, top, axis=1)
+        return dict(zip(ids, range(len(ids)))), top_positions, top_overlaps
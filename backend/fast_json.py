@@ -0,0 +1,39 @@
+import orjson
+from bson import ObjectId
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+# Student fields the API never returns: bookkeeping written by the backend itself.
+# Everything else in the document (including _id, avatar_url, is_active and
+# completed_challenges) is returned as stored, as before the fast path.
+STUDENT_INTERNAL_FIELDS = (
+    "updated_at",  # watermark for the student index sync
+)
+# Computed once and passed to Mongo as an exclusion projection
+STUDENT_PUBLIC_PROJECTION = {field: 0 for field in STUDENT_INTERNAL_FIELDS}
+
+
+def _default(obj):
+    """Types orjson doesn't know natively, as found in our own Mongo documents"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(Response):
+    """
+    orjson-encoded response for hot routes.
+    Return it directly from the route: FastAPI then skips jsonable_encoder, and
+    ObjectIds / pydantic models are handled by orjson's `default` hook instead.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
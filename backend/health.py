@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+
+
+class HealthSampler:
+    """
+    Refreshes health data in the background so probes never touch MongoDB or
+    OpenAI themselves: estimated student count, Mongo ping latency, student
+    index freshness and LLM reachability. Probes read `state`, which is
+    replaced as a whole on every sample.
+    """
+
+    def __init__(self, mongo, matcher):
+        self.mongo = mongo
+        self.matcher = matcher
+        self.interval = float(os.getenv("HEALTH_SAMPLE_SECONDS", "5"))
+        # Reaching OpenAI is a real HTTP call, so check it less often
+        self.llm_interval = float(os.getenv("HEALTH_LLM_CHECK_SECONDS", "60"))
+        # Index lag above this makes the worker not ready
+        self.max_index_lag = float(os.getenv("HEALTH_MAX_INDEX_LAG_SECONDS", "30"))
+        self.state = {
+            "sampled_at": None,
+            "database": {"connected": False, "ping_ms": None, "error": None},
+            "students_estimated": 0,
+            "student_index": {"ready": False, "lag_seconds": None},
+            "llm": {"status": "unknown", "checked_at": None, "latency_ms": None, "error": None},
+        }
+        self._last_llm_check = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="health-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        # The first sample is taken here too: it pings Mongo and may probe OpenAI for
+        # seconds, so it mustn't hold up worker startup. Until it lands, readiness fails.
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"❌ Health sampling failed: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def sample(self):
+        """Take one sample of every dependency and publish it"""
+        state = dict(self.state)
+        state["database"], state["students_estimated"] = self._sample_database()
+        state["student_index"] = self._sample_index()
+        if time.time() - self._last_llm_check >= self.llm_interval:
+            state["llm"] = self._sample_llm()
+            self._last_llm_check = time.time()
+        state["sampled_at"] = time.time()
+        self.state = state
+
+    def _sample_database(self):
+        if not self.mongo.is_connected:
+            return {"connected": False, "ping_ms": None, "error": "not connected"}, 0
+        try:
+            started = time.perf_counter()
+            self.mongo.client.admin.command("ping")
+            ping_ms = round((time.perf_counter() - started) * 1000, 2)
+            # Reads collection metadata instead of scanning like count_documents({})
+            count = self.mongo.db.students.estimated_document_count()
+            return {"connected": True, "ping_ms": ping_ms, "error": None}, count
+        except Exception as e:
+            return {"connected": False, "ping_ms": None, "error": str(e)}, self.state["students_estimated"]
+
+    def _sample_index(self):
+        metrics = self.mongo.student_sync.metrics()
+        return {
+            "ready": metrics["ready"],
+            "mode": metrics["mode"],
+            "lag_seconds": metrics["lag_seconds"],
+            "indexed_students": metrics["indexed_students"],
+        }
+
+    def _sample_llm(self):
+        checked_at = time.time()
+        if not self.matcher.use_real_ai:
+            return {"status": "not_used", "checked_at": checked_at, "latency_ms": None, "error": None}
+        import urllib.request  # only needed with real AI; kept off the import path at startup
+        request = urllib.request.Request(
+            "https://api.openai.com/v1/models",
+            headers={"Authorization": f"Bearer {self.matcher.openai_api_key}"},
+        )
+        try:
+            started = time.perf_counter()
+            with urllib.request.urlopen(request, timeout=3) as response:
+                response.read(1)
+            latency_ms = round((time.perf_counter() - started) * 1000, 1)
+            return {"status": "reachable", "checked_at": checked_at, "latency_ms": latency_ms, "error": None}
+        except Exception as e:
+            return {"status": "unreachable", "checked_at": checked_at, "latency_ms": None, "error": str(e)}
+
+    def readiness(self):
+        """(ready, checks) computed from the cached state only"""
+        state = self.state
+        sampled_at = state["sampled_at"]
+        lag = state["student_index"]["lag_seconds"]
+        checks = {
+            "sampler_fresh": sampled_at is not None and time.time() - sampled_at < 3 * self.interval,
+            "database": state["database"]["connected"],
+            "student_index": state["student_index"]["ready"] and (lag is None or lag <= self.max_index_lag),
+            "ai_engine": self.matcher.is_ready,
+        }
+        return all(checks.values()), checks
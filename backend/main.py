@@ -1,15 +1,38 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi import File, UploadFile
 from uuid import uuid4
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
-from database_sync import database, get_students_collection
+import threading
+import time
+from database_sync import (
+    database, get_students_collection, get_match_jobs_collection,
+    get_events_collection, get_event_registrations_collection, get_challenges_collection,
+)
+from matcher_index import student_index
+from health import HealthSampler
+from fast_json import FastJSONResponse, STUDENT_PUBLIC_PROJECTION, dumps as fast_json_dumps
+from match_jobs import MatchJobQueue, QueueFullError
+from match_shards import shard_pool_from_env
+from student_search import StudentSearchIndex
+from events import (
+    EventStore, EventRecommender, AlreadyRegisteredError, EventExistsError, EventFullError, EventNotFoundError,
+)
+from challenges import ChallengeCatalog, localized_title
+from models import EventCreate, ChallengeCreate, ChallengeCompletion
+from tracing import tracer, TracingMiddleware
+from traffic_capture import traffic_recorder, TrafficCaptureMiddleware
 from ai_matcher import BilingualAIMatcher, StudentProfile, MatchResult
-from typing import List
+from typing import List, Literal, Optional
 import json
 from datetime import datetime
 from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from pydantic import BaseModel
 
 app = FastAPI(
@@ -26,20 +49,85 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
+# Root span per request; spans are exported when TRACE_EXPORT is set
+app.add_middleware(TracingMiddleware, tracer=tracer)
+
+# Anonymized matching traffic for replay_traffic.py when TRAFFIC_CAPTURE is set
+app.add_middleware(TrafficCaptureMiddleware, recorder=traffic_recorder)
+
 # Initialize our AI components
 matcher = BilingualAIMatcher()
 
+# Typo-tolerant student search, fed by the student index
+student_search = StudentSearchIndex(student_index)
+student_index.add_listener(student_search.on_index_event)
+
+# Persisted events and RSVPs, with per-student recommendations kept up to date in memory
+event_store = EventStore(get_events_collection, get_event_registrations_collection)
+event_recommender = EventRecommender(student_index, event_store)
+student_index.add_listener(event_recommender.on_index_event)
+
+# Challenge catalogue held in memory with an interest -> challenges index
+challenge_catalog = ChallengeCatalog(get_challenges_collection)
+
+# Optional scatter-gather matching over local shard processes (MATCHER_SHARDS > 0)
+shard_pool = shard_pool_from_env(student_index)
+
+# Probes read cached state refreshed by this sampler
+health_sampler = HealthSampler(database, matcher)
+
+# Optional: only the N best locally ranked candidates get the full (possibly LLM) analysis.
+# 0 (the default) keeps every student a candidate, as before the index existed.
+MATCH_SHORTLIST_SIZE = int(os.getenv("MATCH_SHORTLIST_SIZE", "0"))
+
+# Background match computations; results are stored in the match_jobs collection
+match_jobs = MatchJobQueue(
+    compute=lambda student_name, language: jsonable_encoder(_compute_matches(student_name, language)),
+    get_collection=get_match_jobs_collection,
+)
+
+# Concurrent LLM analyses behind the streaming match endpoint
+match_stream_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_STREAM_CONCURRENCY", "4")),
+    thread_name_prefix="match-stream",
+)
+# How often a match stream checks for a departed client while analyses are in flight
+STREAM_DISCONNECT_POLL_SECONDS = float(os.getenv("STREAM_DISCONNECT_POLL_SECONDS", "0.5"))
+
 # Connect to MongoDB on startup
 @app.on_event("startup")
 def startup_event():
     print("🚀 Starting UdeM Campus Connect API...")
-    database.connect()
+    if shard_pool is not None:
+        # Before the sync starts, so the initial load is partitioned too
+        shard_pool.start()
+        student_index.add_listener(shard_pool.on_index_event)
+        if MATCH_SHORTLIST_SIZE <= 0:
+            print("⚠️ MATCHER_SHARDS only ranks shortlists; set MATCH_SHORTLIST_SIZE to use the shards")
+    if database.connect():
+        database.student_sync.start()
+        match_jobs.start()
+        event_store.setup()
+        event_recommender.start()
+        challenge_catalog.setup()
+        challenge_catalog.start()
+    # Load the AI backend off the request path; /api/health/ready reports when it's done
+    threading.Thread(target=matcher.warm_up, name="ai-warm-up", daemon=True).start()
+    health_sampler.start()
 
 @app.on_event("shutdown")
 def shutdown_event():
     print("👋 Shutting down UdeM Campus Connect API...")
+    health_sampler.stop()
+    match_jobs.stop()
+    event_recommender.stop()
+    challenge_catalog.stop()
+    if shard_pool is not None:
+        shard_pool.stop()
+    match_stream_executor.shutdown(wait=False, cancel_futures=True)
     database.close()
 
 @app.get("/")
@@ -53,8 +141,14 @@ async def root():
         "endpoints": {
             "register": "POST /api/students/register",
             "get_matches": "GET /api/students/matches/{student_name}",
+            "stream_matches": "GET /api/students/matches/{student_name}/stream",
+            "submit_match_job": "POST /api/match-jobs",
+            "match_job_status": "GET /api/match-jobs/{job_id}",
             "all_students": "GET /api/students",
-            "health": "GET /api/health"
+            "health": "GET /api/health",
+            "live": "GET /api/health/live",
+            "ready": "GET /api/health/ready",
+            "metrics": "GET /api/metrics"
         }
     }
 
@@ -87,10 +181,13 @@ async def register_student(student: StudentProfile):
         # Convert to dict and insert
         student_data = student.dict()
         if not student_data.get("created_at"):
-            from datetime import datetime
             student_data["created_at"] = datetime.utcnow()
+        # Watermark used by the student index sync when change streams are unavailable
+        student_data["updated_at"] = datetime.utcnow()
 
         result = students_db.insert_one(student_data)
+        # Make the new profile matchable in this worker without waiting for the sync
+        student_index.upsert(student_data)
         student_data["_id"] = str(result.inserted_id)
 
         return {
@@ -129,69 +226,215 @@ async def upload_avatar(file: UploadFile = File(...)):
         print("Error uploading avatar:", e)
         raise HTTPException(status_code=500, detail="Error uploading avatar")
 
+def _student_profile(doc: dict) -> StudentProfile:
+    """Build the matcher's profile model from one of our own student documents (no re-validation)"""
+    return StudentProfile.construct(
+        name=doc["name"],
+        email=doc.get("email", "unknown@umontreal.ca"),
+        interests=doc["interests"],
+        languages=doc["languages"],
+        french_level=doc["french_level"],
+        looking_for=doc["looking_for"],
+        bio=doc["bio"]
+    )
+
+def _load_match_inputs(student_name: str):
+    """Return (student profile, [(candidate id, candidate profile)], total candidates) for a match request"""
+    students_db = get_students_collection()
+    if students_db is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+        
+    # Serve from the in-memory index once the sync has loaded it
+    index_ready = database.student_sync.is_ready
+    with tracer.span("matches.student_lookup", source="index" if index_ready else "mongo") as span:
+        student = student_index.find(student_name) if index_ready else None
+        if student is None:
+            span.set("source", "mongo")
+            student = students_db.find_one({
+                "$or": [
+                    {"username": student_name},
+                    {"name": student_name}
+                ]
+            })
+    if not student:
+        raise HTTPException(status_code=404, detail="❌ Student not found")
+    
+    # Get other students as candidates
+    with tracer.span("matches.candidate_scan", source="index" if index_ready else "mongo") as span:
+        if index_ready and MATCH_SHORTLIST_SIZE <= 0:
+            candidates = student_index.candidates(exclude_name=student.get("name"))
+            total_candidates = len(candidates)
+        elif index_ready:
+            # Rank everyone on the encoded features and keep a shortlist
+            candidates = None
+            if shard_pool is not None and shard_pool.is_ready:
+                try:
+                    candidates = shard_pool.top_candidates(student, MATCH_SHORTLIST_SIZE)
+                    span.set("source", "shards")
+                except Exception as e:
+                    print(f"⚠️ Shard ranking failed for {student_name} ({e}), ranking on the local index")
+                    span.set("shard_error", str(e)[:200])
+            if candidates is None:
+                candidates = student_index.top_candidates(student, MATCH_SHORTLIST_SIZE)
+            total_candidates = len(student_index) - 1
+        else:
+            candidates = list(students_db.find({"name": {"$ne": student_name}}))
+            total_candidates = len(candidates)
+        span.set("candidates", len(candidates))
+    
+    # Convert MongoDB documents to StudentProfile objects
+    with tracer.span("matches.build_profiles", profiles=len(candidates) + 1):
+        candidate_profiles = [(str(candidate["_id"]), _student_profile(candidate)) for candidate in candidates]
+        student_profile = _student_profile(student)
+    return student_profile, candidate_profiles, total_candidates
+
+def _compute_matches(student_name: str, language: str) -> dict:
+    """Run a full match computation; shared by the sync route and match jobs"""
+    current_student_profile, candidate_profiles, total_candidates = _load_match_inputs(student_name)
+    
+    if not candidate_profiles:
+        return {
+            "matches": [], 
+            "message": "👋 No other students registered yet. Be the first! 🎉"
+        }
+    
+    matches = matcher.find_best_matches(current_student_profile, [c for _, c in candidate_profiles], language)
+    
+    return {
+        "student": student_name,
+        "language": language,
+        "total_candidates": total_candidates,
+        "matches_found": len(matches),
+        "matches": matches
+    }
+
 @app.get("/api/students/matches/{student_name}")
 async def get_matches(student_name: str, language: str = "en"):
     """Get AI-curated matches for a student from MongoDB"""
     try:
-        students_db = get_students_collection()
-        if students_db is None:
-            raise HTTPException(status_code=503, detail="Database not available")
-            
-        student = students_db.find_one({
-            "$or": [
-                {"username": student_name},
-                {"name": student_name}
-            ]
-        })
-        if not student:
-            raise HTTPException(status_code=404, detail="❌ Student not found")
-        
-        # Get other students as candidates
-        candidates = list(students_db.find({"name": {"$ne": student_name}}))
-        
-        if not candidates:
-            return {
-                "matches": [], 
-                "message": "👋 No other students registered yet. Be the first! 🎉"
-            }
-        
-        # Convert MongoDB documents to StudentProfile objects
-        candidate_profiles = []
-        for candidate in candidates:
-            candidate_profiles.append(StudentProfile(
-                name=candidate["name"],
-                email=candidate.get("email", "unknown@umontreal.ca"),
-                interests=candidate["interests"],
-                languages=candidate["languages"],
-                french_level=candidate["french_level"],
-                looking_for=candidate["looking_for"],
-                bio=candidate["bio"]
-            ))
-        
-        current_student_profile = StudentProfile(
-            name=student["name"],
-            email=student.get("email", "unknown@umontreal.ca"),
-            interests=student["interests"],
-            languages=student["languages"],
-            french_level=student["french_level"],
-            looking_for=student["looking_for"],
-            bio=student["bio"]
+        # Lookup, shard scatter-gather and LLM calls all block: keep them off the event loop
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, tracer.bind(_compute_matches), student_name, language)
+        return FastJSONResponse(result)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get matches: {str(e)}")
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {fast_json_dumps(data).decode()}\n\n"
+
+def _ranking(results: dict, profiles: dict, limit: int = 3) -> list:
+    """Best `limit` results of a {candidate id: MatchResult} map, tagged with the candidate"""
+    ranked = sorted(results.items(), key=lambda item: item[1].match_score, reverse=True)[:limit]
+    return [
+        {"candidate": profiles[candidate_id].name, "candidate_id": candidate_id, **result.dict()}
+        for candidate_id, result in ranked
+    ]
+
+@app.get("/api/students/matches/{student_name}/stream")
+async def stream_matches(student_name: str, request: Request, language: str = "en"):
+    """
+    Server-sent events version of get_matches: a provisional ranking from the
+    local scorer first, then each refined result and the updated ranking as
+    the LLM analyses finish. Disconnecting cancels the analyses not yet started.
+    """
+    try:
+        student_profile, candidate_profiles, total_candidates = await asyncio.get_running_loop().run_in_executor(
+            None, tracer.bind(_load_match_inputs), student_name
         )
-        
-        matches = matcher.find_best_matches(current_student_profile, candidate_profiles, language)
-        
-        return {
-            "student": student_name,
-            "language": language,
-            "total_candidates": len(candidates),
-            "matches_found": len(matches),
-            "matches": matches
-        }
-        
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get matches: {str(e)}")
+    # Keyed by student id: two students may share a name
+    profiles = {candidate_id: c for candidate_id, c in candidate_profiles if c.name != student_profile.name}
+
+    async def events():
+        results = {candidate_id: matcher.quick_match(student_profile, c, language) for candidate_id, c in profiles.items()}
+        refining = matcher.use_real_ai and matcher.breaker.state != matcher.breaker.OPEN
+        yield _sse("provisional", {
+            "student": student_name,
+            "language": language,
+            "total_candidates": total_candidates,
+            "refining": len(results) if refining else 0,
+            "matches": _ranking(results, profiles),
+        })
+        if not refining:
+            yield _sse("done", {"matches": _ranking(results, profiles)})
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + matcher.request_budget_seconds
+
+        async def analyze(candidate_id, candidate):
+            # bind() keeps the analysis spans in this request's trace
+            result = await loop.run_in_executor(
+                match_stream_executor, tracer.bind(matcher.analyze_match), student_profile, candidate, language, deadline
+            )
+            return candidate_id, result
+
+        pending = {asyncio.ensure_future(analyze(candidate_id, c)) for candidate_id, c in profiles.items()}
+        try:
+            while pending:
+                # Wakes up without a result too, so a client leaving mid-call is noticed right away
+                finished, pending = await asyncio.wait(
+                    pending, timeout=STREAM_DISCONNECT_POLL_SECONDS, return_when=asyncio.FIRST_COMPLETED
+                )
+                if await request.is_disconnected():
+                    return
+                for task in finished:
+                    candidate_id, result = task.result()
+                    results[candidate_id] = result
+                    yield _sse("refined", {
+                        "candidate": profiles[candidate_id].name, "candidate_id": candidate_id, "match": result.dict(),
+                    })
+                    yield _sse("ranking", {"matches": _ranking(results, profiles)})
+            yield _sse("done", {"matches": _ranking(results, profiles)})
+        finally:
+            # Analyses still queued in the executor are dropped; running calls finish on their own
+            for task in pending:
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+class MatchJobRequest(BaseModel):
+    student_name: str
+    language: str = "en"
+    priority: Literal["high", "normal", "low"] = "normal"
+
+@app.post("/api/match-jobs", status_code=202)
+async def submit_match_job(request: MatchJobRequest):
+    """Queue a match computation; poll GET /api/match-jobs/{job_id} for the result"""
+    if get_match_jobs_collection() is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    try:
+        job, deduplicated = match_jobs.submit(request.student_name, request.language, request.priority)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to submit match job: {str(e)}")
+    
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "deduplicated": deduplicated,
+        "queue_depth": match_jobs.depth
+    }
+
+@app.get("/api/match-jobs/{job_id}")
+async def get_match_job(job_id: str):
+    """Status (and, once finished, result) of a match job"""
+    if get_match_jobs_collection() is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    job = match_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Match job not found")
+    return job
 
 @app.get("/api/students")
 async def get_all_students():
@@ -201,19 +444,43 @@ async def get_all_students():
         if students_db is None:
             raise HTTPException(status_code=503, detail="Database not available")
             
-        students = list(students_db.find())
+        students = list(students_db.find({}, STUDENT_PUBLIC_PROJECTION))
         
-        # Convert ObjectId to string for JSON serialization
-        for student in students:
-            student["_id"] = str(student["_id"])
-            
-        return {
+        # ObjectIds are converted by the orjson encoder
+        return FastJSONResponse({
             "total_students": len(students),
             "students": students
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch students: {str(e)}")
 
+@app.get("/api/students/search")
+async def search_students(q: str, limit: int = 20, offset: int = 0):
+    """Prefix and typo-tolerant search over names, usernames, interests and bios"""
+    if not database.student_sync.is_ready:
+        raise HTTPException(status_code=503, detail="Search index is still loading")
+    limit = max(1, min(limit, 100))
+    offset = max(0, offset)
+    
+    with tracer.span("students.search", limit=limit, offset=offset) as span:
+        total, page = student_search.search(q, limit, offset)
+        span.set("total", total)
+    
+    results = []
+    for score, student_id in page:
+        student = student_index.get(student_id)
+        if student is not None:
+            results.append({**student, "score": score})
+    
+    return FastJSONResponse({
+        "query": q,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "results": results
+    })
+
+# Declared after /api/students/search so "search" isn't taken for a student name
 @app.get("/api/students/{value}")
 async def get_student(value: str):
     """Get a specific student's profile by username OR name"""
@@ -227,13 +494,11 @@ async def get_student(value: str):
                 {"username": value},
                 {"name": value}
             ]
-        })
+        }, STUDENT_PUBLIC_PROJECTION)
         if not student:
             raise HTTPException(status_code=404, detail="Student not found")
 
-        
-        student["_id"] = str(student["_id"])
-        return student
+        return FastJSONResponse(student)
     except HTTPException:
         raise
     except Exception as e:
@@ -247,9 +512,10 @@ async def delete_student(student_name: str):
         if students_db is None:
             raise HTTPException(status_code=503, detail="Database not available")
             
-        result = students_db.delete_one({"name": student_name})
-        if result.deleted_count == 0:
+        deleted = students_db.find_one_and_delete({"name": student_name})
+        if deleted is None:
             raise HTTPException(status_code=404, detail="Student not found")
+        student_index.remove(str(deleted["_id"]))
             
         return {"message": f"Student {student_name} deleted successfully"}
     except HTTPException:
@@ -258,45 +524,70 @@ async def delete_student(student_name: str):
         raise HTTPException(status_code=500, detail=f"Failed to delete student: {str(e)}")
 
 @app.get("/api/challenges/suggest/{student_name}")
-async def suggest_challenges(student_name: str, language: str = "en"):
+async def suggest_challenges(student_name: str, language: str = "en", limit: int = 3):
     """Suggest personalized challenges for a student"""
-    try:
+    # Served from memory: the student index and the challenge catalogue
+    student = student_index.find(student_name) if database.student_sync.is_ready else None
+    if student is None:
         students_db = get_students_collection()
         if students_db is None:
             raise HTTPException(status_code=503, detail="Database not available")
-            
-        student = students_db.find_one({"name": student_name})
-        if not student:
-            raise HTTPException(status_code=404, detail="Student not found")
-        
-        # Mock challenge suggestions based on student interests
-        challenges_en = [
-            f"Visit a museum related to {student['interests'][0] if student['interests'] else 'art'}",
-            f"Order coffee in French at a local café",
-            f"Join a {student['interests'][1] if len(student['interests']) > 1 else 'student'} club on campus",
-            "Explore Old Montreal and take photos",
-            "Attend a free campus workshop or event"
-        ]
-        
-        challenges_fr = [
-            f"Visiter un musée lié à {student['interests'][0] if student['interests'] else 'art'}",
-            "Commander un café en français dans un café local",
-            f"Rejoindre un club de {student['interests'][1] if len(student['interests']) > 1 else 'étudiant'} sur le campus",
-            "Explorer le Vieux-Montréal et prendre des photos",
-            "Assister à un atelier ou événement universitaire gratuit"
+        student = students_db.find_one({"$or": [{"username": student_name}, {"name": student_name}]})
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+    
+    suggestions = challenge_catalog.suggest(student, max(1, min(limit, 20)))
+    return {
+        "student": student_name,
+        "language": language,
+        "personalized_challenges": [localized_title(challenge, language) for challenge, _ in suggestions],
+        "challenges": [
+            {
+                "id": challenge["id"],
+                "title": localized_title(challenge, language),
+                "interests": challenge.get("interests") or [],
+                "language": challenge.get("language"),
+                "min_level": challenge.get("min_level"),
+                "shared_interests": shared,
+            }
+            for challenge, shared in suggestions
         ]
-        
-        challenges = challenges_fr if language == "fr" else challenges_en
-        
-        return {
-            "student": student_name,
-            "language": language,
-            "personalized_challenges": challenges[:3]
-        }
-    except HTTPException:
-        raise
+    }
+
+@app.post("/api/challenges")
+async def create_challenge(challenge: ChallengeCreate):
+    """Add a challenge to the catalogue"""
+    if get_challenges_collection() is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    try:
+        created = challenge_catalog.create(challenge.dict())
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail=f"Challenge '{challenge.id}' already exists")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to suggest challenges: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to create challenge: {str(e)}")
+    return {"message": "✅ Challenge created", "challenge": created}
+
+@app.post("/api/challenges/complete")
+async def complete_challenge(request: ChallengeCompletion):
+    """Mark a challenge as completed so it isn't suggested again"""
+    students_db = get_students_collection()
+    if students_db is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    if challenge_catalog.get(request.challenge_id) is None:
+        raise HTTPException(status_code=404, detail=f"Challenge '{request.challenge_id}' not found")
+    student = students_db.find_one_and_update(
+        {"$or": [{"username": request.student_name}, {"name": request.student_name}]},
+        {
+            "$addToSet": {"completed_challenges": request.challenge_id},
+            "$set": {"updated_at": datetime.utcnow()}
+        },
+        return_document=ReturnDocument.AFTER
+    )
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+    student_index.upsert(student)
+    return {"message": "✅ Challenge completed", "completed_challenges": student.get("completed_challenges", [])}
+
 class ConnectionRequest(BaseModel):
     student_id: str
     partner_id: str
@@ -323,60 +614,172 @@ async def get_connections(student_id: str):
         connections_db = database.db.connections
         connections = list(connections_db.find({"student_id": student_id}))
         
-        # Convert ObjectId to string
-        for conn in connections:
-            conn["_id"] = str(conn["_id"])
-            
-        return {"connections": connections}
+        # ObjectIds are converted by the orjson encoder
+        return FastJSONResponse({"connections": connections})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get connections: {str(e)}")
     
+def _validate_date(value: Optional[str]):
+    if value is None:
+        return
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date '{value}', expected YYYY-MM-DD")
+
 @app.get("/api/events")
-async def get_events():
-    """Get Montreal campus events"""
+async def get_events(start: Optional[str] = None, end: Optional[str] = None,
+                     category: Optional[str] = None, limit: int = 100):
+    """Get Montreal campus events, optionally between two dates (YYYY-MM-DD, inclusive)"""
+    if get_events_collection() is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    _validate_date(start)
+    _validate_date(end)
+    try:
+        events = event_store.find_range(start, end, category, max(1, min(limit, 500)))
+        return FastJSONResponse({"events": events})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch events: {str(e)}")
+
+@app.post("/api/events")
+async def create_event(event: EventCreate):
+    """Create a campus event"""
+    if get_events_collection() is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    _validate_date(event.date)
+    try:
+        created = event_store.create(event.dict())
+    except EventExistsError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create event: {str(e)}")
+    # Recommendations include the new event once the recompute finishes
+    threading.Thread(target=event_recommender.refresh, name="event-refresh", daemon=True).start()
+    return {"message": "✅ Event created", "event": created}
+
+class EventRegistrationRequest(BaseModel):
+    student_id: str
+    event_id: str
+
+@app.post("/api/events/register")
+async def register_for_event(request: EventRegistrationRequest):
+    """RSVP a student to an event; never goes past the event's capacity"""
+    if get_events_collection() is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    try:
+        event = event_store.register(request.event_id, request.student_id)
+    except EventNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (EventFullError, AlreadyRegisteredError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
+    event_recommender.on_event_changed(event)
+    return {"message": "✅ Registered successfully", "event": event}
+
+@app.get("/api/events/recommendations/{student_name}")
+async def recommend_events(student_name: str):
+    """Upcoming events sharing the most interests with a student"""
+    if not database.student_sync.is_ready:
+        raise HTTPException(status_code=503, detail="Student index is still loading")
+    student = student_index.find(student_name)
+    if student is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+    
+    # RSVPs may have been made with any of the ids the frontend knows the student by
+    known_ids = [value for value in (student["_id"], student.get("username"), student.get("name")) if value]
+    registered = event_store.registered_event_ids(known_ids)
     events = [
-        {
-            "id": "1",
-            "title": "International Food Fair",
-            "description": "Taste foods from around the world with fellow students",
-            "category": "cultural",
-            "date": "2024-12-15",
-            "time": "18:00",
-            "location": "University Center",
-            "imageUrl": "/images/food-fair.jpg",
-            "participants": 156,
-            "maxCapacity": 200
-        },
-        {
-            "id": "2", 
-            "title": "French Conversation Cafe",
-            "description": "Practice French in a relaxed cafe setting",
-            "category": "language",
-            "date": "2024-12-12",
-            "time": "16:00", 
-            "location": "Campus Cafe",
-            "imageUrl": "/images/french-cafe.jpg",
-            "participants": 42,
-            "maxCapacity": 50
-        }
+        {**event, "interest_overlap": overlap}
+        for event, overlap in event_recommender.for_student(student["_id"])
+        if event["id"] not in registered
     ]
-    return {"events": events}
+    return FastJSONResponse({"student": student_name, "events": events})
     
+def _require_admin(request: Request):
+    """Admin routes need X-Admin-Token to match ADMIN_TOKEN; they're disabled when it isn't set"""
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if request.headers.get("X-Admin-Token") != token:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/api/admin/export/{collection}")
+def export_collection(collection: str, request: Request, format: str = "parquet", since: Optional[str] = None):
+    """
+    Stream students, connections or matches as Parquet or Arrow IPC.
+    The X-Export-Watermark header is the `since` to pass for the next incremental export;
+    those re-read a short overlap before `since`, so dedupe rows on `_id`.
+    """
+    _require_admin(request)
+    # Imported here so pyarrow (optional, and slow to import) stays off the startup path
+    from data_export import CollectionExport, ExportUnavailableError
+    if not database.is_connected:
+        raise HTTPException(status_code=503, detail="Database not available")
+    try:
+        export = CollectionExport(collection, database.db[collection], format, since)
+    except ExportUnavailableError as e:
+        raise HTTPException(status_code=501, detail=f"Exports unavailable: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return StreamingResponse(
+        export.chunks(),
+        media_type=export.media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{collection}.{export.extension}"',
+            "X-Export-Watermark": export.watermark or "",
+        },
+    )
+
 @app.get("/api/health")
 async def health_check():
-    """Health check endpoint"""
-    students_db = get_students_collection()
-    student_count = 0
-    if students_db is not None:
-        student_count = students_db.count_documents({})
+    """Health check endpoint (served from the background sampler's cache)"""
+    state = health_sampler.state
     
     return {
         "status": "✅ healthy",
         "service": "MontrealCampus Connect API",
-        "database": "Connected" if database.is_connected else "Disconnected",
+        "database": "Connected" if state["database"]["connected"] else "Disconnected",
         "ai_engine": "Real OpenAI" if matcher.use_real_ai else "Mock AI",
-        "students_registered": student_count,
-        "features": ["student_matching", "bilingual_support", "mongodb_storage", "real_ai_matching"]
+        "students_registered": state["students_estimated"],
+        "llm_breaker": matcher.breaker.metrics(),
+        "features": ["student_matching", "bilingual_support", "mongodb_storage", "real_ai_matching"],
+        "details": state
+    }
+
+@app.get("/api/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get("/api/health/ready")
+async def readiness_check():
+    """Readiness probe: 200 once the database, student index and AI engine are warm"""
+    ready, checks = health_sampler.readiness()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "warming_up",
+            "checks": checks,
+            "ai_engine": "Real OpenAI" if matcher.use_real_ai else "Mock AI",
+            "ai_backend_load_seconds": matcher.backend_load_seconds,
+        },
+    )
+
+@app.get("/api/metrics")
+async def metrics():
+    """Internal metrics for the in-memory matcher state"""
+    return {
+        "student_sync": database.student_sync.metrics(),
+        "matcher": matcher.metrics(),
+        "match_jobs": {"queue_depth": match_jobs.depth, "max_depth": match_jobs.max_depth},
+        "match_shards": shard_pool.metrics() if shard_pool is not None else None,
+        "event_recommendations": event_recommender.metrics(),
+        "challenges": challenge_catalog.metrics(),
+        "tracing": tracer.metrics(),
+        "traffic_capture": traffic_recorder.metrics(),
+        "health": health_sampler.state
     }
 
 if __name__ == "__main__":
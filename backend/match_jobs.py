@@ -0,0 +1,248 @@
+import itertools
+import os
+import queue
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from uuid import uuid4
+
+from tracing import tracer
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at its maximum depth"""
+
+
+class MatchJobQueue:
+    """
+    Runs match computations outside the request.
+    Jobs are queued in-process by priority and executed by a small pool of
+    worker threads; their status and results live in the `match_jobs`
+    collection so any worker can answer a status poll. Identical jobs that
+    are still pending (or finished recently) are shared instead of recomputed;
+    resubmitting one at a higher priority moves it up the queue; jobs pending
+    on another process are looked up in the collection. Each job records the
+    worker that owns it and a lease the owner keeps renewing; jobs whose lease
+    ran out (their worker died or hung) are taken over, and a worker only
+    runs or finishes jobs it still owns.
+    """
+
+    def __init__(self, compute: Callable[[str, str], dict], get_collection: Callable):
+        self.compute = compute
+        self.get_collection = get_collection
+        self.workers = int(os.getenv("MATCH_JOB_WORKERS", "2"))
+        self.max_depth = int(os.getenv("MATCH_JOB_MAX_DEPTH", "100"))
+        # A finished job is reused for identical submissions within this window
+        self.result_ttl = timedelta(seconds=float(os.getenv("MATCH_JOB_RESULT_TTL_SECONDS", "300")))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        # Renewed every third of the lease while the owner is alive
+        self.lease = timedelta(seconds=float(os.getenv("MATCH_JOB_LEASE_SECONDS", "60")))
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._pending = {}  # (student_name, language) -> job id, while queued or running
+        # job id -> its live [priority, sequence, job] queue entry; re-prioritizing queues a new
+        # entry and older ones are skipped when they come out
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._heartbeat_thread = None
+        self._stop = threading.Event()
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        try:
+            self.get_collection().create_index("id", unique=True)
+            self.get_collection().create_index([("key", 1), ("status", 1)])
+        except Exception as e:
+            print(f"⚠️ Could not create match_jobs indexes: {e}")
+        try:
+            self._recover()
+        except Exception as e:
+            print(f"❌ Could not recover match jobs: {e}")
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"match-job-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="match-job-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for _ in self._threads:
+            self._queue.put([-1, -1, None])
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join(timeout=5)
+            self._heartbeat_thread = None
+
+    def submit(self, student_name: str, language: str = "en", priority: str = "normal"):
+        """Queue a job, or return the identical pending/recent one. Returns (job, deduplicated)"""
+        jobs_db = self.get_collection()
+        key = f"{student_name}:{language}"
+
+        with self._lock:
+            existing_id = self._pending.get((student_name, language))
+            if existing_id is not None:
+                entry = self._entries.get(existing_id)
+                if entry is not None and PRIORITIES[priority] < entry[0]:
+                    # Still queued: requeue it at the higher priority
+                    self._enqueue(entry[2], PRIORITIES[priority])
+                    jobs_db.update_one({"id": existing_id}, {"$set": {"priority": priority}})
+                return self.get(existing_id), True
+
+            # Queued or running on another worker process
+            active = jobs_db.find_one(
+                {"key": key, "status": {"$in": ["queued", "running"]}}, {"_id": 0}, sort=[("created_at", 1)]
+            )
+            if active is not None:
+                return active, True
+
+            recent = jobs_db.find_one(
+                {"key": key, "status": "succeeded", "finished_at": {"$gte": datetime.utcnow() - self.result_ttl}},
+                {"_id": 0},
+                sort=[("finished_at", -1)],
+            )
+            if recent is not None:
+                return recent, True
+
+            if len(self._pending) >= self.max_depth:
+                raise QueueFullError(f"Match job queue is full ({self.max_depth} pending)")
+
+            job = {
+                "id": uuid4().hex,
+                "key": key,
+                "student_name": student_name,
+                "language": language,
+                "priority": priority,
+                "status": "queued",
+                "created_at": datetime.utcnow(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+                # Jobs outlive the request, so they get their own trace linked back to it
+                "trace_id": tracer.current_trace_id(),
+                "owner": self.owner,
+                "lease_until": datetime.utcnow() + self.lease,
+            }
+            jobs_db.insert_one(dict(job))
+            self._pending[(student_name, language)] = job["id"]
+            self._enqueue(job, PRIORITIES[priority])
+            return job, False
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self.get_collection().find_one({"id": job_id}, {"_id": 0})
+
+    def _enqueue(self, job: dict, priority: int):
+        # Caller holds the lock
+        entry = [priority, next(self._sequence), job]
+        self._entries[job["id"]] = entry
+        self._queue.put(entry)
+
+    def _next_job(self) -> Optional[dict]:
+        """Block for the most urgent queued job; None means stop"""
+        while True:
+            entry = self._queue.get()
+            job = entry[2]
+            if job is None:
+                return None
+            with self._lock:
+                if self._entries.get(job["id"]) is entry:
+                    del self._entries[job["id"]]
+                    return job
+            # Superseded by a higher-priority entry for the same job
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.lease.total_seconds() / 3):
+            try:
+                self._renew_leases()
+                self._recover()
+            except Exception as e:
+                print(f"⚠️ Match job heartbeat failed: {e}")
+
+    def _renew_leases(self):
+        self.get_collection().update_many(
+            {"owner": self.owner, "status": {"$in": ["queued", "running"]}},
+            {"$set": {"lease_until": datetime.utcnow() + self.lease}},
+        )
+
+    def _recover(self):
+        """Requeue queued or running jobs whose worker stopped renewing their lease (e.g. a restart)"""
+        jobs_db = self.get_collection()
+        now = datetime.utcnow()
+        orphans = jobs_db.find(
+            {"status": {"$in": ["queued", "running"]},
+             "$or": [{"lease_until": {"$lt": now}}, {"lease_until": None}]},
+            {"_id": 0},
+        ).sort("created_at", 1)
+        recovered = 0
+        for job in list(orphans):
+            # Conditional on the owner and lease we saw, so a renewal or another worker recovering wins
+            claimed = jobs_db.update_one(
+                {"id": job["id"], "status": job["status"], "owner": job.get("owner"),
+                 "lease_until": job.get("lease_until")},
+                {"$set": {"status": "queued", "owner": self.owner, "started_at": None,
+                          "lease_until": now + self.lease}},
+            )
+            if not claimed.modified_count:
+                continue
+            with self._lock:
+                key = (job["student_name"], job["language"])
+                if key in self._pending:
+                    jobs_db.update_one({"id": job["id"]}, {"$set": {
+                        "status": "failed", "finished_at": datetime.utcnow(),
+                        "error": f"Abandoned by its worker; superseded by job {self._pending[key]}",
+                    }})
+                    continue
+                job.update(status="queued", owner=self.owner, started_at=None, lease_until=now + self.lease)
+                self._pending[key] = job["id"]
+                self._enqueue(job, PRIORITIES.get(job.get("priority"), PRIORITIES["normal"]))
+                recovered += 1
+        if recovered:
+            print(f"♻️ Requeued {recovered} match jobs abandoned by their worker")
+
+    def _work(self):
+        while not self._stop.is_set():
+            job = self._next_job()
+            if job is None:
+                return
+            self._run(job)
+
+    def _run(self, job: dict):
+        jobs_db = self.get_collection()
+        update = {"status": "running", "started_at": datetime.utcnow(), "lease_until": datetime.utcnow() + self.lease}
+        claimed = jobs_db.update_one({"id": job["id"], "status": "queued", "owner": self.owner}, {"$set": update})
+        if not claimed.modified_count:
+            # Taken over after we queued it (our lease ran out); the new owner runs the job
+            with self._lock:
+                if self._pending.get((job["student_name"], job["language"])) == job["id"]:
+                    del self._pending[(job["student_name"], job["language"])]
+            return
+        try:
+            with tracer.span("match_job.run", job_id=job["id"], submitted_in_trace=job.get("trace_id")):
+                result = self.compute(job["student_name"], job["language"])
+            update = {"status": "succeeded", "result": result}
+        except Exception as e:
+            # HTTPException carries the useful message in .detail
+            update = {"status": "failed", "error": str(getattr(e, "detail", e))}
+        update["finished_at"] = datetime.utcnow()
+        try:
+            stored = jobs_db.update_one({"id": job["id"], "owner": self.owner}, {"$set": update})
+            if not stored.modified_count:
+                print(f"⚠️ Match job {job['id']} was taken over while it ran; dropping this result")
+        except Exception as e:
+            print(f"❌ Could not store match job {job['id']}: {e}")
+        finally:
+            with self._lock:
+                self._pending.pop((job["student_name"], job["language"]), None)
@@ -0,0 +1,242 @@
+import heapq
+import multiprocessing
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from matcher_index import FEATURE_FIELDS, StudentFeatures, StudentIndex
+from tracing import current_context, remote_span, tracer
+
+# Bands used when partitioning by French level
+FRENCH_LEVEL_BANDS = {"A1": 0, "A2": 0, "B1": 1, "B2": 1, "C1": 2, "C2": 2}
+
+PARTITION_STRATEGIES = ("hash", "language", "french_level")
+
+# Upserts are shipped to workers in batches of this size on bulk loads
+LOAD_BATCH_SIZE = 500
+
+# All a shard needs to rank its students; profiles stay with the coordinator
+SHARD_FIELDS = FEATURE_FIELDS + ("french_level",)
+
+
+def shard_for(doc: dict, shard_count: int, strategy: str) -> int:
+    """
+    Pick the shard a student lives on. Only placement depends on the strategy:
+    the local score rewards shared interests across languages and levels, so
+    every query still goes to every shard.
+    """
+    if strategy == "french_level":
+        band = FRENCH_LEVEL_BANDS.get((doc.get("french_level") or "").upper(), 3)
+        return band % shard_count
+    if strategy == "language":
+        languages = doc.get("languages") or [""]
+        return zlib.crc32(languages[0].encode("utf-8")) % shard_count
+    return zlib.crc32(str(doc["_id"]).encode("utf-8")) % shard_count
+
+
+def _shard_main(connection):
+    """
+    Shard worker loop: holds the encoded features of its partition and answers
+    top-k queries over a pipe with (score, student id) pairs. Messages are
+    (command, *args) tuples; only "top_k" and "stats" send a reply.
+    """
+    features = StudentFeatures()
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        command = message[0]
+        if command == "upsert":
+            for doc in message[1]:
+                features.upsert(doc["_id"], doc)
+            if features.needs_compaction():
+                features.compact()
+        elif command == "delete":
+            features.remove(message[1])
+        elif command == "reset":
+            features.reset()
+        elif command == "top_k":
+            _, query, k, exclude_ids, trace_context = message
+            spans = []
+            with remote_span(trace_context, "shard.top_k", spans, students=len(features)):
+                results = features.top_k_scored(query, k, exclude_ids)
+            connection.send((results, spans))
+        elif command == "stats":
+            connection.send({"students": len(features), "overlay_rows": len(features.overlay)})
+        elif command == "stop":
+            return
+
+
+class _Shard:
+    def __init__(self, number: int, context):
+        self.number = number
+        self.context = context
+        # Guards the pipe; a query holds it from send to reply, so it's per shard
+        self.lock = threading.Lock()
+        # Queries to this shard run here, one at a time, off the caller's thread
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"match-shard-{number}")
+        self.process = None
+        self.connection = None
+
+    def query(self, message, timeout: float):
+        with self.lock:
+            self.connection.send(message)
+            if not self.connection.poll(timeout):
+                raise TimeoutError(f"match shard {self.number} didn't answer within {timeout}s")
+            return self.connection.recv()
+
+    def spawn(self):
+        parent, child = self.context.Pipe()
+        self.process = self.context.Process(
+            target=_shard_main, args=(child,), name=f"match-shard-{self.number}", daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.connection = parent
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            with self.lock:
+                self.connection.send(("stop",))
+        except (OSError, EOFError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ShardPool:
+    """
+    Scatter-gather matching over local worker processes.
+    Partitions the ranking features of the student index into `shard_count`
+    shards (by id hash, primary language or French level band); profiles are
+    not copied, workers answer with student ids. A query goes to every shard,
+    each on its own thread, and the coordinator merges their top-k into the
+    global top-k, the same ranking the index computes locally.
+    """
+
+    def __init__(self, index: StudentIndex, shard_count: int, strategy: str = "hash"):
+        if strategy not in PARTITION_STRATEGIES:
+            raise ValueError(f"Unknown shard strategy '{strategy}', expected one of {PARTITION_STRATEGIES}")
+        self.index = index
+        self.shard_count = shard_count
+        self.strategy = strategy
+        self.timeout_seconds = float(os.getenv("MATCHER_SHARD_TIMEOUT_SECONDS", "2"))
+        # spawn, not fork: the API process has threads (sync, health, pools) running
+        context = multiprocessing.get_context("spawn")
+        self.shards = [_Shard(number, context) for number in range(shard_count)]
+        self._shard_of = {}
+        self.is_ready = False
+        self.queries = 0
+
+    def start(self):
+        for shard in self.shards:
+            shard.spawn()
+        self.is_ready = True
+        print(f"🧩 Started {self.shard_count} match shards partitioned by {self.strategy}")
+
+    def stop(self):
+        self.is_ready = False
+        for shard in self.shards:
+            shard.stop()
+
+    def on_index_event(self, event: str, student_id: Optional[str], doc: Optional[dict]):
+        """StudentIndex listener: route every delta to the shard that owns the student"""
+        if not self.is_ready:
+            return
+        if event == "reset":
+            self._reload()
+        elif event == "upsert":
+            target = shard_for(doc, self.shard_count, self.strategy)
+            previous = self._shard_of.get(student_id)
+            if previous is not None and previous != target:
+                # Partition key changed (e.g. new French level): move the student
+                self._send(previous, ("delete", student_id))
+            self._shard_of[student_id] = target
+            self._send(target, ("upsert", [_shard_doc(student_id, doc)]))
+        elif event == "delete":
+            previous = self._shard_of.pop(student_id, None)
+            if previous is not None:
+                self._send(previous, ("delete", student_id))
+
+    def top_candidates(self, student: dict, k: int) -> List[dict]:
+        """Scatter the query to every shard and merge their top-k, best first"""
+        query = {field: student.get(field) for field in SHARD_FIELDS}
+        exclude = [str(student["_id"])] if student.get("_id") is not None else []
+        with tracer.span("shards.scatter_gather", shards=self.shard_count, k=k):
+            # Workers parent their spans on the scatter span and send them back with the results
+            message = ("top_k", query, k, exclude, current_context())
+            futures = [shard.executor.submit(shard.query, message, self.timeout_seconds) for shard in self.shards]
+            try:
+                replies = [future.result() for future in futures]
+            except (OSError, EOFError, TimeoutError) as e:
+                # A pipe with a lost or late reply can't be trusted any more
+                self.is_ready = False
+                print(f"❌ Match shard failed ({e}), disabling scatter-gather")
+                raise
+            self.queries += 1
+
+            for _, spans in replies:
+                tracer.record_remote(spans)
+            merged = heapq.merge(*(results for results, _ in replies), key=lambda item: item[0], reverse=True)
+            # Students deleted since the shard answered are skipped
+            docs = (self.index.get(student_id) for _, student_id in merged)
+            return [doc for doc in docs if doc is not None][:k]
+
+    def metrics(self):
+        sizes = [0] * self.shard_count
+        for shard_number in self._shard_of.values():
+            sizes[shard_number] += 1
+        return {
+            "ready": self.is_ready,
+            "strategy": self.strategy,
+            "shards": self.shard_count,
+            "students_per_shard": sizes,
+            "queries": self.queries,
+        }
+
+    def _send(self, shard_number: int, message):
+        shard = self.shards[shard_number]
+        try:
+            with shard.lock:
+                shard.connection.send(message)
+        except (OSError, EOFError) as e:
+            self.is_ready = False
+            print(f"❌ Could not reach match shard {shard_number}: {e}")
+
+    def _reload(self):
+        """Repartition the whole index (after a full load or a snapshot attach)"""
+        self._shard_of = {}
+        batches = [[] for _ in self.shards]
+        for shard_number in range(self.shard_count):
+            self._send(shard_number, ("reset",))
+        for student_id in self.index.all_ids():
+            doc = self.index.get(student_id)
+            target = shard_for(doc, self.shard_count, self.strategy)
+            self._shard_of[student_id] = target
+            batches[target].append(_shard_doc(student_id, doc))
+            if len(batches[target]) >= LOAD_BATCH_SIZE:
+                self._send(target, ("upsert", batches[target]))
+                batches[target] = []
+        for shard_number, batch in enumerate(batches):
+            if batch:
+                self._send(shard_number, ("upsert", batch))
+
+
+def _shard_doc(student_id: str, doc: dict) -> dict:
+    return {"_id": student_id, **{field: doc.get(field) for field in SHARD_FIELDS}}
+
+
+def shard_pool_from_env(index: StudentIndex) -> Optional[ShardPool]:
+    """A ShardPool when MATCHER_SHARDS > 0, else None (single-process matching)"""
+    shard_count = int(os.getenv("MATCHER_SHARDS", "0"))
+    if shard_count <= 0:
+        return None
+    return ShardPool(index, shard_count, os.getenv("MATCHER_SHARD_BY", "hash"))
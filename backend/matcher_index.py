@@ -0,0 +1,401 @@
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+# Fields of a student document the matcher actually needs
+INDEXED_FIELDS = (
+    "name",
+    "email",
+    "username",
+    "interests",
+    "languages",
+    "french_level",
+    "looking_for",
+    "bio",
+    "avatar_url",
+    "completed_challenges",
+)
+
+# List fields encoded as one-hot matrices for local scoring
+FEATURE_FIELDS = ("interests", "languages", "looking_for")
+
+# Indexed fields that are always present, as lists (possibly empty)
+LIST_FIELDS = FEATURE_FIELDS + ("completed_challenges",)
+
+CEFR_LEVELS = {"A1": 1, "A2": 2, "B1": 3, "B2": 4, "C1": 5, "C2": 6}
+
+
+def _encode_level(french_level: Optional[str]) -> int:
+    return CEFR_LEVELS.get((french_level or "").upper(), 0)
+
+
+class StudentFeatures:
+    """
+    Encoded student features used to rank candidates locally.
+    A dense base (built by compact() or memory-mapped from a snapshot) plus an
+    overlay of rows changed since. Vocabularies are append-only, so base
+    columns never move when new interests show up.
+    """
+
+    # Fold the overlay into the base once it grows past this share of the rows
+    COMPACT_RATIO = 0.1
+    COMPACT_MIN_ROWS = 1000
+
+    def __init__(self):
+        self.vocab: Dict[str, Dict[str, int]] = {field: {} for field in FEATURE_FIELDS}
+        self.overlay: Dict[str, dict] = {}
+        self.set_base(np.empty(0, dtype="<U24"), {}, {
+            field: np.zeros((0, 0), dtype=np.uint8) for field in FEATURE_FIELDS
+        }, np.zeros(0, dtype=np.int8))
+
+    def __len__(self):
+        return self.base_live_count + len(self.overlay)
+
+    def set_base(self, ids, row_by_id, matrices, levels):
+        """Swap in a new dense base; matrices may be read-only memory maps"""
+        self.base_ids = ids
+        self.base_rows = row_by_id
+        self.base = matrices
+        self.base_level = levels
+        self.base_live = np.ones(len(ids), dtype=bool)
+        self.base_live_count = len(ids)
+
+    def reset(self):
+        self.__init__()
+
+    def encode(self, doc: dict) -> dict:
+        """Turn a profile into column indices, growing the vocabularies as needed"""
+        row = {}
+        for field in FEATURE_FIELDS:
+            vocab = self.vocab[field]
+            columns = []
+            for term in doc.get(field) or []:
+                if term not in vocab:
+                    vocab[term] = len(vocab)
+                columns.append(vocab[term])
+            row[field] = sorted(set(columns))
+        row["french_level"] = _encode_level(doc.get("french_level"))
+        return row
+
+    def upsert(self, student_id: str, doc: dict):
+        self._kill_base_row(student_id)
+        self.overlay[student_id] = self.encode(doc)
+
+    def remove(self, student_id: str):
+        self._kill_base_row(student_id)
+        self.overlay.pop(student_id, None)
+
+    def has_interest(self, interest: str) -> Set[str]:
+        """Ids of students listing `interest`"""
+        column = self.vocab["interests"].get(interest)
+        if column is None:
+            return set()
+        found = set()
+        matrix = self.base["interests"]
+        if column < matrix.shape[1]:
+            rows = np.flatnonzero(matrix[:, column] & self.base_live)
+            found.update(self.base_ids[rows].tolist())
+        found.update(sid for sid, row in self.overlay.items() if column in row["interests"])
+        return found
+
+    def needs_compaction(self) -> bool:
+        threshold = max(self.COMPACT_MIN_ROWS, int(len(self) * self.COMPACT_RATIO))
+        dead = len(self.base_ids) - self.base_live_count
+        return len(self.overlay) + dead > threshold
+
+    def compact(self):
+        """Rebuild a dense in-memory base from the live base rows and the overlay"""
+        live_rows = np.flatnonzero(self.base_live)
+        overlay_ids = list(self.overlay)
+        n = len(live_rows) + len(overlay_ids)
+
+        ids = np.array(self.base_ids[live_rows].tolist() + overlay_ids, dtype=str)
+        matrices = {}
+        for field in FEATURE_FIELDS:
+            matrix = np.zeros((n, len(self.vocab[field])), dtype=np.uint8)
+            old = self.base[field]
+            matrix[:len(live_rows), :old.shape[1]] = old[live_rows]
+            for offset, student_id in enumerate(overlay_ids):
+                matrix[len(live_rows) + offset, self.overlay[student_id][field]] = 1
+            matrices[field] = matrix
+        levels = np.concatenate([
+            self.base_level[live_rows],
+            np.array([self.overlay[sid]["french_level"] for sid in overlay_ids], dtype=np.int8),
+        ])
+
+        self.overlay = {}
+        self.set_base(ids, {sid: row for row, sid in enumerate(ids.tolist())}, matrices, levels)
+
+    def scores(self, doc: dict):
+        """
+        Raw local compatibility score of `doc` against every indexed student.
+        Mirrors BilingualAIMatcher._create_mock_match without the 65-95 clamp:
+        12 per shared interest, 5 per shared goal, 20 for a language fit.
+        Returns (base_scores, overlay_scores) with -1 for dead base rows.
+        """
+        query = {field: self._query_vector(field, doc.get(field) or []) for field in FEATURE_FIELDS}
+        wants_practice = "french_practice" in (doc.get("looking_for") or [])
+        can_help = _encode_level(doc.get("french_level")) >= CEFR_LEVELS["B2"]
+        fr_column = self.vocab["languages"].get("fr")
+        help_column = self.vocab["looking_for"].get("french_help")
+
+        # Dense base, all rows at once
+        base_scores = np.zeros(len(self.base_ids), dtype=np.int32)
+        if len(self.base_ids):
+            interests = self.base["interests"]
+            looking_for = self.base["looking_for"]
+            languages = self.base["languages"]
+            base_scores += 12 * (interests @ query["interests"][:interests.shape[1]]).astype(np.int32)
+            base_scores += 5 * (looking_for @ query["looking_for"][:looking_for.shape[1]]).astype(np.int32)
+            bonus = np.zeros(len(self.base_ids), dtype=bool)
+            if wants_practice and fr_column is not None and fr_column < languages.shape[1]:
+                bonus |= languages[:, fr_column].astype(bool)
+            if can_help and help_column is not None and help_column < looking_for.shape[1]:
+                bonus |= looking_for[:, help_column].astype(bool)
+            base_scores += 20 * bonus
+            base_scores[~self.base_live] = -1
+
+        # Overlay rows, one at a time (small between compactions)
+        query_sets = {field: set(np.flatnonzero(query[field]).tolist()) for field in FEATURE_FIELDS}
+        overlay_scores = {}
+        for student_id, row in self.overlay.items():
+            score = 12 * len(query_sets["interests"].intersection(row["interests"]))
+            score += 5 * len(query_sets["looking_for"].intersection(row["looking_for"]))
+            if (wants_practice and fr_column in row["languages"]) or \
+               (can_help and help_column in row["looking_for"]):
+                score += 20
+            overlay_scores[student_id] = score
+
+        return base_scores, overlay_scores
+
+    def top_k(self, doc: dict, k: int, exclude_ids: Iterable[str] = ()) -> List[str]:
+        """Ids of the `k` best locally scored students, best first"""
+        return [student_id for _, student_id in self.top_k_scored(doc, k, exclude_ids)]
+
+    def top_k_scored(self, doc: dict, k: int, exclude_ids: Iterable[str] = ()) -> List[tuple]:
+        """(score, id) of the `k` best locally scored students, best first"""
+        if k <= 0:
+            return []
+        base_scores, overlay_scores = self.scores(doc)
+        for student_id in exclude_ids:
+            row = self.base_rows.get(student_id)
+            if row is not None:
+                base_scores[row] = -1
+            overlay_scores.pop(student_id, None)
+
+        if len(base_scores) > k:
+            top = np.argpartition(-base_scores, k - 1)[:k]
+        else:
+            top = np.arange(len(base_scores))
+        ranked = [
+            (int(base_scores[row]), self.base_ids[row].item())
+            for row in top.tolist() if base_scores[row] >= 0
+        ]
+        ranked.extend((score, student_id) for student_id, score in overlay_scores.items())
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        return ranked[:k]
+
+    def _query_vector(self, field: str, terms: List[str]):
+        vector = np.zeros(len(self.vocab[field]), dtype=np.uint8)
+        for term in terms:
+            column = self.vocab[field].get(term)
+            if column is not None:
+                vector[column] = 1
+        return vector
+
+    def _kill_base_row(self, student_id: str):
+        row = self.base_rows.get(student_id)
+        if row is not None and self.base_live[row]:
+            self.base_live[row] = False
+            self.base_live_count -= 1
+
+
+class StudentIndex:
+    """
+    In-memory view of the `students` collection used for matching.
+    Keyed by the string form of Mongo's _id so deltas coming from a
+    change stream or a polling query can be applied one document at a time.
+    Profiles can also come from a memory-mapped snapshot (see matcher_snapshot.py);
+    those are decoded lazily and shadowed by any later delta.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.students: Dict[str, dict] = {}
+        self.by_name: Dict[str, str] = {}
+        self.by_username: Dict[str, str] = {}
+        self.features = StudentFeatures()
+        self.snapshot = None
+        self._shadowed: Set[str] = set()
+        self.listeners: List[Callable[[str, Optional[str], Optional[dict]], None]] = []
+        self.version = 0
+
+    def __len__(self):
+        base = self.snapshot.count - len(self._shadowed) if self.snapshot is not None else 0
+        return base + len(self.students)
+
+    def add_listener(self, callback: Callable[[str, Optional[str], Optional[dict]], None]):
+        """
+        Register a callback(event, student_id, doc) fired on every delta.
+        `event` is "upsert", "delete", or "reset" (whole index replaced, no id).
+        """
+        self.listeners.append(callback)
+
+    def load(self, docs):
+        """Replace the whole index with the given documents"""
+        with self._lock:
+            self._clear()
+            self._notify("reset", None, None)
+            for doc in docs:
+                self.upsert(doc)
+            self.features.compact()
+
+    def attach_snapshot(self, snapshot):
+        """Replace the whole index with a loaded StudentSnapshot"""
+        with self._lock:
+            self._map(snapshot)
+            self._notify("reset", None, None)
+
+    def remap_snapshot(self, snapshot):
+        """
+        Swap in a snapshot written from this very index (caller holds the lock
+        since before it was saved): the content doesn't change, so listeners
+        aren't told, but the overlay and private base go back to shared pages.
+        """
+        with self._lock:
+            self._map(snapshot)
+
+    def _map(self, snapshot):
+        self._clear()
+        self.snapshot = snapshot
+        self.features.vocab = {field: dict(snapshot.vocab[field]) for field in FEATURE_FIELDS}
+        self.features.set_base(snapshot.ids, snapshot.row_by_id, {
+            field: snapshot.arrays[field] for field in FEATURE_FIELDS
+        }, snapshot.arrays["french_level"])
+        self.by_name = snapshot.ids_by("names")
+        self.by_username = snapshot.ids_by("usernames")
+        self.version += 1
+
+    def upsert(self, doc: dict) -> str:
+        """Insert or replace one student document"""
+        student_id = str(doc["_id"])
+        # Absent fields stay absent, so doc.get(field, default) behaves as on the Mongo document
+        entry = {field: doc[field] for field in INDEXED_FIELDS if field in doc}
+        entry["_id"] = student_id
+        for field in LIST_FIELDS:
+            entry[field] = list(doc.get(field) or [])
+
+        with self._lock:
+            self._unlink(student_id)
+            self.students[student_id] = entry
+            if self.snapshot is not None and student_id in self.snapshot.row_by_id:
+                self._shadowed.add(student_id)
+            if entry.get("name"):
+                self.by_name[entry["name"]] = student_id
+            if entry.get("username"):
+                self.by_username[entry["username"]] = student_id
+            self.features.upsert(student_id, entry)
+            self.version += 1
+            self._notify("upsert", student_id, entry)
+
+        return student_id
+
+    def remove(self, student_id: str) -> bool:
+        """Drop one student from the index"""
+        with self._lock:
+            if self.get(student_id) is None:
+                return False
+            self._unlink(student_id)
+            self.students.pop(student_id, None)
+            if self.snapshot is not None and student_id in self.snapshot.row_by_id:
+                self._shadowed.add(student_id)
+            self.features.remove(student_id)
+            self.version += 1
+            self._notify("delete", student_id, None)
+
+        return True
+
+    def get(self, student_id: str) -> Optional[dict]:
+        entry = self.students.get(student_id)
+        if entry is None and self.snapshot is not None and student_id not in self._shadowed:
+            entry = self.snapshot.profile(student_id)
+        return entry
+
+    def find(self, value: str) -> Optional[dict]:
+        """Look a student up by username OR name, like the API routes do"""
+        with self._lock:
+            student_id = self.by_username.get(value) or self.by_name.get(value)
+            return self.get(student_id) if student_id else None
+
+    def all_ids(self) -> List[str]:
+        with self._lock:
+            ids = list(self.students)
+            if self.snapshot is not None:
+                ids.extend(sid for sid in self.snapshot.ids.tolist() if sid not in self._shadowed)
+            return ids
+
+    def candidates(self, exclude_name: Optional[str] = None) -> List[dict]:
+        """All indexed students except the one named `exclude_name`"""
+        with self._lock:
+            docs = (self.get(student_id) for student_id in self.all_ids())
+            return [doc for doc in docs if doc.get("name") != exclude_name]
+
+    def top_candidates(self, student: dict, k: int) -> List[dict]:
+        """The `k` students with the best local score for `student`, best first"""
+        with self._lock:
+            exclude = [str(student["_id"])] if student.get("_id") is not None else []
+            return [self.get(student_id) for student_id in self.features.top_k(student, k, exclude)]
+
+    def ids_with_interest(self, interest: str) -> Set[str]:
+        with self._lock:
+            return self.features.has_interest(interest)
+
+    def interest_rows(self):
+        """(student ids, one-hot interests matrix, interest vocabulary) for every live student"""
+        with self._lock:
+            features = self.features
+            vocab = dict(features.vocab["interests"])
+            live_rows = np.flatnonzero(features.base_live)
+            overlay_ids = list(features.overlay)
+            matrix = np.zeros((len(live_rows) + len(overlay_ids), len(vocab)), dtype=np.uint8)
+            base = features.base["interests"]
+            matrix[:len(live_rows), :base.shape[1]] = base[live_rows]
+            for offset, student_id in enumerate(overlay_ids):
+                matrix[len(live_rows) + offset, features.overlay[student_id]["interests"]] = 1
+            ids = features.base_ids[live_rows].tolist() + overlay_ids
+            return ids, matrix, vocab
+
+    def compact_if_needed(self):
+        with self._lock:
+            if self.features.needs_compaction():
+                self.features.compact()
+
+    def _clear(self):
+        self.students = {}
+        self.by_name = {}
+        self.by_username = {}
+        self.snapshot = None
+        self._shadowed = set()
+        self.features.reset()
+
+    def _unlink(self, student_id: str):
+        """Remove secondary index entries pointing at `student_id`"""
+        old = self.get(student_id)
+        if old is None:
+            return
+        if old.get("name") and self.by_name.get(old["name"]) == student_id:
+            del self.by_name[old["name"]]
+        if old.get("username") and self.by_username.get(old["username"]) == student_id:
+            del self.by_username[old["username"]]
+
+    def _notify(self, event: str, student_id: Optional[str], doc: Optional[dict]):
+        for callback in self.listeners:
+            try:
+                callback(event, student_id, doc)
+            except Exception as e:
+                print(f"❌ Student index listener failed: {e}")
+
+
+# Global index shared by the API and the sync component
+student_index = StudentIndex()
@@ -0,0 +1,195 @@
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from matcher_index import FEATURE_FIELDS, INDEXED_FIELDS, StudentIndex
+
+# Bump whenever the on-disk layout changes; older snapshots are ignored.
+# 2: profiles carry completed_challenges
+FORMAT_VERSION = 2
+
+MANIFEST = "manifest.json"
+CURRENT = "CURRENT"
+PROFILES = "profiles.bin"
+ARRAYS = ("ids", "names", "usernames", "profile_offsets", "french_level") + FEATURE_FIELDS
+
+
+class StudentSnapshot:
+    """
+    Read-only, memory-mapped copy of the student index.
+    Every array is opened with mmap so workers on the same host share the
+    page cache; profiles are JSON blobs decoded only when asked for.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {self.manifest.get('format_version')}")
+        # Also catches an INDEXED_FIELDS change that forgot the version bump
+        if self.manifest.get("indexed_fields") != list(INDEXED_FIELDS):
+            raise ValueError("Snapshot was written with different indexed fields")
+
+        self.arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in ARRAYS
+        }
+        self.ids = self.arrays["ids"]
+        self.row_by_id = {student_id: row for row, student_id in enumerate(self.ids.tolist())}
+        self.vocab = {
+            field: {term: column for column, term in enumerate(terms)}
+            for field, terms in self.manifest["vocab"].items()
+        }
+        self._profiles = np.memmap(os.path.join(path, PROFILES), dtype=np.uint8, mode="r") \
+            if self.manifest["count"] else np.zeros(0, dtype=np.uint8)
+        self._cached_profile = lru_cache(maxsize=4096)(self._decode_profile)
+
+    @property
+    def count(self) -> int:
+        return self.manifest["count"]
+
+    @property
+    def watermark(self) -> Optional[datetime]:
+        value = self.manifest.get("watermark")
+        return datetime.fromisoformat(value) if value else None
+
+    def ids_by(self, array: str) -> dict:
+        """Map every non-empty value of `array` (names/usernames) to its student id"""
+        return {
+            value: student_id
+            for value, student_id in zip(self.arrays[array].tolist(), self.ids.tolist())
+            if value
+        }
+
+    def profile(self, student_id: str) -> Optional[dict]:
+        """Decoded profile; a copy, since the decoded one is cached and shared"""
+        profile = self._cached_profile(student_id)
+        if profile is None:
+            return None
+        return {field: list(value) if isinstance(value, list) else value for field, value in profile.items()}
+
+    def _decode_profile(self, student_id: str) -> Optional[dict]:
+        row = self.row_by_id.get(student_id)
+        if row is None:
+            return None
+        offsets = self.arrays["profile_offsets"]
+        start, end = int(offsets[row]), int(offsets[row + 1])
+        return json.loads(self._profiles[start:end].tobytes())
+
+
+def save_snapshot(index: StudentIndex, directory: str, watermark: Optional[datetime]) -> str:
+    """Write `index` as a new snapshot version and point CURRENT at it"""
+    os.makedirs(directory, exist_ok=True)
+    stamp = int(time.time() * 1000)
+    # Versions sort by name; a second write in the same millisecond takes the next one
+    while os.path.exists(os.path.join(directory, f"v{FORMAT_VERSION}-{stamp}")):
+        stamp += 1
+    version = f"v{FORMAT_VERSION}-{stamp}"
+    tmp_path = os.path.join(directory, f".tmp-{version}-{os.getpid()}")
+    os.makedirs(tmp_path)
+
+    with index._lock:
+        index.features.compact()
+        features = index.features
+        ids = features.base_ids.tolist()
+        profiles = [index.get(student_id) for student_id in ids]
+        arrays = {field: features.base[field] for field in FEATURE_FIELDS}
+        arrays["french_level"] = features.base_level
+        vocab = {
+            field: sorted(features.vocab[field], key=features.vocab[field].get)
+            for field in FEATURE_FIELDS
+        }
+
+    offsets = np.zeros(len(profiles) + 1, dtype=np.int64)
+    with open(os.path.join(tmp_path, PROFILES), "wb") as f:
+        for row, profile in enumerate(profiles):
+            blob = json.dumps({field: profile[field] for field in ("_id",) + INDEXED_FIELDS if field in profile},
+                              default=str).encode("utf-8")
+            f.write(blob)
+            offsets[row + 1] = offsets[row] + len(blob)
+
+    arrays["ids"] = np.array(ids, dtype=str)
+    arrays["names"] = np.array([p.get("name") or "" for p in profiles], dtype=str)
+    arrays["usernames"] = np.array([p.get("username") or "" for p in profiles], dtype=str)
+    arrays["profile_offsets"] = offsets
+    for name in ARRAYS:
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(arrays[name]))
+
+    with open(os.path.join(tmp_path, MANIFEST), "w") as f:
+        json.dump({
+            "format_version": FORMAT_VERSION,
+            "version": version,
+            "created_at": datetime.utcnow().isoformat(),
+            "watermark": watermark.isoformat() if watermark else None,
+            "count": len(ids),
+            "indexed_fields": list(INDEXED_FIELDS),
+            "vocab": vocab,
+        }, f)
+
+    final_path = os.path.join(directory, version)
+    os.rename(tmp_path, final_path)
+    # Atomically switch readers over to the new version
+    pointer = os.path.join(directory, f".{CURRENT}-{os.getpid()}")
+    with open(pointer, "w") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(directory, CURRENT))
+    _prune_old_versions(directory, keep=version)
+    return final_path
+
+
+def load_latest_snapshot(directory: str) -> Optional[StudentSnapshot]:
+    """Open the snapshot CURRENT points at, or None if there isn't a usable one"""
+    try:
+        with open(os.path.join(directory, CURRENT)) as f:
+            version = f.read().strip()
+        return StudentSnapshot(os.path.join(directory, version))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠️ Ignoring matcher snapshot in {directory}: {e}")
+        return None
+
+
+def _prune_old_versions(directory: str, keep: str, retain: int = 2):
+    """Keep the newest `retain` versions; workers still mapping older files keep their pages"""
+    versions = sorted(
+        name for name in os.listdir(directory)
+        if name.startswith("v") and os.path.isdir(os.path.join(directory, name))
+    )
+    for name in versions[:-retain]:
+        if name != keep:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def build_snapshot():
+    """Build a fresh snapshot straight from MongoDB"""
+    from database_sync import database, get_students_collection
+
+    directory = os.getenv("MATCHER_SNAPSHOT_DIR", "snapshots")
+    print("🔗 Connecting to MongoDB...")
+    if not database.connect():
+        print("❌ Failed to connect to MongoDB")
+        return
+
+    students_db = get_students_collection()
+    started = datetime.utcnow()
+    index = StudentIndex()
+    index.load(students_db.find())
+    path = save_snapshot(index, directory, started)
+    database.close()
+    print(f"📦 Snapshot of {len(index)} students written to {path}")
+
+
+if __name__ == "__main__":
+    build_snapshot()
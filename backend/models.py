@@ -63,6 +63,7 @@ class EventBase(BaseModel):
     imageUrl: Optional[str] = None
     maxCapacity: Optional[int] = None
     duration: Optional[str] = None
+    interests: List[str] = []   # same terms as student interests, used for recommendations
 
 
 class EventCreate(EventBase):
@@ -104,9 +105,22 @@ class ConnectionPublic(ConnectionInDB):
 
 
 # =========================
-# Challenge response model
+# Challenge models
 # =========================
 
+class ChallengeCreate(BaseModel):
+    id: Optional[str] = None
+    title: dict                 # {"en": ..., "fr": ...}
+    interests: List[str] = []
+    language: Optional[Literal["fr", "en"]] = None
+    min_level: Optional[Literal["A1", "A2", "B1", "B2", "C1", "C2"]] = None
+
+
+class ChallengeCompletion(BaseModel):
+    student_name: str
+    challenge_id: str
+
+
 class ChallengeSuggestionResponse(BaseModel):
     student: str
     language: str
@@ -121,6 +121,9 @@ def create_test_students():
     
     # Insert test students
     print("📝 Inserting test students...")
+    # updated_at lets running API workers pick the new students up when polling
+    for student in test_students:
+        student["updated_at"] = datetime.utcnow()
     result = students_db.insert_many(test_students)
     
     print(f"✅ Successfully inserted {len(result.inserted_ids)} test students!")
@@ -0,0 +1,152 @@
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Optional
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _get_encoder():
+    """tiktoken's encoder when it's installed (it ships with langchain-openai), else None"""
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                try:
+                    import tiktoken
+                    _encoder = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    # Fall back to the ~4 characters per token rule of thumb
+                    _encoder = False
+    return _encoder or None
+
+
+def count_tokens(text: str) -> int:
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` at a word boundary so it fits in `max_tokens`"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:middle]) + "…") <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[:low]) + "…" if low else ""
+
+
+class BioSummaries:
+    """
+    Bios shortened to a token budget, cached per profile.
+    Keeps whole leading sentences while they fit and cuts the next one at a
+    word boundary, so the same bio is only ever tokenized once per budget.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def summarize(self, profile_key: str, bio: str, max_tokens: int) -> str:
+        digest = hashlib.sha1(bio.encode("utf-8")).hexdigest()
+        key = (profile_key, digest, max_tokens)
+        with self._lock:
+            summary = self._cache.get(key)
+            if summary is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return summary
+
+        summary = self._compact(bio, max_tokens)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = summary
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return summary
+
+    @staticmethod
+    def _compact(bio: str, max_tokens: int) -> str:
+        bio = " ".join(bio.split())
+        if count_tokens(bio) <= max_tokens:
+            return bio
+        kept = []
+        for sentence in SENTENCE_END.split(bio):
+            candidate = " ".join(kept + [sentence])
+            if count_tokens(candidate) <= max_tokens:
+                kept.append(sentence)
+                continue
+            if not kept:
+                return truncate_to_tokens(sentence, max_tokens)
+            break
+        return " ".join(kept)
+
+
+class UsageLedger:
+    """Per-call token counts and latency of LLM requests, with running totals"""
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self.recent = deque(maxlen=window)
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record(self, prompt_tokens: int, completion_tokens: int, latency_seconds: float,
+               ok: bool = True, model: Optional[str] = None):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.recent.append({
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "latency_ms": round(latency_seconds * 1000, 1),
+                "ok": ok,
+                "model": model,
+            })
+
+    def completion_budget(self, cap: int, percentile: float = 0.99, headroom: float = 1.25,
+                          min_samples: int = 50) -> int:
+        """
+        max_tokens sized from observed completions: the `percentile` of recent
+        successful calls plus `headroom`, never above `cap`. Until there are
+        `min_samples` calls the cap itself is used. Replies cut off at the limit
+        are recorded at the limit, so the budget climbs back by the headroom.
+        """
+        with self._lock:
+            completions = sorted(call["completion_tokens"] for call in self.recent if call["ok"])
+        if len(completions) < min_samples:
+            return cap
+        observed = completions[min(len(completions) - 1, int(len(completions) * percentile))]
+        return max(1, min(cap, math.ceil(observed * headroom)))
+
+    def metrics(self):
+        with self._lock:
+            recent = list(self.recent)
+        latencies = sorted(call["latency_ms"] for call in recent)
+        completions = [call["completion_tokens"] for call in recent if call["ok"]]
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_prompt_tokens": round(sum(c["prompt_tokens"] for c in recent) / len(recent), 1) if recent else None,
+            "max_completion_tokens": max(completions) if completions else None,
+            "p50_latency_ms": latencies[len(latencies) // 2] if latencies else None,
+            "p95_latency_ms": latencies[int(len(latencies) * 0.95)] if latencies else None,
+        }
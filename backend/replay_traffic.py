@@ -0,0 +1,347 @@
+"""
+Replays traffic captured with TRAFFIC_CAPTURE (see traffic_capture.py)
+against the API, in process.
+
+MongoDB is replaced by mongomock and OpenAI by a deterministic fake LLM, so
+a run measures our own code and two runs over the same log can be
+compared. Students the log asks matches for without registering them are
+created from their pseudonym, next to --students synthetic ones.
+
+    python replay_traffic.py capture.jsonl [--speed 1] [--concurrency 8] [--save run.json]
+    python replay_traffic.py capture.jsonl --baseline run.json [--fail-on-diff]
+
+Reports p50/p95/p99 latency per route and throughput; with --baseline, also
+the latency change and every request whose status or top-k matches
+(candidates and scores) changed. Use --concurrency 1 for exact top-k
+comparisons: concurrent registrations can reorder what a match request sees.
+mongomock is a development dependency (pip install mongomock).
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Optional
+from urllib.parse import unquote
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# The replayed app must not capture the replay
+os.environ.pop("TRAFFIC_CAPTURE", None)
+
+INTERESTS = ["art", "coffee", "museums", "photography", "cinema", "technology", "startups", "hiking",
+             "board_games", "music", "dance", "literature", "yoga", "sports", "cooking", "travel"]
+LOOKING_FOR = ["coffee", "french_practice", "french_help", "cultural_exchange", "study_partners",
+               "language_exchange"]
+LANGUAGES = ["fr", "en", "es", "zh", "ar"]
+FRENCH_LEVELS = ["A1", "A2", "B1", "B2", "C1", "C2"]
+
+# The fake LLM names the candidate in its explanation: the plain JSON match
+# route doesn't say who a match is, and the diff needs to know
+CANDIDATE_MARKER = "replay-candidate:"
+PROMPT_LINE = re.compile(r"^([AB]): (.*?); interests: (.*?); languages:", re.MULTILINE)
+
+
+class FakeLLM:
+    """
+    Stands in for ChatOpenAI: scores a pair from its shared interests plus a
+    stable per-pair offset, after `latency_seconds`, so results only change
+    when the candidates or their profiles do.
+    """
+
+    model_name = "fake-llm"
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+
+    def invoke(self, messages, **kwargs):
+        self.calls += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        profiles = {label: (name, {i.strip() for i in interests.split(",") if i.strip()})
+                    for label, name, interests in PROMPT_LINE.findall(messages[-1].content)}
+        (student, student_interests), (candidate, candidate_interests) = profiles["A"], profiles["B"]
+        offset = int(hashlib.sha256(f"{student}|{candidate}".encode()).hexdigest()[:8], 16) % 10
+        score = min(100, 40 + 12 * len(student_interests & candidate_interests) + offset)
+        analysis = {
+            "score": score,
+            "en": {"explanation": CANDIDATE_MARKER + candidate, "activity": "Coffee on campus"},
+            "fr": {"explanation": CANDIDATE_MARKER + candidate, "activity": "Un café sur le campus"},
+        }
+        return SimpleNamespace(content=json.dumps(analysis), response_metadata={})
+
+
+def make_student(name: str, username: str = None) -> dict:
+    """Profile derived from `name` alone, so every run builds the same one"""
+    rng = random.Random(name)
+    now = datetime.utcnow()
+    return {
+        "name": name,
+        "username": username or name,
+        "email": f"{username or name}@example.invalid",
+        "interests": rng.sample(INTERESTS, rng.randint(2, 5)),
+        "languages": ["fr", "en"] + rng.sample(LANGUAGES[2:], rng.randint(0, 1)),
+        "french_level": rng.choice(FRENCH_LEVELS),
+        "looking_for": rng.sample(LOOKING_FOR, rng.randint(1, 3)),
+        "bio": " ".join(["lorem"] * rng.randint(5, 40)),
+        "avatar_url": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def load_log(path: str) -> list:
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return sorted(entries, key=lambda entry: entry["ts"])
+
+
+def unregistered_students(entries: list) -> list:
+    """Students the log asks matches for without registering them first"""
+    registered = set()
+    missing = []
+    for entry in entries:
+        if entry["route"] == "/api/students/register" and entry.get("body"):
+            registered.update(filter(None, (entry["body"].get("name"), entry["body"].get("username"))))
+        elif entry["route"].startswith("/api/students/matches/"):
+            student = unquote(entry["path"].split("/")[4])
+            if student not in registered:
+                registered.add(student)
+                missing.append(student)
+    return missing
+
+
+def percentile(timings, fraction: float) -> float:
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))] if timings else 0.0
+
+
+def latency_summary(results: list) -> dict:
+    by_route = {}
+    for result in results:
+        by_route.setdefault(result["route"], []).append(result)
+    summary = {}
+    for route, group in [("all", results)] + sorted(by_route.items()):
+        timings = sorted(result["latency_ms"] for result in group)
+        summary[route] = {
+            "count": len(group),
+            "errors": sum(1 for result in group if result["status"] >= 500),
+            "p50": round(percentile(timings, 0.50), 2),
+            "p95": round(percentile(timings, 0.95), 2),
+            "p99": round(percentile(timings, 0.99), 2),
+        }
+    return summary
+
+
+def top_k(response, k: int):
+    """[[candidate, score]] of the best k matches in a match response, else None"""
+    matches = None
+    content_type = response.headers.get("content-type", "")
+    if content_type.startswith("text/event-stream"):
+        # The last event carrying a ranking is the final one
+        for line in response.text.splitlines():
+            if line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if isinstance(data, dict) and "matches" in data:
+                    matches = data["matches"]
+    elif "json" in content_type:
+        data = response.json()
+        matches = data.get("matches") if isinstance(data, dict) else None
+    if not isinstance(matches, list):
+        return None
+    ranked = []
+    for match in matches[:k]:
+        candidate = match.get("candidate")
+        explanation = match.get("explanation") or ""
+        if candidate is None and explanation.startswith(CANDIDATE_MARKER):
+            candidate = explanation[len(CANDIDATE_MARKER):]
+        ranked.append([candidate, match.get("match_score")])
+    return ranked
+
+
+def replay(client, entries: list, speed: float, concurrency: int, k: int) -> tuple:
+    """Send every entry at its captured offset divided by `speed` (0: back to back); returns (results, seconds)"""
+
+    def send(seq: int, entry: dict, scheduled: Optional[float]):
+        # Timed from the scheduled send when pacing, so waiting for a free worker counts too
+        started = scheduled or time.perf_counter()
+        url = entry["path"] + (f"?{entry['query']}" if entry.get("query") else "")
+        response = client.request(entry["method"], url, json=entry.get("body"))
+        return {
+            "seq": seq,
+            "route": entry["route"],
+            "status": response.status_code,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+            "top_k": top_k(response, k) if entry["route"].startswith("/api/students/matches/") else None,
+        }
+
+    first = entries[0]["ts"] if entries else 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="replay") as pool:
+        futures = []
+        for seq, entry in enumerate(entries):
+            scheduled = None
+            if speed > 0:
+                scheduled = start + (entry["ts"] - first) / speed
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            futures.append(pool.submit(send, seq, entry, scheduled))
+        results = [future.result() for future in futures]
+    return results, time.perf_counter() - start
+
+
+def compare(baseline: dict, run: dict, limit: int = 10) -> int:
+    """Print latency and top-k differences against a baseline run; returns how many requests differ"""
+    if baseline.get("log_sha256") != run["log_sha256"]:
+        print("⚠️ The baseline was recorded from a different capture log")
+
+    print("\n⏱️ Latency vs baseline (ms)")
+    for route, current in run["latency"].items():
+        before = baseline["latency"].get(route)
+        if before is None:
+            continue
+        changes = []
+        for name in ("p50", "p95", "p99"):
+            delta = (current[name] - before[name]) / before[name] * 100 if before[name] else 0.0
+            changes.append(f"{name} {before[name]:.1f} -> {current[name]:.1f} ({delta:+.0f}%)")
+        print(f"   {route}: " + ", ".join(changes))
+
+    baseline_results = {result["seq"]: result for result in baseline["requests"]}
+    compared = reordered = membership = status_changes = 0
+    score_deltas = []
+    examples = []
+    for result in run["requests"]:
+        before = baseline_results.get(result["seq"])
+        if before is None:
+            continue
+        if before["status"] != result["status"]:
+            status_changes += 1
+            examples.append(f"#{result['seq']} {result['route']}: status {before['status']} -> {result['status']}")
+            continue
+        if before["top_k"] is None or result["top_k"] is None:
+            continue
+        compared += 1
+        before_scores = dict(map(tuple, before["top_k"]))
+        scores = dict(map(tuple, result["top_k"]))
+        score_deltas.extend(abs(scores[c] - before_scores[c]) for c in scores.keys() & before_scores.keys()
+                            if scores[c] is not None and before_scores[c] is not None)
+        if [c for c, _ in before["top_k"]] == [c for c, _ in result["top_k"]]:
+            continue
+        if set(before_scores) == set(scores):
+            reordered += 1
+        else:
+            membership += 1
+        examples.append(f"#{result['seq']} {result['route']}: {before['top_k']} -> {result['top_k']}")
+
+    changed = reordered + membership + status_changes
+    print(f"\n🎯 Top-k vs baseline: {compared} rankings compared, {reordered} reordered, "
+          f"{membership} with different candidates, {status_changes} status changes")
+    if score_deltas:
+        print(f"   Score change on shared candidates: mean {sum(score_deltas) / len(score_deltas):.2f}, "
+              f"max {max(score_deltas):.2f}")
+    for example in examples[:limit]:
+        print(f"   {example}")
+    if len(examples) > limit:
+        print(f"   ... and {len(examples) - limit} more")
+    return changed + sum(1 for delta in score_deltas if delta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured traffic against the API")
+    parser.add_argument("log", help="JSONL file written with TRAFFIC_CAPTURE")
+    parser.add_argument("--speed", type=float, default=1.0, help="time scale of the capture; 0 sends back to back")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--students", type=int, default=1000, help="synthetic students loaded before the replay")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="latency of each fake LLM call")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--save", help="write this run's results (a baseline for later runs)")
+    parser.add_argument("--baseline", help="results saved by an earlier run over the same log")
+    parser.add_argument("--fail-on-diff", action="store_true", help="exit with 1 if any top-k or status differs")
+    args = parser.parse_args()
+
+    try:
+        import mongomock
+    except ImportError:
+        print("❌ mongomock is not installed (pip install mongomock)")
+        sys.exit(1)
+
+    entries = load_log(args.log)
+    if not entries:
+        print("❌ The capture log is empty")
+        sys.exit(1)
+    with open(args.log, "rb") as f:
+        log_sha256 = hashlib.sha256(f.read()).hexdigest()
+
+    from database_sync import database
+    client = mongomock.MongoClient()
+
+    def connect():
+        database.client = client
+        database.db = client.udem_campus_connect
+        database.is_connected = True
+        return True
+
+    database.connect = connect
+    students = [make_student(f"Synthetic Student {i}", f"synthetic{i}") for i in range(args.students)]
+    students += [make_student(name) for name in unregistered_students(entries)]
+    if students:
+        client.udem_campus_connect.students.insert_many(students)
+
+    import main as api
+    from fastapi.testclient import TestClient
+
+    fake_llm = FakeLLM(args.llm_latency_ms / 1000)
+    api.matcher.use_real_ai = True
+    api.matcher._llm = fake_llm
+    api.matcher.SystemMessage = api.matcher.HumanMessage = SimpleNamespace
+    # Mock fallbacks pick random wording; keep them reproducible
+    random.seed(0)
+
+    with TestClient(api.app) as test_client:
+        deadline = time.monotonic() + 60
+        while not database.student_sync.is_ready or (api.shard_pool is not None and not api.shard_pool.is_ready):
+            if time.monotonic() > deadline:
+                print("❌ The student index didn't load within 60s")
+                sys.exit(1)
+            time.sleep(0.05)
+
+        print(f"🔁 Replaying {len(entries)} requests ({len(students)} students preloaded, "
+              f"speed {args.speed or 'max'}, concurrency {args.concurrency})")
+        results, seconds = replay(test_client, entries, args.speed, args.concurrency, args.top_k)
+
+    run = {
+        "log_sha256": log_sha256,
+        "settings": {"speed": args.speed, "concurrency": args.concurrency, "students": args.students,
+                     "llm_latency_ms": args.llm_latency_ms, "top_k": args.top_k},
+        "seconds": round(seconds, 3),
+        "throughput": round(len(results) / seconds, 2) if seconds else None,
+        "latency": latency_summary(results),
+        "requests": results,
+    }
+    print(f"✅ {len(results)} requests in {seconds:.2f}s ({run['throughput']} req/s), {fake_llm.calls} LLM calls")
+    print(f"   {'route':<42} {'count':>6} {'5xx':>5} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for route, stats in run["latency"].items():
+        print(f"   {route:<42} {stats['count']:>6} {stats['errors']:>5} "
+              f"{stats['p50']:>8.2f} {stats['p95']:>8.2f} {stats['p99']:>8.2f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(run, f)
+        print(f"💾 Results saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            differences = compare(json.load(f), run)
+        if differences and args.fail_on_diff:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Weight of a token depending on the field it appears in (the best field wins)
+FIELD_WEIGHTS = {"name": 3, "username": 3, "interests": 2, "bio": 1}
+
+# How much a query term is worth depending on how it matched an indexed token
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.7
+FUZZY_MATCH = 0.5
+
+# Query terms beyond this are ignored; prefix/fuzzy expansions per term are capped
+MAX_QUERY_TERMS = 6
+MAX_EXPANSIONS = 64
+MIN_FUZZY_LENGTH = 4
+
+# Tokens held by more students than this (e.g. common bio words) get a dense
+# per-row weight vector updated in place, instead of a posting array rebuilt on every write
+DENSE_MIN_POSTINGS = 1000
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents, so "Léa" and "lea" index the same"""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN.findall(fold(text))
+
+
+def trigrams(token: str):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def within_distance(a: str, b: str, limit: int) -> bool:
+    """Levenshtein distance between a and b is at most `limit`"""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+class StudentSearchIndex:
+    """
+    Typo-tolerant prefix search over student names, usernames, interests and bios.
+    Text is accent-folded and tokenized; each token keeps a posting list of
+    (row, field weight). Query terms expand to the exact token, the tokens it
+    prefixes (via a sorted vocabulary) and, when the exact token is unknown,
+    tokens within a small edit distance (candidates from a trigram index).
+    Scores are accumulated over dense numpy arrays, so even terms matching
+    most of the students stay cheap; very common tokens keep a dense weight
+    vector so writes never force a rebuild of their (huge) posting arrays.
+    Kept in sync as a StudentIndex listener.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self._lock = threading.RLock()
+        self._reset()
+
+    def __len__(self):
+        return len(self._row_of)
+
+    def _reset(self):
+        self._row_of: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._doc_tokens: Dict[int, Dict[str, int]] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._arrays = {}  # token -> (rows, weights), rebuilt lazily after a change
+        self._dense: Dict[str, np.ndarray] = {}  # token -> weight per row (0 = absent)
+        self._capacity = 1024
+        self._vocabulary: List[str] = []  # sorted, for prefix ranges
+        self._trigrams: Dict[str, set] = {}
+
+    def on_index_event(self, event: str, student_id: Optional[str], doc: Optional[dict]):
+        """StudentIndex listener"""
+        with self._lock:
+            if event == "reset":
+                self._reset()
+                for indexed_id in self.index.all_ids():
+                    self._add(indexed_id, self.index.get(indexed_id))
+            elif event == "upsert":
+                self._remove(student_id)
+                self._add(student_id, doc)
+            elif event == "delete":
+                self._remove(student_id)
+
+    def search(self, query: str, limit: int = 20, offset: int = 0):
+        """Return (total matches, [(score, student id)]) for one page, best first"""
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not terms:
+            return 0, []
+
+        with self._lock:
+            size = len(self._ids)
+            if size == 0:
+                return 0, []
+            total_scores = np.zeros(size, dtype=np.float32)
+            matched_terms = np.zeros(size, dtype=np.int8)
+            for term in terms:
+                term_scores = np.zeros(size, dtype=np.float32)
+                for token, quality in self._expand(term):
+                    dense = self._dense.get(token)
+                    if dense is not None:
+                        np.maximum(term_scores, dense[:size] * np.float32(quality), out=term_scores)
+                        continue
+                    rows, weights = self._posting_arrays(token)
+                    # Rows are unique within a posting list, so plain fancy indexing is safe
+                    term_scores[rows] = np.maximum(term_scores[rows], weights * quality)
+                total_scores += term_scores
+                matched_terms += term_scores > 0
+
+            # Every term must match something (AND semantics)
+            hits = np.flatnonzero(matched_terms == len(terms))
+            total = len(hits)
+            end = min(offset + limit, total)
+            if offset >= end:
+                return total, []
+            scores = total_scores[hits]
+            if end < total:
+                top = np.argpartition(-scores, end - 1)[:end]
+            else:
+                top = np.arange(total)
+            # Ties broken by row so pages are stable
+            ordered = top[np.lexsort((hits[top], -scores[top]))][offset:end]
+            return total, [(round(float(scores[i]), 3), self._ids[hits[i]]) for i in ordered]
+
+    def _expand(self, term: str):
+        """(indexed token, match quality) pairs a query term stands for"""
+        expansions = {}
+        if term in self._postings:
+            expansions[term] = EXACT_MATCH
+
+        start = bisect.bisect_left(self._vocabulary, term)
+        end = bisect.bisect_left(self._vocabulary, term + "\uffff", lo=start)
+        prefixed = [token for token in self._vocabulary[start:end] if token != term]
+        if len(prefixed) > MAX_EXPANSIONS:
+            prefixed = heapq.nlargest(MAX_EXPANSIONS, prefixed, key=lambda token: len(self._postings[token]))
+        for token in prefixed:
+            expansions[token] = PREFIX_MATCH
+
+        if term not in self._postings and len(term) >= MIN_FUZZY_LENGTH:
+            for token in self._fuzzy(term):
+                expansions.setdefault(token, FUZZY_MATCH)
+        return expansions.items()
+
+    def _fuzzy(self, term: str) -> List[str]:
+        """Indexed tokens within 1 edit (2 for long terms) of `term`"""
+        limit = 1 if len(term) <= 6 else 2
+        grams = trigrams(term)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._trigrams.get(gram, ()))
+        # Each edit changes at most 3 trigrams
+        needed = max(1, len(grams) - 3 * limit)
+        candidates = [token for token, count in shared.items() if count >= needed]
+        candidates.sort(key=lambda token: -shared[token])
+        matches = [token for token in candidates[:MAX_EXPANSIONS * 4] if within_distance(term, token, limit)]
+        return matches[:MAX_EXPANSIONS]
+
+    def _posting_arrays(self, token: str):
+        arrays = self._arrays.get(token)
+        if arrays is None:
+            postings = self._postings[token]
+            arrays = (
+                np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                np.fromiter(postings.values(), dtype=np.float32, count=len(postings)),
+            )
+            self._arrays[token] = arrays
+        return arrays
+
+    def _add(self, student_id: str, doc: Optional[dict]):
+        if doc is None:
+            return
+        tokens = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            value = doc.get(field)
+            if not value:
+                continue
+            text = " ".join(value) if isinstance(value, list) else str(value)
+            for token in tokenize(text):
+                if weight > tokens.get(token, 0):
+                    tokens[token] = weight
+
+        row = self._free.pop() if self._free else len(self._ids)
+        if row == len(self._ids):
+            self._ids.append(student_id)
+            if row >= self._capacity:
+                self._grow()
+        else:
+            self._ids[row] = student_id
+        self._row_of[student_id] = row
+        self._doc_tokens[row] = tokens
+
+        for token, weight in tokens.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._vocabulary, token)
+                for gram in trigrams(token):
+                    self._trigrams.setdefault(gram, set()).add(token)
+            postings[row] = weight
+            dense = self._dense.get(token)
+            if dense is not None:
+                dense[row] = weight
+            elif len(postings) >= DENSE_MIN_POSTINGS:
+                self._densify(token)
+            else:
+                self._arrays.pop(token, None)
+
+    def _densify(self, token: str):
+        dense = np.zeros(self._capacity, dtype=np.uint8)
+        postings = self._postings[token]
+        dense[np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))] = np.fromiter(
+            postings.values(), dtype=np.uint8, count=len(postings)
+        )
+        self._dense[token] = dense
+        self._arrays.pop(token, None)
+
+    def _grow(self):
+        self._capacity *= 2
+        for token, dense in self._dense.items():
+            grown = np.zeros(self._capacity, dtype=np.uint8)
+            grown[:len(dense)] = dense
+            self._dense[token] = grown
+
+    def _remove(self, student_id: str):
+        row = self._row_of.pop(student_id, None)
+        if row is None:
+            return
+        for token in self._doc_tokens.pop(row):
+            postings = self._postings[token]
+            del postings[row]
+            dense = self._dense.get(token)
+            if dense is not None:
+                dense[row] = 0
+            else:
+                self._arrays.pop(token, None)
+            if not postings:
+                self._dense.pop(token, None)
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+                for gram in trigrams(token):
+                    tokens = self._trigrams[gram]
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._trigrams[gram]
+        self._ids[row] = None
+        self._free.append(row)
@@ -0,0 +1,57 @@
+import os
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+
+import mongomock
+import pytest
+
+# Backend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def api():
+    """The FastAPI app, started once on a mongomock database (its workers are process-wide)"""
+    import database_sync
+
+    client = mongomock.MongoClient()
+
+    def connect():
+        database_sync.database.client = client
+        database_sync.database.db = client.udem_campus_connect
+        database_sync.database.is_connected = True
+        return True
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(database_sync.database, "connect", connect)
+        import main
+        from fastapi.testclient import TestClient
+
+        with TestClient(main.app) as http:
+            yield SimpleNamespace(main=main, http=http, db=client.udem_campus_connect)
+
+
+@pytest.fixture
+def mongo():
+    """A connected stand-in for database_sync.database, backed by mongomock"""
+    client = mongomock.MongoClient()
+    return SimpleNamespace(client=client, db=client.udem_campus_connect, is_connected=True)
+
+
+def make_student(name: str, **fields) -> dict:
+    now = datetime.utcnow()
+    student = {
+        "name": name,
+        "username": name.lower().replace(" ", "."),
+        "email": f"{name.lower().replace(' ', '.')}@umontreal.ca",
+        "interests": ["coffee"],
+        "languages": ["fr", "en"],
+        "french_level": "B1",
+        "looking_for": ["coffee"],
+        "bio": f"{name} studies at UdeM",
+        "created_at": now,
+        "updated_at": now,
+    }
+    student.update(fields)
+    return student
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ai_matcher import BilingualAIMatcher, StudentProfile
+
+
+def profile(name: str) -> StudentProfile:
+    return StudentProfile(name=name, email=f"{name.lower()}@umontreal.ca", interests=["art", "coffee"],
+                          languages=["fr", "en"], french_level="B1", looking_for=["coffee"], bio="")
+
+
+class ScriptedLLM:
+    model_name = "scripted"
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+
+    def invoke(self, messages, **kwargs):
+        return SimpleNamespace(content=self.replies.pop(0), response_metadata={})
+
+
+@pytest.fixture
+def matcher():
+    matcher = BilingualAIMatcher()
+    matcher.use_real_ai = True
+    matcher.SystemMessage = matcher.HumanMessage = SimpleNamespace
+    return matcher
+
+
+def test_cut_off_reply_uses_templates_and_is_not_cached(matcher):
+    complete = '{"score": 81, "en": {"explanation": "Both love art"}, "fr": {"explanation": "Tous deux aiment l\'art"}}'
+    matcher._llm = ScriptedLLM(['{"score": 80, "en": {"explanation": "Both lo', complete])
+    student, candidate = profile("Léa"), profile("John")
+
+    first = matcher.analyze_match(student, candidate, "fr")
+    templates = {template.format(interests=interests) for template in matcher.explanations_fr
+                 for interests in ("art, coffee", "coffee, art")}
+    assert first.explanation in templates
+    assert matcher.local_fallbacks["unparsed_reply"] == 1
+
+    # Asked again rather than served from the cache
+    assert matcher.analyze_match(student, candidate, "fr").explanation == "Tous deux aiment l'art"
+    assert matcher.analyze_match(student, candidate, "en").explanation == "Both love art"
+
+
+def test_missing_language_is_filled_from_templates(matcher):
+    analysis, complete = matcher._parse_ai_response(
+        '```json\n{"score": 90, "en": {"explanation": "Great pair", "activity": "Jazz fest"}}\n```',
+        profile("Léa"), profile("John"),
+    )
+    assert not complete
+    assert analysis["match_score"] == 90
+    assert analysis["explanation"]["en"] == "Great pair"
+    assert analysis["explanation"]["fr"] and "Great pair" not in analysis["explanation"]["fr"]
+    assert analysis["suggested_activity"]["en"] == "Jazz fest"
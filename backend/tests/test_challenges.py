@@ -0,0 +1,55 @@
+import pytest
+
+from challenges import ChallengeCatalog
+from conftest import make_student
+
+
+@pytest.fixture
+def catalog(mongo):
+    catalog = ChallengeCatalog(lambda: mongo.db.challenges)
+    catalog.setup()
+    catalog.reload()
+    return catalog
+
+
+def suggested(catalog, student, limit=20):
+    return [challenge["id"] for challenge, _ in catalog.suggest(student, limit)]
+
+
+def test_french_challenges_are_gated_by_level(catalog):
+    beginner = make_student("Léa Tremblay", interests=["coffee"], french_level="A1")
+    assert "cafe-order" in suggested(catalog, beginner)
+    assert "cafe-conversation" not in suggested(catalog, beginner)
+
+    intermediate = make_student("Léa Tremblay", interests=["coffee"], french_level="b1")
+    assert suggested(catalog, intermediate)[:2] == ["cafe-order", "cafe-conversation"]
+
+
+def test_unknown_level_only_gets_challenges_without_french(catalog):
+    student = make_student("John Chen", interests=["coffee", "art"], french_level=None)
+    ids = suggested(catalog, student)
+    assert "museum-visit" in ids
+    assert not any(catalog.get(challenge_id).get("language") == "fr" for challenge_id in ids)
+
+
+def test_completed_challenges_are_not_suggested(catalog):
+    student = make_student("Léa Tremblay", interests=["art", "photography"], french_level="C1",
+                           completed_challenges=["photo-walk"])
+    ids = suggested(catalog, student)
+    assert ids[0] == "museum-visit"
+    assert "photo-walk" not in ids
+
+
+def test_ranked_by_shared_interests_then_filled_with_general(catalog):
+    student = make_student("Zoë Côté", interests=["art", "photography", "travel", "zzz"], french_level="B2")
+    suggestions = catalog.suggest(student, 20)
+    assert [(challenge["id"], shared) for challenge, shared in suggestions[:2]] == \
+        [("photo-walk", 3), ("museum-visit", 1)]
+    assert [challenge["id"] for challenge, _ in suggestions[-2:]] == ["campus-workshop", "language-exchange"]
+    assert len(catalog.suggest(student, 3)) == 3
+
+
+def test_get_sees_challenges_created_elsewhere(catalog, mongo):
+    assert catalog.get("missing") is None
+    mongo.db.challenges.insert_one({"id": "new-one", "interests": [], "title": {"en": "New"}})
+    assert catalog.get("new-one")["title"] == {"en": "New"}
@@ -0,0 +1,75 @@
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "time", lambda: now[0])
+    return now
+
+
+def tripped_breaker(**options) -> CircuitBreaker:
+    breaker = CircuitBreaker("test", min_calls=4, open_seconds=30, slow_call_seconds=2, **options)
+    for _ in range(2):
+        breaker.record_success(0.1)
+    for _ in range(2):
+        breaker.record_failure(0.1, "boom")
+    return breaker
+
+
+def test_stays_closed_below_min_calls(clock):
+    breaker = CircuitBreaker("test", min_calls=4)
+    for _ in range(3):
+        breaker.record_failure(0.1, "boom")
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+
+def test_opens_at_failure_rate_and_rejects_calls(clock):
+    breaker = tripped_breaker()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.metrics()["rejected_calls"] == 1
+    assert breaker.times_opened == 1
+
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = CircuitBreaker("test", min_calls=2, slow_call_seconds=2)
+    breaker.record_success(5)
+    breaker.record_success(5)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert "slow call" in breaker.last_failure
+
+
+def test_half_open_after_timeout_allows_limited_probes(clock):
+    breaker = tripped_breaker()
+    clock[0] += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+    # The probe is still in flight
+    assert not breaker.allow_request()
+
+
+def test_half_open_success_closes(clock):
+    breaker = tripped_breaker()
+    clock[0] += 30
+    assert breaker.allow_request()
+    breaker.record_success(0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.metrics()["window_calls"] == 0
+
+
+def test_half_open_failure_reopens(clock):
+    breaker = tripped_breaker()
+    clock[0] += 30
+    assert breaker.allow_request()
+    breaker.record_failure(0.1, "still down")
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+    clock[0] += 29
+    assert not breaker.allow_request()
+    clock[0] += 1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
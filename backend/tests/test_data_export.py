@@ -0,0 +1,118 @@
+import io
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from bson import ObjectId
+
+import data_export
+from conftest import make_student
+from data_export import CollectionExport
+
+START = datetime(2026, 1, 5, 12, 0, 0)
+
+
+def add_students(collection, count, start=START, prefix="Student"):
+    students = [
+        make_student(f"{prefix} {i}", _id=ObjectId(), updated_at=start + timedelta(minutes=i))
+        for i in range(count)
+    ]
+    collection.insert_many(students)
+    return [str(student["_id"]) for student in students]
+
+
+def read_table(data: bytes, file_format: str):
+    if file_format == "parquet":
+        return pq.read_table(io.BytesIO(data))
+    return pa.ipc.open_file(io.BytesIO(data)).read_all()
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+def test_round_trip_over_several_batches(mongo, monkeypatch, file_format):
+    monkeypatch.setattr(data_export, "BATCH_SIZE", 4)
+    ids = add_students(mongo.db.students, 10)
+
+    export = CollectionExport("students", mongo.db.students, file_format)
+    chunks = list(export.chunks())
+    table = read_table(b"".join(chunks), file_format)
+
+    # A chunk per batch of 4, then the footer
+    assert len(chunks) == 4
+    assert export.rows == table.num_rows == 10
+    assert table.column("_id").to_pylist() == ids
+    assert table.column("updated_at").to_pylist()[-1] == START + timedelta(minutes=9)
+    assert "email" not in table.column_names
+    assert export.watermark == (START + timedelta(minutes=9)).isoformat()
+
+
+def test_incremental_exports_reread_an_overlap_before_since(mongo):
+    add_students(mongo.db.students, 5)
+    watermark = CollectionExport("students", mongo.db.students).watermark
+    last = START + timedelta(minutes=4)
+
+    # Stamped by a writer whose clock runs behind, committed after the export
+    skewed = add_students(mongo.db.students, 1, start=last - timedelta(seconds=1), prefix="Skewed")
+    newer = add_students(mongo.db.students, 2, start=last + timedelta(minutes=1), prefix="Newer")
+
+    export = CollectionExport("students", mongo.db.students, since=watermark)
+    table = read_table(b"".join(export.chunks()), "parquet")
+    names = table.column("name").to_pylist()
+    assert set(table.column("_id").to_pylist()) >= set(skewed + newer)
+    # Only the overlap is read again: the last student of the previous export
+    assert sorted(names) == ["Newer 0", "Newer 1", "Skewed 0", "Student 4"]
+    assert export.watermark == (last + timedelta(minutes=2)).isoformat()
+
+
+def test_incremental_exports_of_append_only_collections(mongo):
+    old = mongo.db.connections.insert_one({"_id": ObjectId.from_datetime(START), "status": "pending"}).inserted_id
+    watermark = CollectionExport("connections", mongo.db.connections).watermark
+    assert watermark == str(old)
+
+    new = mongo.db.connections.insert_one({"_id": ObjectId.from_datetime(START + timedelta(hours=1))}).inserted_id
+    export = CollectionExport("connections", mongo.db.connections, "arrow", since=watermark)
+    table = read_table(b"".join(export.chunks()), "arrow")
+    assert table.column("_id").to_pylist() == [str(old), str(new)]
+
+    later = CollectionExport("connections", mongo.db.connections, since=str(new))
+    assert read_table(b"".join(later.chunks()), "parquet").column("_id").to_pylist() == [str(new)]
+
+
+def test_export_rejects_unknown_collections_formats_and_watermarks(mongo):
+    with pytest.raises(ValueError):
+        CollectionExport("passwords", mongo.db.passwords)
+    with pytest.raises(ValueError):
+        CollectionExport("students", mongo.db.students, "csv")
+    with pytest.raises(ValueError):
+        CollectionExport("connections", mongo.db.connections, since="not-an-id")
+
+
+def test_export_route_needs_the_admin_token(api, monkeypatch):
+    path = "/api/admin/export/students"
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert api.http.get(path).status_code == 403
+
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    assert api.http.get(path).status_code == 403
+    assert api.http.get(path, headers={"X-Admin-Token": "guess"}).status_code == 403
+    assert api.http.get(path, headers={"X-Admin-Token": "s3cret"}).status_code == 200
+
+
+def test_export_route_streams_with_a_watermark_header(api, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    headers = {"X-Admin-Token": "s3cret"}
+    path = "/api/admin/export/connections"
+    ids = [ObjectId.from_datetime(START + timedelta(hours=i)) for i in range(3)]
+    api.db.connections.insert_many([{"_id": _id, "status": "accepted"} for _id in ids])
+
+    response = api.http.get(path, params={"format": "arrow"}, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.file"
+    assert response.headers["x-export-watermark"] == str(ids[-1])
+    assert read_table(response.content, "arrow").column("_id").to_pylist() == [str(_id) for _id in ids]
+
+    since = api.http.get(path, params={"since": str(ids[-1])}, headers=headers)
+    assert read_table(since.content, "parquet").column("_id").to_pylist() == [str(ids[-1])]
+    assert since.headers["x-export-watermark"] == str(ids[-1])
+
+    assert api.http.get(path, params={"since": "yesterday"}, headers=headers).status_code == 400
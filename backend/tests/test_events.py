@@ -0,0 +1,116 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from conftest import make_student
+from events import (
+    AlreadyRegisteredError, EventFullError, EventNotFoundError, EventRecommender, EventStore, seed_events,
+)
+from matcher_index import StudentIndex
+
+
+@pytest.fixture
+def store(mongo):
+    store = EventStore(lambda: mongo.db.events, lambda: mongo.db.event_registrations)
+    store.setup()
+    return store
+
+
+def add_event(store, event_id, capacity, interests=("coffee",), participants=0):
+    store.create({"id": event_id, "title": event_id, "date": seed_events(datetime.utcnow())[0]["date"],
+                  "time": "18:00", "category": "social", "maxCapacity": capacity, "interests": list(interests)})
+    if participants:
+        store.get_events().update_one({"id": event_id}, {"$set": {"participants": participants}})
+
+
+def test_seeded_events_are_upcoming(store):
+    upcoming = store.upcoming()
+    assert {event["id"] for event in upcoming} == {"1", "2"}
+    assert all(event["date"] >= datetime.utcnow().strftime("%Y-%m-%d") for event in upcoming)
+    assert "days_ahead" not in upcoming[0]
+
+
+def test_concurrent_rsvps_never_oversell(store):
+    add_event(store, "popular", capacity=5)
+    outcomes = []
+
+    def rsvp(number):
+        try:
+            store.register("popular", f"student-{number}")
+            outcomes.append("ok")
+        except EventFullError:
+            outcomes.append("full")
+
+    threads = [threading.Thread(target=rsvp, args=(number,)) for number in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert outcomes.count("ok") == 5 and outcomes.count("full") == 35
+    assert store.get_events().find_one({"id": "popular"})["participants"] == 5
+    # Rejected RSVPs don't leave a registration behind
+    assert store.get_registrations().count_documents({"event_id": "popular"}) == 5
+
+
+def test_rsvp_errors(store):
+    add_event(store, "small", capacity=2, participants=1)
+    event = store.register("small", "lea")
+    assert event["participants"] == 2
+    with pytest.raises(AlreadyRegisteredError):
+        store.register("small", "lea")
+    with pytest.raises(EventFullError):
+        store.register("small", "john")
+    with pytest.raises(EventNotFoundError):
+        store.register("missing", "john")
+    assert store.registered_event_ids(["lea", "john"]) == {"small"}
+
+
+def test_reset_recomputes_with_loaded_events(store):
+    store.get_events().delete_many({})
+    index = StudentIndex()
+    recommender = EventRecommender(index, store)
+    index.add_listener(recommender.on_index_event)
+    recommender.refresh_seconds = 3600
+    recommender.start()
+    try:
+        while recommender.computed_at is None:
+            time.sleep(0.01)
+        # Created after the recommender last loaded events
+        add_event(store, "hike", capacity=None, interests=["hiking"])
+        student = make_student("Zoë Côté", _id=ObjectId(), interests=["hiking"])
+        index.load([student])
+        deadline = time.time() + 5
+        while recommender.metrics()["precomputed_students"] != 1:
+            assert time.time() < deadline, "reset didn't trigger a recompute"
+            time.sleep(0.01)
+    finally:
+        recommender.stop()
+    [(event, overlap)] = recommender.for_student(str(student["_id"]))
+    assert event["id"] == "hike" and overlap == 1
+
+
+def test_events_sharing_no_interest_are_not_recommended(store):
+    store.get_events().delete_many({})
+    add_event(store, "hike", capacity=None, interests=["hiking"])
+    add_event(store, "jazz", capacity=None, interests=["music"])
+    index = StudentIndex()
+    recommender = EventRecommender(index, store)
+    index.add_listener(recommender.on_index_event)
+    hiker = make_student("Zoë Côté", _id=ObjectId(), interests=["hiking"])
+    reader = make_student("Paul Roy", _id=ObjectId(), interests=["literature"])
+    index.load([hiker, reader])
+    recommender.refresh(force=True)
+
+    # Precomputed rows
+    assert [(event["id"], overlap) for event, overlap in recommender.for_student(str(hiker["_id"]))] == [("hike", 1)]
+    assert recommender.for_student(str(reader["_id"])) == []
+
+    # Rescored on read after a change
+    index.upsert(dict(reader, interests=["music", "cooking"]))
+    assert [event["id"] for event, _ in recommender.for_student(str(reader["_id"]))] == ["jazz"]
+    index.upsert(dict(hiker, interests=["cooking"]))
+    assert recommender.for_student(str(hiker["_id"])) == []
@@ -0,0 +1,114 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import health
+from conftest import make_student
+from health import HealthSampler
+
+
+class StubSync:
+    def __init__(self):
+        self.ready = True
+        self.lag = 0.5
+
+    def metrics(self):
+        return {"ready": self.ready, "mode": "polling", "lag_seconds": self.lag, "indexed_students": 1}
+
+
+@pytest.fixture
+def sampler(mongo):
+    mongo.student_sync = StubSync()
+    mongo.db.students.insert_one(make_student("Léa Tremblay"))
+    matcher = SimpleNamespace(use_real_ai=False, is_ready=True)
+    sampler = HealthSampler(mongo, matcher)
+    sampler.max_index_lag = 30
+    yield sampler
+    sampler.stop()
+
+
+def test_not_ready_until_the_first_sample(sampler, monkeypatch):
+    release = threading.Event()
+    slow_database = sampler._sample_database
+
+    def blocked():
+        release.wait(5)
+        return slow_database()
+
+    monkeypatch.setattr(sampler, "_sample_database", blocked)
+    sampler.start()
+    ready, checks = sampler.readiness()
+    assert not ready and not checks["sampler_fresh"]
+
+    release.set()
+    deadline = time.time() + 5
+    while not sampler.readiness()[0]:
+        assert time.time() < deadline, "never became ready"
+        time.sleep(0.01)
+    assert sampler.state["students_estimated"] == 1
+    assert sampler.state["llm"]["status"] == "not_used"
+
+
+def test_stale_samples_fail_readiness(sampler, monkeypatch):
+    sampler.sample()
+    assert sampler.readiness()[0]
+    now = time.time()
+    monkeypatch.setattr(health.time, "time", lambda: now + 3 * sampler.interval)
+    ready, checks = sampler.readiness()
+    assert not ready and not checks["sampler_fresh"]
+    assert checks["database"] and checks["student_index"]
+
+
+def test_index_lag_over_the_limit_fails_readiness(sampler):
+    sampler.mongo.student_sync.lag = 31
+    sampler.sample()
+    ready, checks = sampler.readiness()
+    assert not ready and not checks["student_index"]
+
+    sampler.mongo.student_sync.lag = 29
+    sampler.sample()
+    assert sampler.readiness()[0]
+
+
+def test_index_not_loaded_or_engine_loading_fail_readiness(sampler):
+    sampler.mongo.student_sync.ready = False
+    sampler.sample()
+    assert sampler.readiness()[1]["student_index"] is False
+
+    sampler.mongo.student_sync.ready = True
+    sampler.matcher.is_ready = False
+    sampler.sample()
+    ready, checks = sampler.readiness()
+    assert not ready and checks == {"sampler_fresh": True, "database": True, "student_index": True,
+                                    "ai_engine": False}
+
+
+def test_database_outage_keeps_the_last_count(sampler):
+    sampler.sample()
+    sampler.mongo.client = SimpleNamespace(admin=SimpleNamespace(command=lambda name: 1 / 0))
+    sampler.sample()
+    assert sampler.state["database"]["connected"] is False
+    assert sampler.state["students_estimated"] == 1
+    assert not sampler.readiness()[0]
+
+
+def test_ready_route_reports_warming_up_then_ready(api):
+    sampler = api.main.health_sampler
+    deadline = time.time() + 10
+    while not (api.main.database.student_sync.metrics()["ready"] and api.main.matcher.is_ready):
+        assert time.time() < deadline, "app never warmed up"
+        time.sleep(0.02)
+
+    # As if the sampler had not run yet
+    sampler.state = dict(sampler.state, sampled_at=None)
+    response = api.http.get("/api/health/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "warming_up"
+    assert response.json()["checks"]["sampler_fresh"] is False
+
+    sampler.sample()
+    response = api.http.get("/api/health/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
@@ -0,0 +1,176 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from match_jobs import MatchJobQueue, QueueFullError
+
+
+def make_queue(mongo, compute=None, **options):
+    jobs = MatchJobQueue(compute or (lambda name, language: {"student": name}), lambda: mongo.db.match_jobs)
+    for option, value in options.items():
+        setattr(jobs, option, value)
+    return jobs
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_identical_pending_jobs_are_shared(mongo):
+    jobs = make_queue(mongo)
+    first, deduplicated = jobs.submit("Léa Tremblay", "fr")
+    assert not deduplicated
+    again, deduplicated = jobs.submit("Léa Tremblay", "fr")
+    assert deduplicated and again["id"] == first["id"]
+    other, deduplicated = jobs.submit("Léa Tremblay", "en")
+    assert not deduplicated and other["id"] != first["id"]
+    assert jobs.depth == 2
+
+
+def test_recent_results_are_reused(mongo):
+    jobs = make_queue(mongo)
+    job, _ = jobs.submit("Léa Tremblay")
+    jobs._run(jobs._next_job())
+    reused, deduplicated = jobs.submit("Léa Tremblay")
+    assert deduplicated and reused["id"] == job["id"]
+    assert reused["status"] == "succeeded" and reused["result"] == {"student": "Léa Tremblay"}
+
+    jobs.result_ttl = timedelta(seconds=-1)
+    fresh, deduplicated = jobs.submit("Léa Tremblay")
+    assert not deduplicated and fresh["id"] != job["id"]
+
+
+def test_jobs_run_by_priority_then_age(mongo):
+    jobs = make_queue(mongo)
+    low, _ = jobs.submit("A", priority="low")
+    normal, _ = jobs.submit("B", priority="normal")
+    high, _ = jobs.submit("C", priority="high")
+    normal_later, _ = jobs.submit("D", priority="normal")
+    order = [jobs._next_job()["id"] for _ in range(4)]
+    assert order == [high["id"], normal["id"], normal_later["id"], low["id"]]
+
+
+def test_resubmitting_at_higher_priority_moves_the_job_up(mongo):
+    jobs = make_queue(mongo)
+    low, _ = jobs.submit("A", priority="low")
+    normal, _ = jobs.submit("B", priority="normal")
+    bumped, deduplicated = jobs.submit("A", priority="high")
+    assert deduplicated and bumped["id"] == low["id"] and bumped["priority"] == "high"
+    # A lower priority resubmit doesn't demote it
+    assert jobs.submit("A", priority="low")[0]["priority"] == "high"
+
+    assert jobs._next_job()["id"] == low["id"]
+    assert jobs._next_job()["id"] == normal["id"]
+    # The superseded entry is skipped rather than run twice
+    assert jobs._queue.qsize() == 1
+    jobs._queue.put([-1, -1, None])
+    assert jobs._next_job() is None
+
+
+def test_queue_depth_is_bounded(mongo):
+    jobs = make_queue(mongo, max_depth=2)
+    jobs.submit("A")
+    jobs.submit("B")
+    with pytest.raises(QueueFullError):
+        jobs.submit("C")
+
+
+def test_failures_are_recorded(mongo):
+    def compute(name, language):
+        raise ValueError("no such student")
+
+    jobs = make_queue(mongo, compute)
+    job, _ = jobs.submit("Nobody")
+    jobs._run(jobs._next_job())
+    stored = jobs.get(job["id"])
+    assert stored["status"] == "failed" and stored["error"] == "no such student"
+    assert jobs.depth == 0
+
+
+def expire_leases(mongo):
+    mongo.db.match_jobs.update_many({}, {"$set": {"lease_until": datetime.utcnow() - timedelta(seconds=1)}})
+
+
+def test_start_requeues_jobs_whose_worker_stopped(mongo):
+    before = make_queue(mongo)
+    queued, _ = before.submit("A")
+    running, _ = before.submit("B")
+    mongo.db.match_jobs.update_one({"id": running["id"]}, {"$set": {"status": "running"}})
+    # A second job for the same student, left by another worker that died
+    mongo.db.match_jobs.insert_one(dict(queued, id="duplicate", created_at=datetime.utcnow() + timedelta(seconds=1)))
+    # `before` stops renewing its leases, as if it had been restarted
+    expire_leases(mongo)
+
+    computed = []
+    after = make_queue(mongo, lambda name, language: computed.append(name) or {})
+    after.start()
+    try:
+        wait_for(lambda: after.depth == 0 and len(computed) == 2)
+    finally:
+        after.stop()
+    assert sorted(computed) == ["A", "B"]
+    assert after.get(queued["id"])["status"] == "succeeded"
+    assert after.get(running["id"])["owner"] == after.owner
+    assert after.get("duplicate")["status"] == "failed"
+
+    # The old worker no longer owns its jobs, so it doesn't run them again
+    before._run(before._next_job())
+    assert before.get(queued["id"])["status"] == "succeeded"
+    assert before.depth == 1
+
+
+def test_jobs_of_live_workers_are_shared_not_taken(mongo):
+    sibling = make_queue(mongo)
+    job, _ = sibling.submit("A")
+
+    other = make_queue(mongo)
+    other._recover()
+    assert other.depth == 0
+    assert other.get(job["id"])["owner"] == sibling.owner
+    # Another process submitting the same job gets the sibling's
+    shared, deduplicated = other.submit("A")
+    assert deduplicated and shared["id"] == job["id"]
+    assert mongo.db.match_jobs.count_documents({}) == 1
+
+    # The heartbeat keeps the lease alive
+    expire_leases(mongo)
+    sibling._renew_leases()
+    other._recover()
+    assert other.get(job["id"])["owner"] == sibling.owner
+
+
+def test_a_job_taken_over_mid_run_keeps_the_new_owners_result(mongo):
+    release = threading.Event()
+    hung = make_queue(mongo, lambda name, language: release.wait(5) and {"by": "hung"})
+    job, _ = hung.submit("A")
+    runner = threading.Thread(target=hung._run, args=(hung._next_job(),))
+    runner.start()
+    wait_for(lambda: hung.get(job["id"])["status"] == "running")
+    expire_leases(mongo)
+
+    other = make_queue(mongo, lambda name, language: {"by": "other"})
+    other._recover()
+    other._run(other._next_job())
+    release.set()
+    runner.join()
+
+    stored = other.get(job["id"])
+    assert stored["owner"] == other.owner and stored["result"] == {"by": "other"}
+    assert hung.depth == 0
+
+
+def test_concurrent_submits_create_one_job(mongo):
+    jobs = make_queue(mongo)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(jobs.submit("A")[0]["id"])) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(results)) == 1
+    assert mongo.db.match_jobs.count_documents({}) == 1
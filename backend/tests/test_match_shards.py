@@ -0,0 +1,90 @@
+import pytest
+from bson import ObjectId
+
+from conftest import make_student
+from match_shards import ShardPool
+from matcher_index import StudentIndex
+
+INTERESTS = ["art", "coffee", "music", "hiking", "technology", "dance"]
+
+
+def build_index():
+    index = StudentIndex()
+    index.load([
+        make_student(f"Student {i}", _id=ObjectId(), interests=INTERESTS[i % 6:i % 6 + 3],
+                     languages=[("fr", "en", "es")[i % 3]], french_level=("A2", "B1", "C1", None)[i % 4],
+                     looking_for=["french_practice"] if i % 5 == 0 else ["coffee"])
+        for i in range(60)
+    ])
+    return index
+
+
+@pytest.fixture
+def pool():
+    started = []
+
+    def start(index, strategy="hash"):
+        shard_pool = ShardPool(index, 3, strategy)
+        shard_pool.start()
+        started.append(shard_pool)
+        index.add_listener(shard_pool.on_index_event)
+        shard_pool.on_index_event("reset", None, None)
+        return shard_pool
+
+    yield start
+    for shard_pool in started:
+        shard_pool.stop()
+
+
+def local_scores(index, student, k):
+    return [score for score, _ in index.features.top_k_scored(student, k, [student["_id"]])]
+
+
+def test_hash_scatter_gather_matches_the_local_ranking(pool):
+    index = build_index()
+    shards = pool(index)
+    student = index.find("Student 0")
+    shortlist = shards.top_candidates(student, 10)
+    assert len(shortlist) == 10 and student["_id"] not in [doc["_id"] for doc in shortlist]
+    # Full profiles come from the coordinator's index
+    assert shortlist[0] == index.get(shortlist[0]["_id"])
+    scored = dict((sid, score) for score, sid in index.features.top_k_scored(student, 60, [student["_id"]]))
+    assert [scored[doc["_id"]] for doc in shortlist] == local_scores(index, student, 10)
+    assert shards.metrics()["queries"] == 1
+
+
+def test_shards_hold_features_not_profiles(pool):
+    index = build_index()
+    shards = pool(index)
+    stats = [shard.query(("stats",), 2) for shard in shards.shards]
+    assert sum(stat["students"] for stat in stats) == len(index)
+
+
+def test_deltas_reach_the_owning_shard(pool):
+    index = build_index()
+    shards = pool(index, "french_level")
+    student = {**index.find("Student 1"), "interests": ["chess"]}
+    moved = index.find("Student 2")
+    # A2 -> B2 moves the student to another shard
+    index.upsert({**moved, "french_level": "B2", "interests": ["chess"]})
+    assert shards.top_candidates(student, 1)[0]["_id"] == moved["_id"]
+
+    index.remove(moved["_id"])
+    assert moved["_id"] not in [doc["_id"] for doc in shards.top_candidates(student, 60)]
+
+
+@pytest.mark.parametrize("strategy", ["language", "french_level"])
+def test_partitioned_shards_rank_like_the_local_index(pool, strategy):
+    index = build_index()
+    # Speaks none of the student's languages and sits in another French level band
+    index.upsert(make_student("Partner", _id=ObjectId(), interests=["art", "coffee", "music"], languages=["fr"],
+                              french_level="C2", looking_for=["french_practice", "coffee"]))
+    shards = pool(index, strategy)
+    student = {**index.find("Student 0"), "languages": ["en"], "french_level": "A2",
+               "looking_for": ["french_practice", "coffee"]}
+
+    shortlist = shards.top_candidates(student, 10)
+    assert shortlist[0]["name"] == "Partner"
+    scored = dict((sid, score) for score, sid in index.features.top_k_scored(student, len(index), [student["_id"]]))
+    assert [scored[doc["_id"]] for doc in shortlist] == local_scores(index, student, 10)
+    assert len({doc["_id"] for doc in shortlist}) == 10
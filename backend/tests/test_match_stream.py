@@ -0,0 +1,118 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import make_student
+from replay_traffic import FakeLLM
+
+
+@pytest.fixture
+def llm(api, monkeypatch):
+    """Real-AI matching against the deterministic replay LLM"""
+    deadline = time.time() + 10
+    while not api.main.database.student_sync.is_ready:
+        assert time.time() < deadline, "student index never loaded"
+        time.sleep(0.02)
+    fake = FakeLLM()
+    matcher = api.main.matcher
+    monkeypatch.setattr(matcher, "use_real_ai", True)
+    monkeypatch.setattr(matcher, "_llm", fake)
+    monkeypatch.setattr(matcher, "SystemMessage", SimpleNamespace, raising=False)
+    monkeypatch.setattr(matcher, "HumanMessage", SimpleNamespace, raising=False)
+    return fake
+
+
+def register(api, name, **fields):
+    student = make_student(name, **fields)
+    api.db.students.insert_one(student)
+    api.main.student_index.upsert(student)
+    return str(student["_id"])
+
+
+def read_events(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_provisional_ranking_then_refinements_then_done(api, llm):
+    register(api, "Ines Gagnon", interests=["coffee", "cinema"])
+    for name in ("Omar Haddad", "Julie Roy", "Ken Ito"):
+        register(api, name, interests=["cinema"])
+
+    response = api.http.get("/api/students/matches/Ines Gagnon/stream")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = read_events(response.text)
+
+    names = [event for event, _ in events]
+    provisional = events[0][1]
+    assert names[0] == "provisional"
+    assert names[-1] == "done"
+    assert provisional["refining"] == provisional["total_candidates"] >= 3
+    assert names[1:-1] == ["refined", "ranking"] * provisional["refining"]
+    assert llm.calls == provisional["refining"]
+    # The last ranking is the one the stream ends on
+    assert events[-2][1]["matches"] == events[-1][1]["matches"]
+
+
+def test_namesakes_are_refined_separately(api, llm):
+    register(api, "Zoé Lambert", interests=["hiking", "music", "yoga"])
+    close = register(api, "Sam Roy", interests=["hiking", "music", "yoga"], username="sam.roy.1")
+    far = register(api, "Sam Roy", interests=["chess"], username="sam.roy.2")
+
+    events = read_events(api.http.get("/api/students/matches/Zoé Lambert/stream").text)
+
+    refined = {data["candidate_id"]: data for event, data in events if event == "refined"}
+    provisional_ids = [match["candidate_id"] for match in events[0][1]["matches"]]
+    assert {close, far} <= set(refined)
+    assert refined[close]["candidate"] == refined[far]["candidate"] == "Sam Roy"
+    assert refined[close]["match"]["match_score"] > refined[far]["match"]["match_score"]
+    assert len(provisional_ids) == len(set(provisional_ids))
+
+
+def test_leaving_the_stream_cancels_queued_analyses(api, llm):
+    llm.latency_seconds = 0.3
+    register(api, "Noah Martin", interests=["coffee"])
+    for i in range(12):
+        register(api, f"Stream Candidate {i}", interests=["coffee"])
+    workers = api.main.match_stream_executor._max_workers
+
+    async def open_and_leave():
+        first_event = asyncio.Event()
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            # The client goes away once it has the provisional ranking
+            await first_event.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and b"provisional" in message.get("body", b""):
+                first_event.set()
+
+        path = "/api/students/matches/Noah Martin/stream"
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+            "headers": [(b"host", b"testserver")], "client": ("testclient", 50000), "server": ("testserver", 80),
+        }
+        await api.main.app(scope, receive, send)
+
+    # On the app's own loop, which outlives the request, unlike asyncio.run's
+    api.http.portal.call(open_and_leave)
+    started = llm.calls
+    time.sleep(3 * llm.latency_seconds)
+
+    # Only the analyses already running when the client left were made
+    assert started <= workers < 13
+    assert llm.calls == started
@@ -0,0 +1,167 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson import ObjectId
+
+from conftest import make_student
+from matcher_index import StudentFeatures, StudentIndex
+from matcher_snapshot import MANIFEST, load_latest_snapshot, save_snapshot
+
+
+def build_index():
+    index = StudentIndex()
+    index.load([
+        make_student("Léa Tremblay", _id=ObjectId(), interests=["art", "coffee", "museums"]),
+        make_student("John Chen", _id=ObjectId(), interests=["coffee", "hiking"], french_level="A2"),
+        make_student("Sophie Martin", _id=ObjectId(), interests=["music", "art"], email=None),
+    ])
+    return index
+
+
+def test_snapshot_round_trip(tmp_path):
+    index = build_index()
+    save_snapshot(index, str(tmp_path), None)
+
+    restored = StudentIndex()
+    restored.attach_snapshot(load_latest_snapshot(str(tmp_path)))
+
+    assert len(restored) == len(index)
+    assert sorted(restored.all_ids()) == sorted(index.all_ids())
+    for student_id in index.all_ids():
+        assert restored.get(student_id) == index.get(student_id)
+    assert restored.find("john.chen")["name"] == "John Chen"
+
+    query = index.find("Léa Tremblay")
+    assert [doc["_id"] for doc in restored.top_candidates(query, 2)] == \
+        [doc["_id"] for doc in index.top_candidates(query, 2)]
+
+
+def test_snapshot_arrays_are_memory_mapped(tmp_path):
+    save_snapshot(build_index(), str(tmp_path), None)
+    snapshot = load_latest_snapshot(str(tmp_path))
+    assert isinstance(snapshot.arrays["interests"], np.memmap)
+
+
+def test_overlay_shadows_snapshot_rows(tmp_path):
+    save_snapshot(build_index(), str(tmp_path), None)
+    index = StudentIndex()
+    index.attach_snapshot(load_latest_snapshot(str(tmp_path)))
+    john = index.find("John Chen")
+
+    index.upsert({**john, "interests": ["art", "music"]})
+    assert index.find("John Chen")["interests"] == ["art", "music"]
+    assert len(index) == 3
+    assert john["_id"] in index.ids_with_interest("music")
+    assert john["_id"] not in index.ids_with_interest("hiking")
+
+    index.remove(john["_id"])
+    assert index.find("John Chen") is None
+    assert len(index) == 2
+    assert john["_id"] not in index.all_ids()
+
+    # Folding the overlay into a new base keeps the same view
+    index.features.compact()
+    assert len(index.features) == 2
+
+
+def test_snapshot_profiles_are_copies(tmp_path):
+    save_snapshot(build_index(), str(tmp_path), None)
+    snapshot = load_latest_snapshot(str(tmp_path))
+    student_id = snapshot.ids[0].item()
+
+    profile = snapshot.profile(student_id)
+    profile["interests"].append("mutated")
+    profile["name"] = "mutated"
+    assert snapshot.profile(student_id) != profile
+    assert "mutated" not in snapshot.profile(student_id)["interests"]
+
+
+def test_other_format_versions_are_ignored(tmp_path):
+    save_snapshot(build_index(), str(tmp_path), None)
+    version = open(os.path.join(tmp_path, "CURRENT")).read()
+    manifest_path = os.path.join(tmp_path, version, MANIFEST)
+    manifest = json.load(open(manifest_path))
+    manifest["format_version"] = -1
+    json.dump(manifest, open(manifest_path, "w"))
+    assert load_latest_snapshot(str(tmp_path)) is None
+
+
+def test_snapshots_with_other_indexed_fields_are_ignored(tmp_path):
+    save_snapshot(build_index(), str(tmp_path), None)
+    version = open(os.path.join(tmp_path, "CURRENT")).read()
+    manifest_path = os.path.join(tmp_path, version, MANIFEST)
+    manifest = json.load(open(manifest_path))
+    manifest["indexed_fields"] = manifest["indexed_fields"][:-1]
+    json.dump(manifest, open(manifest_path, "w"))
+    assert load_latest_snapshot(str(tmp_path)) is None
+
+
+def snapshot_sync(mongo, directory):
+    from database_sync import StudentChangeSync
+
+    index = StudentIndex()
+    events = []
+    index.add_listener(lambda event, student_id, doc: events.append(event))
+    sync = StudentChangeSync(mongo, index)
+    sync.snapshot_dir = str(directory)
+    return sync, index, events
+
+
+def current_version(directory):
+    return open(os.path.join(directory, "CURRENT")).read()
+
+
+def test_full_load_writes_a_snapshot_and_maps_it(mongo, tmp_path):
+    mongo.db.students.insert_many([make_student("Léa Tremblay"), make_student("John Chen")])
+    sync, index, _ = snapshot_sync(mongo, tmp_path)
+    sync._initial_load(mongo.db.students)
+    assert index.snapshot is not None and not index.features.overlay
+    assert isinstance(index.features.base["interests"], np.memmap)
+    assert index.find("John Chen")["interests"] == ["coffee"]
+
+
+def test_cold_start_folds_replayed_deltas_into_a_new_version(mongo, tmp_path, monkeypatch):
+    monkeypatch.setattr(StudentFeatures, "COMPACT_MIN_ROWS", 2)
+    students = mongo.db.students
+    students.insert_many([make_student(f"Student {i}") for i in range(10)])
+    first, _, _ = snapshot_sync(mongo, tmp_path)
+    first._initial_load(students)
+    version = current_version(tmp_path)
+
+    later = datetime.utcnow() + timedelta(seconds=5)
+    for i in range(5):
+        students.update_one({"name": f"Student {i}"}, {"$set": {"interests": ["music"], "updated_at": later}})
+
+    sync, index, events = snapshot_sync(mongo, tmp_path)
+    sync._initial_load(students)
+    assert current_version(tmp_path) != version
+    assert not index.features.overlay and not index.students
+    assert len(index.ids_with_interest("music")) == 5
+    assert index.find("Student 0")["interests"] == ["music"]
+    # Same content, so listeners only saw the initial attach and the replay
+    assert events.count("reset") == 1
+
+    # The next cold start has nothing left to replay
+    again, index, _ = snapshot_sync(mongo, tmp_path)
+    again._initial_load(students)
+    assert not index.features.overlay
+
+
+def test_snapshot_is_refreshed_on_a_timer(mongo, tmp_path):
+    students = mongo.db.students
+    students.insert_many([make_student("Léa Tremblay"), make_student("John Chen")])
+    sync, index, _ = snapshot_sync(mongo, tmp_path)
+    sync._initial_load(students)
+    version = current_version(tmp_path)
+
+    sync._maintain_index()
+    assert current_version(tmp_path) == version  # nothing changed yet
+
+    index.upsert({**index.find("John Chen"), "interests": ["hiking"]})
+    sync.snapshot_refresh_seconds = 0
+    sync._maintain_index()
+    assert current_version(tmp_path) != version
+    assert not index.features.overlay
+    assert index.find("John Chen")["interests"] == ["hiking"]
@@ -0,0 +1,19 @@
+from prompt_budget import UsageLedger
+
+
+def test_completion_budget_uses_the_cap_until_enough_samples():
+    ledger = UsageLedger()
+    for _ in range(49):
+        ledger.record(100, 80, 0.5)
+    assert ledger.completion_budget(320) == 320
+
+
+def test_completion_budget_follows_observed_usage_under_the_cap():
+    ledger = UsageLedger()
+    for tokens in range(1, 101):
+        ledger.record(100, tokens, 0.5)
+    # Failed calls don't count
+    ledger.record(100, 0, 5, ok=False)
+    assert ledger.completion_budget(320) == 125
+    assert ledger.completion_budget(320, percentile=0.5, headroom=1.0) == 51
+    assert ledger.completion_budget(110) == 110
@@ -0,0 +1,92 @@
+import pytest
+from bson import ObjectId
+
+import student_search
+from conftest import make_student
+from matcher_index import StudentIndex
+from student_search import StudentSearchIndex, fold, within_distance
+
+
+@pytest.fixture
+def index():
+    index = StudentIndex()
+    search = StudentSearchIndex(index)
+    index.add_listener(search.on_index_event)
+    index.load([
+        make_student("Léa Tremblay", _id=ObjectId(), interests=["photographie", "café"]),
+        make_student("Zoë Côté", _id=ObjectId(), interests=["hiking"], bio="Étudiante en génie"),
+        make_student("John Chen", _id=ObjectId(), interests=["photography", "music"]),
+        make_student("Ana Silva", _id=ObjectId(), interests=["dance"], bio="Loves musical theatre"),
+    ])
+    index.search = search
+    return index
+
+
+def names(index, query, **page):
+    return [index.get(student_id)["name"] for _, student_id in index.search.search(query, **page)[1]]
+
+
+def test_fold_strips_accents_and_case():
+    assert fold("Léa CÔTÉ") == "lea cote"
+    assert fold("Zoë") == "zoe"
+
+
+def test_accents_match_either_way(index):
+    assert names(index, "lea") == ["Léa Tremblay"]
+    assert names(index, "Côté") == names(index, "cote") == ["Zoë Côté"]
+    assert names(index, "etudiante genie") == ["Zoë Côté"]
+    assert names(index, "cafe") == ["Léa Tremblay"]
+
+
+def test_prefixes_match(index):
+    assert names(index, "trem") == ["Léa Tremblay"]
+    # "photograph" prefixes both interests
+    assert sorted(names(index, "photograph")) == ["John Chen", "Léa Tremblay"]
+
+
+def test_typos_within_edit_distance(index):
+    assert names(index, "tremblya") == ["Léa Tremblay"]
+    assert names(index, "hikng") == ["Zoë Côté"]
+    assert names(index, "photografy") == ["John Chen"]
+    # Short terms aren't fuzzy matched
+    assert names(index, "jon") == []
+    assert names(index, "xyzzyx") == []
+
+
+def test_exact_ranks_above_prefix(index):
+    results = index.search.search("music")[1]
+    assert [index.get(student_id)["name"] for _, student_id in results] == ["John Chen", "Ana Silva"]
+    assert results[0][0] > results[1][0]
+
+
+def test_every_term_must_match(index):
+    assert names(index, "john music") == ["John Chen"]
+    assert names(index, "john hiking") == []
+
+
+def test_results_follow_index_deltas(index):
+    zoe = index.find("Zoë Côté")
+    index.upsert({**zoe, "name": "Zoé Gagnon", "username": "zoe.gagnon"})
+    assert names(index, "cote") == []
+    assert names(index, "gagnon") == ["Zoé Gagnon"]
+    index.remove(zoe["_id"])
+    assert names(index, "gagnon") == []
+
+
+def test_paging(index):
+    total, page = index.search.search("photograph", limit=1, offset=1)
+    assert total == 2 and len(page) == 1
+
+
+def test_dense_tokens_stay_consistent(index, monkeypatch):
+    monkeypatch.setattr(student_search, "DENSE_MIN_POSTINGS", 2)
+    for i in range(5):
+        index.upsert(make_student(f"Étienne {i}", _id=ObjectId(), interests=["échecs"]))
+    assert len(names(index, "echecs", limit=50)) == 5
+    index.remove(index.find("Étienne 0")["_id"])
+    assert len(names(index, "echec", limit=50)) == 4
+
+
+def test_within_distance():
+    assert within_distance("tremblay", "tremblya", 2)
+    assert not within_distance("hiking", "biking!!", 1)
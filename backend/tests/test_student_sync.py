@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from conftest import make_student
+from database_sync import MongoDB, StudentChangeSync
+from matcher_index import StudentIndex
+
+
+class FakeChangeStream:
+    """Replays a fixed list of change events, then reports the stream as closed"""
+
+    def __init__(self, changes):
+        self.changes = list(changes)
+        self.alive = True
+        self.resume_token = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def try_next(self):
+        if not self.changes:
+            self.alive = False
+            return None
+        change = self.changes.pop(0)
+        self.resume_token = {"_data": str(len(self.changes))}
+        return change
+
+
+def make_sync(mongo):
+    index = StudentIndex()
+    events = []
+    index.add_listener(lambda event, student_id, doc: events.append((event, student_id)))
+    return StudentChangeSync(mongo, index), index, events
+
+
+def test_upsert_leaves_missing_fields_absent():
+    index = StudentIndex()
+    index.upsert({"_id": "1", "name": "Léa"})
+    entry = index.get("1")
+    assert "email" not in entry
+    assert entry.get("email", "unknown@umontreal.ca") == "unknown@umontreal.ca"
+    assert entry["interests"] == [] and entry["completed_challenges"] == []
+    assert index.find("Léa")["_id"] == "1"
+
+
+def test_change_streams_unavailable_on_mongomock_falls_back_to_polling(mongo):
+    sync, _, _ = make_sync(mongo)
+    assert sync._open_change_stream(mongo.db.students) is None
+
+
+def test_polling_applies_only_changed_documents(mongo):
+    students = mongo.db.students
+    students.insert_many([make_student("Léa Tremblay"), make_student("John Chen")])
+    sync, index, events = make_sync(mongo)
+    sync._initial_load(students)
+    assert sync.is_ready and len(index) == 2
+    events.clear()
+
+    later = datetime.utcnow() + timedelta(seconds=5)
+    students.update_one({"name": "John Chen"}, {"$set": {"interests": ["hiking"], "updated_at": later}})
+    students.insert_one(make_student("Sophie Martin", updated_at=later))
+    sync._poll_once(students)
+
+    assert [event for event, _ in events] == ["upsert", "upsert"]
+    assert index.find("John Chen")["interests"] == ["hiking"]
+    assert index.find("Sophie Martin") is not None
+
+    # The overlap window re-reads the same documents; they aren't applied twice
+    events.clear()
+    sync._poll_once(students)
+    assert events == []
+
+
+def test_polling_reconciles_deletes(mongo):
+    students = mongo.db.students
+    students.insert_many([make_student("Léa Tremblay"), make_student("John Chen")])
+    sync, index, _ = make_sync(mongo)
+    sync._initial_load(students)
+
+    students.delete_one({"name": "John Chen"})
+    sync._reconcile_deletes(students)
+    assert index.find("John Chen") is None
+    assert len(index) == 1
+
+
+def test_change_stream_applies_each_event(mongo):
+    students = mongo.db.students
+    lea = make_student("Léa Tremblay")
+    students.insert_one(lea)
+    sync, index, _ = make_sync(mongo)
+
+    john_id = ObjectId()
+    john = make_student("John Chen", _id=john_id)
+    stream = FakeChangeStream([
+        {"operationType": "insert", "fullDocument": john, "documentKey": {"_id": john_id}},
+        {"operationType": "update", "fullDocument": {**john, "french_level": "C1"}, "documentKey": {"_id": john_id}},
+        {"operationType": "delete", "documentKey": {"_id": lea["_id"]}},
+    ])
+    sync._run_change_stream(students, stream)
+
+    assert sync.mode == "change_stream"
+    assert index.find("Léa Tremblay") is None
+    assert index.find("John Chen")["french_level"] == "C1"
+    assert sync.events_applied == 3
+    assert sync._resume_token == stream.resume_token
+
+
+def test_change_stream_invalidate_forces_a_reload(mongo):
+    sync, _, _ = make_sync(mongo)
+    stream = FakeChangeStream([{"operationType": "invalidate"}])
+    sync._run_change_stream(mongo.db.students, stream)
+    assert sync._resume_token is None
+    assert not sync.is_ready
+
+
+def test_updated_at_index_exists_whatever_the_sync_mode(mongo):
+    connection = MongoDB()
+    connection.db = mongo.db
+    connection.ensure_indexes()
+    assert any(spec["key"] == [("updated_at", 1)] for spec in mongo.db.students.index_information().values())
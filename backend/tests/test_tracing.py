@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import pytest
+from bson import ObjectId
+
+import match_shards
+from conftest import make_student
+from match_shards import ShardPool
+from matcher_index import StudentIndex
+from tracing import Tracer
+
+
+class ListExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(spans)
+
+
+def make_tracer(**options):
+    exporter = ListExporter()
+    return Tracer(exporter, **options), exporter
+
+
+def wait_for_exports(tracer, count, timeout=5):
+    deadline = time.time() + timeout
+    while tracer.exported_traces < count:
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_bind_carries_the_trace_onto_executor_threads():
+    tracer, exporter = make_tracer(sample_rate=1)
+
+    def work():
+        with tracer.span("work") as span:
+            return span.trace_id
+
+    async def request():
+        with tracer.span("request") as root:
+            loop = asyncio.get_running_loop()
+            bound = await loop.run_in_executor(None, tracer.bind(work))
+            unbound = await loop.run_in_executor(None, work)
+            return root, bound, unbound
+
+    root, bound, unbound = asyncio.run(request())
+    assert bound == root.trace_id
+    # Without bind() the executor thread starts a trace of its own
+    assert unbound != root.trace_id
+
+    wait_for_exports(tracer, 2)
+    work_span = next(span for trace in exporter.traces for span in trace
+                     if span["name"] == "work" and span["trace_id"] == bound)
+    assert work_span["parent_id"] == root.span_id
+
+
+def test_shard_spans_join_the_querying_trace(monkeypatch):
+    tracer, exporter = make_tracer(sample_rate=1)
+    monkeypatch.setattr(match_shards, "tracer", tracer)
+    index = StudentIndex()
+    index.load([make_student(f"Student {i}", _id=ObjectId(), interests=["coffee", "art"][i % 2:]) for i in range(10)])
+    pool = ShardPool(index, 2, "hash")
+    pool.start()
+    try:
+        pool.on_index_event("reset", None, None)
+        with tracer.span("request") as root:
+            pool.top_candidates(index.find("Student 0"), 3)
+    finally:
+        pool.stop()
+
+    wait_for_exports(tracer, 1)
+    (trace,) = exporter.traces
+    scatter = next(span for span in trace if span["name"] == "shards.scatter_gather")
+    shard_spans = [span for span in trace if span["name"] == "shard.top_k"]
+    assert len(shard_spans) == 2
+    assert {span["trace_id"] for span in trace} == {root.trace_id}
+    # Spans made in the shard processes hang off the coordinator's span
+    assert {span["parent_id"] for span in shard_spans} == {scatter["span_id"]}
+
+
+def test_slow_traces_are_kept_even_without_sampling():
+    tracer, exporter = make_tracer(sample_rate=0, slow_ms=20)
+    with tracer.span("fast"):
+        pass
+    with tracer.span("slow"):
+        time.sleep(0.03)
+
+    wait_for_exports(tracer, 1)
+    assert [[span["name"] for span in trace] for trace in exporter.traces] == [["slow"]]
+    assert tracer.metrics()["open_traces"] == 0
+
+
+@pytest.mark.parametrize("slow", [True, False])
+def test_late_spans_follow_their_traces_decision(slow):
+    tracer, exporter = make_tracer(sample_rate=0, slow_ms=20)
+    with tracer.span("request") as root:
+        late = tracer.start_span("background")
+        if slow:
+            time.sleep(0.03)
+
+    # Ends after the root, e.g. work still running once the response is sent
+    tracer.finish(late)
+    tracer.record_remote([dict(late.to_dict(), name="remote", span_id="r1")])
+
+    if slow:
+        wait_for_exports(tracer, 3)
+        assert [[span["name"] for span in trace] for trace in exporter.traces] == [["request"], ["background"], ["remote"]]
+        assert {span["trace_id"] for trace in exporter.traces for span in trace} == {root.trace_id}
+    else:
+        time.sleep(0.05)
+        assert exporter.traces == []
+    # Dropped or exported, nothing is left buffered
+    assert tracer.metrics()["open_traces"] == 0
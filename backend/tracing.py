@@ -0,0 +1,286 @@
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+from uuid import uuid4
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "end", "attributes", "status")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: dict):
+        self.trace_id = trace_id
+        self.span_id = uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.end = None
+        self.attributes = attributes
+        self.status = "ok"
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        return round(((self.end or time.time()) - self.start) * 1000, 3)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Handed out when tracing is disabled so call sites stay unconditional"""
+    trace_id = span_id = None
+
+    def set(self, key, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class JsonlExporter:
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans):
+        with open(self.path, "a") as f:
+            for span in spans:
+                f.write(json.dumps(span, default=str) + "\n")
+
+
+class OtlpHttpExporter:
+    """Posts spans in the OTLP/HTTP JSON shape, e.g. to a local collector"""
+
+    def __init__(self, url: str, service_name: str = "udem-campus-connect-api"):
+        self.url = url
+        self.service_name = service_name
+
+    def export(self, spans):
+        import urllib.request
+
+        body = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": [self._convert(span) for span in spans]}],
+        }]}
+        request = urllib.request.Request(
+            self.url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=5):
+            pass
+
+    @staticmethod
+    def _convert(span: dict) -> dict:
+        start_ns = int(span["start"] * 1e9)
+        return {
+            "traceId": span["trace_id"],
+            "spanId": span["span_id"],
+            "parentSpanId": span["parent_id"] or "",
+            "name": span["name"],
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(start_ns + int(span["duration_ms"] * 1e6)),
+            "status": {"code": 1 if span["status"] == "ok" else 2},
+            "attributes": [{"key": key, "value": {"stringValue": str(value)}} for key, value in span["attributes"].items()],
+        }
+
+
+class Tracer:
+    """
+    Lightweight request tracing.
+    Spans nest through a contextvar, so they follow asyncio tasks; use bind()
+    to carry the context into thread pools and current_context()/remote spans
+    across process boundaries. Spans are buffered per trace and, when the
+    root ends, the whole trace is kept if it was slower than `slow_ms` or
+    picked by the `sample_rate` coin flip, then exported in the background.
+    """
+
+    def __init__(self, exporter=None, sample_rate: float = 0.01, slow_ms: float = 500):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._traces = {}
+        # Late spans (e.g. work finishing after the response) follow their trace's decision
+        self._decisions = OrderedDict()
+        self._queue = queue.Queue(maxsize=1000)
+        self.exported_traces = 0
+        self.dropped_traces = 0
+        if exporter is not None:
+            threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True).start()
+
+    @classmethod
+    def from_env(cls):
+        """TRACE_EXPORT=jsonl:<path> or otlp:<url>; unset disables tracing"""
+        target = os.getenv("TRACE_EXPORT", "")
+        exporter = None
+        if target.startswith("jsonl:"):
+            exporter = JsonlExporter(target[len("jsonl:"):])
+        elif target.startswith("otlp:"):
+            exporter = OtlpHttpExporter(target[len("otlp:"):])
+        return cls(
+            exporter,
+            sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0.01")),
+            slow_ms=float(os.getenv("TRACE_SLOW_MS", "500")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Child of the current span, or the root of a new trace"""
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        parent = _current_span.get()
+        span = Span(name, parent.trace_id if parent else uuid4().hex, parent.span_id if parent else None, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.set("error", repr(e)[:200])
+            raise
+        finally:
+            _current_span.reset(token)
+            self.finish(span)
+
+    def start_span(self, name: str, **attributes):
+        """Span that doesn't become current; end it with finish() (e.g. from callbacks)"""
+        parent = _current_span.get()
+        if not self.enabled or parent is None:
+            return None
+        return Span(name, parent.trace_id, parent.span_id, attributes)
+
+    def finish(self, span: Span):
+        span.end = time.time()
+        with self._lock:
+            self._traces.setdefault(span.trace_id, []).append(span.to_dict())
+        if span.parent_id is None:
+            self._decide(span)
+        elif span.trace_id in self._decisions:
+            self._flush(span.trace_id, self._decisions[span.trace_id])
+
+    def record_remote(self, spans):
+        """Adopt spans produced in another process (see remote_span)"""
+        for data in spans or []:
+            with self._lock:
+                self._traces.setdefault(data["trace_id"], []).append(data)
+            if data["trace_id"] in self._decisions:
+                self._flush(data["trace_id"], self._decisions[data["trace_id"]])
+
+    def bind(self, function):
+        """Run `function` in the caller's trace context, e.g. on an executor thread"""
+        context = contextvars.copy_context()
+        return lambda *args, **kwargs: context.run(function, *args, **kwargs)
+
+    def current_trace_id(self) -> Optional[str]:
+        span = _current_span.get()
+        return span.trace_id if span else None
+
+    def _decide(self, root: Span):
+        keep = root.duration_ms >= self.slow_ms or random.random() < self.sample_rate
+        with self._lock:
+            self._decisions[root.trace_id] = keep
+            while len(self._decisions) > 10000:
+                self._decisions.popitem(last=False)
+        self._flush(root.trace_id, keep)
+
+    def _flush(self, trace_id: str, keep: bool):
+        with self._lock:
+            spans = self._traces.pop(trace_id, [])
+        if not keep or not spans:
+            return
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped_traces += 1
+
+    def _export_loop(self):
+        while True:
+            spans = self._queue.get()
+            try:
+                self.exporter.export(spans)
+                self.exported_traces += 1
+            except Exception as e:
+                self.dropped_traces += 1
+                print(f"⚠️ Trace export failed: {e}")
+
+    def metrics(self):
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "slow_ms": self.slow_ms,
+            "open_traces": len(self._traces),
+            "exported_traces": self.exported_traces,
+            "dropped_traces": self.dropped_traces,
+        }
+
+
+def current_context() -> Optional[dict]:
+    """Serializable trace context to hand to another process"""
+    span = _current_span.get()
+    return {"trace_id": span.trace_id, "span_id": span.span_id} if span else None
+
+
+@contextmanager
+def remote_span(context: Optional[dict], name: str, sink: list, **attributes):
+    """Span in a worker process; its dict is appended to `sink` to be sent back"""
+    if context is None:
+        yield NOOP_SPAN
+        return
+    span = Span(name, context["trace_id"], context["span_id"], attributes)
+    try:
+        yield span
+    finally:
+        span.end = time.time()
+        sink.append(span.to_dict())
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of every HTTP request (ends with the last body chunk)"""
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        with self.tracer.span("http.request", method=scope["method"], target=scope["path"]) as span:
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    span.set("status_code", message["status"])
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"x-trace-id", span.trace_id.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace_id)
+            endpoint = scope.get("endpoint")
+            if endpoint is not None:
+                span.set("route", endpoint.__name__)
+
+
+# Global tracer configured from the environment
+tracer = Tracer.from_env()
@@ -0,0 +1,189 @@
+"""
+Anonymized capture of matching traffic, for replay with replay_traffic.py.
+
+With TRAFFIC_CAPTURE=<path>, requests to /api/students/register,
+/api/students/matches/* and /api/connections/* are appended to <path> as
+JSON lines. Names, usernames, emails and student ids are replaced by keyed
+pseudonyms (HMAC with TRAFFIC_CAPTURE_KEY), consistently between paths and
+bodies, so a replayed match request still finds the student registered
+earlier in the log; bios keep only their length. Interests, languages,
+French level and looking_for are kept as-is: they're what matching scores.
+"""
+import hashlib
+import hmac
+import json
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qsl, quote, urlencode
+
+# (method, path pattern, route) of what gets captured; named groups are pseudonymized
+CAPTURED_ROUTES = [
+    ("POST", re.compile(r"^/api/students/register$"), "/api/students/register"),
+    ("GET", re.compile(r"^/api/students/matches/(?P<student>[^/]+)$"), "/api/students/matches/{student}"),
+    ("GET", re.compile(r"^/api/students/matches/(?P<student>[^/]+)/stream$"), "/api/students/matches/{student}/stream"),
+    ("POST", re.compile(r"^/api/connections/connect$"), "/api/connections/connect"),
+    ("GET", re.compile(r"^/api/connections/(?P<student_id>[^/]+)$"), "/api/connections/{student_id}"),
+]
+
+# Identity fields of request bodies
+PSEUDONYMIZED_FIELDS = ("name", "username", "student_id", "partner_id")
+# Profile fields replayed verbatim; everything else in a register body is dropped
+KEPT_FIELDS = ("interests", "languages", "french_level", "looking_for")
+# Query parameters replayed; others are dropped
+KEPT_QUERY = ("language",)
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+def captured_route(method: str, path: str):
+    """(route, path params) when a request is one we capture, else None"""
+    for route_method, pattern, route in CAPTURED_ROUTES:
+        if method == route_method:
+            found = pattern.match(path)
+            if found:
+                return route, found.groupdict()
+    return None
+
+
+class TrafficRecorder:
+    """
+    Pseudonymizes captured requests and appends them to a JSONL file from a
+    background thread, so capturing never blocks a response (entries are
+    dropped if the writer falls behind).
+    """
+
+    def __init__(self, path: Optional[str] = None, key: Optional[str] = None):
+        self.path = path
+        # Without a shared key, pseudonyms only line up within one process
+        self._key = (key or secrets.token_hex(16)).encode()
+        self._queue = queue.Queue(maxsize=10000)
+        self.captured = 0
+        self.dropped = 0
+        if path:
+            threading.Thread(target=self._write_loop, name="traffic-capture", daemon=True).start()
+
+    @classmethod
+    def from_env(cls):
+        """TRAFFIC_CAPTURE=<path> enables capture; unset disables it"""
+        return cls(os.getenv("TRAFFIC_CAPTURE") or None, os.getenv("TRAFFIC_CAPTURE_KEY") or None)
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def pseudonym(self, value) -> Optional[str]:
+        if value is None:
+            return None
+        digest = hmac.new(self._key, str(value).encode(), hashlib.sha256).hexdigest()
+        return f"anon-{digest[:16]}"
+
+    def anonymize_body(self, body: dict) -> dict:
+        anonymized = {field: body[field] for field in KEPT_FIELDS if field in body}
+        for field in PSEUDONYMIZED_FIELDS:
+            if field in body:
+                anonymized[field] = self.pseudonym(body[field])
+        if "email" in body:
+            anonymized["email"] = f"{self.pseudonym(body['email'])}@example.invalid"
+        if "bio" in body:
+            # Same number of words, so prompts and bio summaries cost about the same
+            anonymized["bio"] = " ".join(["lorem"] * len(str(body["bio"]).split()))
+        return anonymized
+
+    def record(self, method: str, route: str, params: dict, query: str, body: bytes,
+               status: int, duration_ms: float):
+        path = route
+        for name, value in params.items():
+            path = path.replace("{" + name + "}", quote(self.pseudonym(value), safe=""))
+        entry = {
+            "ts": round(time.time(), 6),
+            "method": method,
+            "route": route,
+            "path": path,
+            "query": urlencode([(name, value) for name, value in parse_qsl(query) if name in KEPT_QUERY]),
+            "body": None,
+            "status": status,
+            "duration_ms": round(duration_ms, 3),
+        }
+        if body:
+            try:
+                parsed = json.loads(body)
+            except ValueError:
+                return  # can't anonymize what we can't parse; such requests fail validation anyway
+            entry["body"] = self.anonymize_body(parsed) if isinstance(parsed, dict) else None
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self):
+        while True:
+            entries = [self._queue.get()]
+            while not self._queue.empty() and len(entries) < 500:
+                entries.append(self._queue.get_nowait())
+            try:
+                with open(self.path, "a") as f:
+                    for entry in entries:
+                        f.write(json.dumps(entry) + "\n")
+                self.captured += len(entries)
+            except Exception as e:
+                self.dropped += len(entries)
+                print(f"⚠️ Traffic capture write failed: {e}")
+
+    def metrics(self):
+        return {"enabled": self.enabled, "captured": self.captured, "dropped": self.dropped}
+
+
+class TrafficCaptureMiddleware:
+    """ASGI middleware recording the captured routes' requests once their response has been sent"""
+
+    def __init__(self, app, recorder: TrafficRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.recorder.enabled:
+            await self.app(scope, receive, send)
+            return
+        matched = captured_route(scope["method"], scope["path"])
+        if matched is None:
+            await self.app(scope, receive, send)
+            return
+
+        body = []
+        size = 0
+        status = None
+
+        async def receive_and_keep():
+            nonlocal size
+            message = await receive()
+            if message["type"] == "http.request" and size <= MAX_BODY_BYTES:
+                chunk = message.get("body", b"")
+                body.append(chunk)
+                size += len(chunk)
+            return message
+
+        async def send_and_watch(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive_and_keep, send_and_watch)
+        finally:
+            if size <= MAX_BODY_BYTES:
+                route, params = matched
+                self.recorder.record(
+                    scope["method"], route, params, scope.get("query_string", b"").decode("latin-1"),
+                    b"".join(body), status or 500, (time.perf_counter() - started) * 1000,
+                )
+
+
+# Global recorder configured from the environment
+traffic_recorder = TrafficRecorder.from_env()